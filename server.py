@@ -1,26 +1,22 @@
-from flask import Flask, request, render_template, jsonify
-from flask_cors import CORS
 import os
-import glob
+import sys
 
-import networkx as nx
-import matplotlib.pyplot as plt
-import numpy as np
-import scipy.stats as sts
-import seaborn as sns
+from flask import Flask, request, jsonify
+from flask_cors import CORS
 
-import simulation
+# The simulation modules import each other as top-level modules (e.g. `import
+# config`), so their directory has to be on the path rather than imported as a
+# package.
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "simulation"))
 
-from networkx.readwrite import json_graph
+from simrunner import get_simulation_results  # noqa: E402
+from simulation import CommonsSimulationConfiguration  # noqa: E402
 
 app = Flask(__name__, static_url_path='')
 CORS(app)
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
-
-
-def jsonifyNetwork(network):
-    obj = json_graph.node_link_data(network)
-    return obj
+app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
 
 
 @app.route('/')
@@ -30,6 +26,15 @@ def root():
 
 @app.route('/api/cadcad', methods=['POST'])
 def cadcad():
+    """
+    Runs a simulation and returns the time series and final counts from
+    simrunner.get_simulation_results() as JSON. Plotting is left to the client.
+
+    Every request builds its own configuration (and therefore its own random
+    number generators) and no module-level state is touched, so this can be
+    served by a multi-threaded WSGI server.
+    """
+    c_default = CommonsSimulationConfiguration()
     try:
         params = request.get_json()
 
@@ -42,37 +47,19 @@ def cadcad():
         days_to_80p_of_max_voting_weight = int(
             params['days_to_80p_of_max_voting_weight'])
         max_proposal_request = float(params['max_proposal_request'])
+        timesteps_days = int(params.get(
+            'timesteps_days', c_default.timesteps_days))
+        random_seed = params.get('random_seed', c_default.random_seed)
+        random_seed = None if random_seed is None else int(random_seed)
 
     except Exception as err:
         return str(err), 422
 
-    c = simulation.simulation.CommonsSimulationConfiguration(hatchers=hatchers, proposals=proposals, days_to_80p_of_max_voting_weight=days_to_80p_of_max_voting_weight,
-                                                             max_proposal_request=max_proposal_request, exit_tribute=exit_tribute)
-
-    result, df = simulation.simrunner.run_simulation(c)
-
-    for ind in range(len(df)):
-        r = results[ind]['result']
-        # print(results[ind]['simulation_parameters'])
-        r.plot(x='timestep', y='funds')
-        plt.savefig('static/plot8-'+str(ind)+'.png')
-        plt.clf()
-
-        fig, ax1 = plt.subplots()
-        ax2 = ax1.twinx()  # instantiate a second axes that shares the same x-axis
-        df = r
-        rdf = df[df.substep == 4].copy()
-
-        rdf.plot(x='timestep', y=['funds', 'reserve', 'supply'], ax=ax1)
-        rdf.plot(x='timestep', y='spot_price', style='--',
-                 color='red', ax=ax2, legend=False)
-        ax2.set_ylabel('Price in xDAI per Token', color='red')
-        ax1.set_ylabel('Quantity of Assets')
-        ax2.tick_params(axis='y', labelcolor='red')
-        plt.title('Summary of Local Economy')
-        plt.savefig('static/plot9-'+str(ind)+'.png')
-        plt.clf()
+    c = CommonsSimulationConfiguration(hatchers=hatchers, proposals=proposals, hatch_tribute=hatch_tribute,
+                                       vesting_80p_unlocked=vesting_80p_unlocked, exit_tribute=exit_tribute,
+                                       kappa=kappa, days_to_80p_of_max_voting_weight=days_to_80p_of_max_voting_weight,
+                                       max_proposal_request=max_proposal_request, timesteps_days=timesteps_days,
+                                       random_seed=random_seed)
 
-    return jsonify({
-        'results': ['plot8-0.png', 'plot9-0.png']
-    })
+    result, _ = get_simulation_results(c)
+    return jsonify(result)
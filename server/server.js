@@ -13,6 +13,24 @@ const upTime = new Date().toISOString()
 const DATA_DIR = `./data/${upTime}`
 fs.mkdirSync(DATA_DIR)
 
+const SIMULATION_ARGS = [
+    'hatchers',
+    'proposals',
+    'hatch_tribute',
+    'vesting_80p_unlocked',
+    'exit_tribute',
+    'kappa',
+    'days_to_80p_of_max_voting_weight',
+    'max_proposal_request',
+    'timesteps_days',
+    'random_seed'
+]
+
+// Simulations that are currently running, keyed by simulationId. Identical
+// requests that arrive while a simulation is running attach to its promise
+// instead of spawning another simrunner.py process (single-flight).
+const inFlight = new Map()
+
 app.use(cors())
 app.use(bodyParser.json())
 
@@ -20,56 +38,77 @@ const server = app.listen(5000)
 
 server.setTimeout(180000) // 3min
 
-app.post('/cadcad', function(req, res) {
-    console.log('/cadcad', req.body)
-    let SIMULATION_COMMAND = `python3 ../simulation/simrunner.py `;
-    try {
-        [
-            'hatchers',
-            'proposals',
-            'hatch_tribute',
-            'vesting_80p_unlocked',
-            'exit_tribute',
-            'kappa',
-            'days_to_80p_of_max_voting_weight',
-            'max_proposal_request',
-            'timesteps_days',
-            'random_seed'
-        ].forEach(arg => {
-            if (!req.body[arg]) {
-                throw new Error('missing parameter : ' + arg)
-            }
-            return SIMULATION_COMMAND += '--' + arg + ' ' + req.body[arg] + ' '
-        })
-    } catch (e) {
-        return res.status(400).send(e.message)
-    }
+/*
+ * Returns the parameters in a fixed order with their values normalized, so
+ * that e.g. {"exit_tribute": "0.350"} and {"exit_tribute": 0.35} map to the
+ * same simulation.
+ */
+function canonicalConfig(body) {
+    return SIMULATION_ARGS.map(arg => {
+        if (!body[arg]) {
+            throw new Error('missing parameter : ' + arg)
+        }
+        const value = Number(body[arg])
+        if (!Number.isFinite(value)) {
+            throw new Error('invalid parameter : ' + arg)
+        }
+        return [arg, value]
+    })
+}
 
-    const simulationId = stringHash(SIMULATION_COMMAND)
-    const cacheFile = `${DATA_DIR}/${simulationId}.json`
-    if (!fs.existsSync(cacheFile)) {
-        console.log(SIMULATION_COMMAND + ' PROCESSING')
-        const startTime = moment()
-        exec(SIMULATION_COMMAND, (error, stdout, stderr) => {
-            console.log(req.body, stdout, error, stderr)
+function runSimulation(command, cacheFile, body) {
+    console.log(command + ' PROCESSING')
+    const startTime = moment()
+    return new Promise((resolve, reject) => {
+        exec(command, (error, stdout, stderr) => {
+            console.log(body, stdout, error, stderr)
             const endTime = moment()
             var timeDiff = endTime.diff(startTime, 'seconds')
             console.log('Total execution time (sec): ', timeDiff)
-            if (error) return res.status(500).send(stderr)
+            if (error) return reject({ status: 500, message: stderr })
             try {
                 const lines = stdout.split(/\n/).filter(n => n)
                 const json_output = JSON.parse(lines[lines.length - 1])
                 const store = new Store({file: cacheFile})
-                store.write([req.body, json_output, { execTimeinSec: timeDiff }])
-                res.json(json_output)
+                store.write([body, json_output, { execTimeinSec: timeDiff }])
+                resolve(json_output)
             } catch (e) {
-                if (e) res.status(500).send(stdout)
+                reject({ status: 500, message: stdout })
             }
-
         })
-    } else {
+    })
+}
+
+app.post('/cadcad', function(req, res) {
+    console.log('/cadcad', req.body)
+    let config
+    try {
+        config = canonicalConfig(req.body)
+    } catch (e) {
+        return res.status(400).send(e.message)
+    }
+
+    const SIMULATION_COMMAND = config.reduce(
+        (cmd, [arg, value]) => cmd + '--' + arg + ' ' + value + ' ',
+        `python3 ../simulation/simrunner.py `)
+    const simulationId = stringHash(JSON.stringify(config))
+    const cacheFile = `${DATA_DIR}/${simulationId}.json`
+
+    if (fs.existsSync(cacheFile)) {
         console.log(SIMULATION_COMMAND + ' CACHED')
         const store = new Store({file: cacheFile})
-        store.read().then((data) => res.json(data[1]))
+        return store.read().then((data) => res.json(data[1]))
+    }
+
+    let job = inFlight.get(simulationId)
+    if (job) {
+        console.log(SIMULATION_COMMAND + ' COALESCED')
+    } else {
+        job = runSimulation(SIMULATION_COMMAND, cacheFile, req.body)
+            .finally(() => inFlight.delete(simulationId))
+        inFlight.set(simulationId, job)
     }
+    job.then(
+        json_output => res.json(json_output),
+        e => res.status(e.status).send(e.message))
 });
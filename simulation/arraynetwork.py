@@ -0,0 +1,446 @@
+"""
+A compact network for large simulations, with the operations the model needs
+from the networkx.DiGraph that network_utils builds.
+
+Every Participant has a support edge to every Proposal, so instead of one
+attribute dict per edge, ArrayNetwork keeps the support edges in dense
+(participants, proposals) arrays of affinity, tokens, conviction and
+is_author. The few conflict edges between Proposals are only ever read and
+are kept in compressed sparse row form. Participants and Proposals keep their
+ids and the order they were added in, like the nodes of the DiGraph, so the
+policies draw their random numbers in the same order and a run on either
+network gives the same results.
+
+Policies do not use ArrayNetwork directly but go through network_utils,
+whose functions take either network. NetworkHistory (history.py) and
+scenarios.build_network() still need a DiGraph; ArrayNetwork.from_graph()
+converts one, e.g. one built by network_utils.bootstrap_network().
+
+The support arrays are views of larger buffers, whose capacity doubles
+along the axis that runs out of room, so that adding Participants and
+Proposals one at a time reallocates them O(log n) times instead of once per
+Participant or Proposal. The ids map to stable slots (rows and columns) until
+a compaction or a removed Proposal moves them, and storage_stats() reports
+the reallocations.
+
+A Participant that exits leaves a tombstone: its id and Participant are
+cleared from its row, which the other rows keep their place around. Rows are
+only dropped from the arrays once tombstones make up more than
+COMPACT_RATIO of them, all at once, so that a mass exit does not copy the
+arrays once per Participant.
+
+The support arrays are float64 unless another of DTYPES is given. float32
+halves their memory, which is what large networks are made of, at the cost of
+about 7 significant digits per edge. Sums over edges, e.g. a Proposal's total
+conviction, are still accumulated in float64, and everything else, the
+Participants' holdings and the Commons' reserves included, stays in Python
+floats.
+"""
+import copy
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from entities import Participant, ParticipantSupport, Proposal, ProposalStatus
+
+DTYPES = ("float64", "float32")
+SUPPORT_ARRAYS = ("affinity", "tokens", "conviction", "is_author")
+# The share of participant rows that may be tombstones before compact()
+COMPACT_RATIO = 0.25
+
+
+def new_affinity(random_number_func) -> float:
+    """
+    The affinity of a new support edge, as network_utils.setup_support_edges()
+    draws it.
+    """
+    rv = random_number_func()
+    return 1-4*(1-rv)*rv
+
+
+class ArrayNetwork:
+    def __init__(self, dtype="float64"):
+        if np.dtype(dtype).name not in DTYPES:
+            raise Exception("Unsupported dtype {}, expected one of {}".format(dtype, DTYPES))
+        self.dtype = np.dtype(dtype)
+        # by participant slot, None for the tombstones of removed Participants
+        self.participant_ids = []
+        self.participants = []
+        self.tombstones = 0
+        self.compactions = 0
+        self.reallocations = 0
+        self.reallocated_bytes = 0
+        self.proposal_ids = []
+        self.proposals = []
+        self._participant_slots = {}
+        self._proposal_slots = {}
+        # the largest id in use, archived Proposals included, or None once the
+        # node with it was removed, see next_id()
+        self._max_id = -1
+
+        # the buffers of the support edges, indexed by (participant slot,
+        # proposal slot), see the properties below
+        self._support = {name: np.zeros((0, 0), dtype=bool if name == "is_author" else self.dtype)
+                         for name in SUPPORT_ARRAYS}
+
+        # conflict edges, the ids of proposal slot k's conflicting Proposals
+        # are conflict_ids[conflict_indptr[k]:conflict_indptr[k+1]], with
+        # conflict_indptr a view of a buffer one longer than the support
+        # buffers' columns
+        self._conflict_indptr = np.zeros(1, dtype=np.int64)
+        self.conflict_ids = np.zeros(0, dtype=np.int64)
+        self.conflict = np.zeros(0)
+
+        # entities.ProposalArchive of the Proposals archive_proposal() removed
+        self.archive = None
+
+    def __repr__(self):
+        return "<{} {} participants, {} proposals>".format(
+            self.__class__.__name__, len(self._participant_slots), len(self.proposals))
+
+    def __len__(self):
+        return len(self._participant_slots) + len(self.proposals)
+
+    def __contains__(self, idx):
+        return idx in self._participant_slots or idx in self._proposal_slots
+
+    def _view(self, name: str) -> np.ndarray:
+        return self._support[name][:len(self.participant_ids), :len(self.proposal_ids)]
+
+    @property
+    def affinity(self) -> np.ndarray:
+        return self._view("affinity")
+
+    @property
+    def tokens(self) -> np.ndarray:
+        return self._view("tokens")
+
+    @property
+    def conviction(self) -> np.ndarray:
+        return self._view("conviction")
+
+    @property
+    def is_author(self) -> np.ndarray:
+        return self._view("is_author")
+
+    @property
+    def conflict_indptr(self) -> np.ndarray:
+        return self._conflict_indptr[:len(self.proposal_ids) + 1]
+
+    @conflict_indptr.setter
+    def conflict_indptr(self, indptr: np.ndarray):
+        self._conflict_indptr[:len(indptr)] = indptr
+
+    @property
+    def capacity(self) -> Tuple[int, int]:
+        return self._support["affinity"].shape
+
+    def reserve(self, rows: int, cols: int):
+        """
+        Makes room for rows participant slots and cols proposal slots in the
+        support buffers, and the conflict_indptr buffer with them. An axis
+        that runs out of room at least doubles.
+        """
+        capacity_rows, capacity_cols = self.capacity
+        if rows <= capacity_rows and cols <= capacity_cols:
+            return
+        shape = (capacity_rows if rows <= capacity_rows else max(rows, 2 * capacity_rows),
+                 capacity_cols if cols <= capacity_cols else max(cols, 2 * capacity_cols))
+        moved = self._support["affinity"].size
+        for name, old in self._support.items():
+            new = np.zeros(shape, dtype=old.dtype)
+            new[:capacity_rows, :capacity_cols] = old
+            self._support[name] = new
+            if moved:
+                self.reallocated_bytes += old.nbytes
+        if shape[1] > capacity_cols:
+            old = self._conflict_indptr
+            self._conflict_indptr = np.zeros(shape[1] + 1, dtype=np.int64)
+            self._conflict_indptr[:len(old)] = old
+            if moved:
+                self.reallocated_bytes += old.nbytes
+        if moved:
+            self.reallocations += 1
+
+    def storage_stats(self) -> dict:
+        """
+        e.g. {"participant_slots": 120, "proposal_slots": 40, "capacity": [128,
+        64], "tombstones": 3, "compactions": 1, "reallocations": 9,
+        "reallocated_bytes": 1048576}
+
+        reallocated_bytes counts the bytes of the support and conflict_indptr
+        buffers the reallocations copied.
+        """
+        return {
+            "participant_slots": len(self.participant_ids),
+            "proposal_slots": len(self.proposal_ids),
+            "capacity": list(self.capacity),
+            "tombstones": self.tombstones,
+            "compactions": self.compactions,
+            "reallocations": self.reallocations,
+            "reallocated_bytes": self.reallocated_bytes,
+        }
+
+    @classmethod
+    def from_graph(cls, graph, dtype="float64") -> "ArrayNetwork":
+        """
+        Converts a DiGraph with Participants, Proposals, support and conflict
+        edges into an ArrayNetwork with support arrays of dtype.
+        """
+        n = cls(dtype)
+        for idx, item in graph.nodes(data="item"):
+            if isinstance(item, Participant):
+                n._participant_slots[idx] = len(n.participants)
+                n.participant_ids.append(idx)
+                n.participants.append(item)
+            else:
+                n._proposal_slots[idx] = len(n.proposals)
+                n.proposal_ids.append(idx)
+                n.proposals.append(item)
+
+        n.reserve(len(n.participants), len(n.proposals))
+        conflicts = [[] for _ in n.proposals]
+        for i, j, data in graph.edges(data=True):
+            if data.get("type") == "support":
+                n.set_support(i, j, data["support"])
+            elif data.get("type") == "conflict":
+                conflicts[n._proposal_slots[i]].append((j, data["conflict"]))
+        n.conflict_indptr = np.cumsum([0] + [len(c) for c in conflicts], dtype=np.int64)
+        n.conflict_ids = np.array([j for c in conflicts for j, _ in c], dtype=np.int64)
+        n.conflict = np.array([conflict for c in conflicts for _, conflict in c], dtype=float)
+        n.archive = graph.graph.get("archive")
+        n._max_id = n._find_max_id()
+        return n
+
+    def copy(self) -> "ArrayNetwork":
+        """
+        Like network_utils.snapshot_network(): the arrays and the Participants
+        and Proposals are copied, the TokenBatches shallowly.
+        """
+        n = copy.copy(self)
+        n.participant_ids = list(self.participant_ids)
+        n.proposal_ids = list(self.proposal_ids)
+        n.participants = [Participant(copy.copy(p.holdings), p.sentiment) if p is not None else None
+                          for p in self.participants]
+        n.proposals = [copy.copy(p) for p in self.proposals]
+        n._participant_slots = dict(self._participant_slots)
+        n._proposal_slots = dict(self._proposal_slots)
+        # without the spare capacity, that a snapshot does not need
+        n._support = {name: np.array(self._view(name)) for name in SUPPORT_ARRAYS}
+        n._conflict_indptr = np.array(self.conflict_indptr)
+        if self.archive is not None:
+            n.archive = self.archive.copy()
+        return n
+
+    def next_id(self) -> int:
+        """
+        The id network_utils.add_participant() and add_proposal() would give
+        the next node of a DiGraph: one more than the largest id in use,
+        archived Proposals included.
+
+        The largest id is kept as nodes are added, and only looked up again
+        after the node with it was removed, which may free its id like it does
+        in a DiGraph.
+        """
+        if self._max_id is None:
+            self._max_id = self._find_max_id()
+        return self._max_id + 1
+
+    def _find_max_id(self) -> int:
+        archived = self.archive.max_id if self.archive is not None else -1
+        return max(list(self._participant_slots) + self.proposal_ids + [archived])
+
+    def item(self, idx):
+        if idx in self._participant_slots:
+            return self.participants[self._participant_slots[idx]]
+        return self.proposals[self._proposal_slots[idx]]
+
+    def get_participant_ids(self) -> List[int]:
+        if not self.tombstones:
+            return list(self.participant_ids)
+        return [i for i in self.participant_ids if i is not None]
+
+    def get_participants(self) -> List[Tuple[int, Participant]]:
+        return [(i, p) for i, p in zip(self.participant_ids, self.participants) if p is not None]
+
+    def get_proposals(self, status: ProposalStatus = None) -> List[Tuple[int, Proposal]]:
+        return [(j, p) for j, p in zip(self.proposal_ids, self.proposals) if not status or p.status == status]
+
+    def add_participant(self, participant: Participant, random_number_func) -> int:
+        """
+        Draws the affinities of the new Participant's support edges to every
+        Proposal, in the order the Proposals were added.
+        """
+        i = self.next_id()
+        affinity = [new_affinity(random_number_func) for _ in self.proposals]
+        k, Q = len(self.participant_ids), len(self.proposal_ids)
+        self.reserve(k + 1, Q)
+        self._participant_slots[i] = k
+        self._max_id = i
+        self.participant_ids.append(i)
+        self.participants.append(participant)
+
+        # the buffers may hold a compacted row's old values past the views
+        for name, buffer in self._support.items():
+            buffer[k, :Q] = affinity if name == "affinity" else 0
+        return i
+
+    def add_proposal(self, proposal: Proposal, random_number_func) -> int:
+        """
+        Draws the affinities of every Participant's support edge to the new
+        Proposal, in the order the Participants were added.
+        """
+        j = self.next_id()
+        affinity = [new_affinity(random_number_func) if p is not None else 0 for p in self.participants]
+        P, k = len(self.participant_ids), len(self.proposal_ids)
+        self.reserve(P, k + 1)
+        self._proposal_slots[j] = k
+        self._max_id = j
+        self.proposal_ids.append(j)
+        self.proposals.append(proposal)
+        self._conflict_indptr[k + 1] = self._conflict_indptr[k]
+
+        for name, buffer in self._support.items():
+            buffer[:P, k] = affinity if name == "affinity" else 0
+        return j
+
+    def remove_participants(self, idxs: List[int]):
+        """
+        Removes the Participants with their support edges, leaving tombstones
+        in their rows, and compacts the arrays if there are too many.
+
+        A tombstone's tokens and conviction are zeroed, so that sums over
+        every row still only count the remaining Participants.
+        """
+        for idx in idxs:
+            k = self._participant_slots.pop(idx)
+            if idx == self._max_id:
+                self._max_id = None
+            self.participant_ids[k] = None
+            self.participants[k] = None
+            self.tokens[k] = 0
+            self.conviction[k] = 0
+            self.is_author[k] = False
+            self.tombstones += 1
+        if self.tombstones > COMPACT_RATIO * len(self.participant_ids):
+            self.compact()
+
+    def remove_participant(self, idx: int):
+        self.remove_participants([idx])
+
+    def compact(self):
+        """
+        Drops the tombstones' rows from the arrays and moves the remaining
+        Participants up, in the same order.
+        """
+        if not self.tombstones:
+            return
+        keep = [k for k, i in enumerate(self.participant_ids) if i is not None]
+        Q = len(self.proposal_ids)
+        for buffer in self._support.values():
+            buffer[:len(keep), :Q] = buffer[keep, :Q]
+        self.participant_ids = [self.participant_ids[k] for k in keep]
+        self.participants = [self.participants[k] for k in keep]
+        self._participant_slots = {i: k for k, i in enumerate(self.participant_ids)}
+        self.tombstones = 0
+        self.compactions += 1
+
+    def live_rows(self, array: np.ndarray) -> np.ndarray:
+        """
+        The rows of one of the support arrays that belong to Participants, the
+        tombstones left out.
+        """
+        if not self.tombstones:
+            return array
+        return array[[i is not None for i in self.participant_ids]]
+
+    def number_of_support_edges(self) -> int:
+        return len(self._participant_slots) * len(self.proposals)
+
+    def remove_proposal(self, idx: int):
+        """
+        Removes the Proposal with its support edges and the conflict edges
+        from and to it.
+        """
+        k = self._proposal_slots.pop(idx)
+        if idx == self._max_id:
+            self._max_id = None
+        P, Q = len(self.participant_ids), len(self.proposal_ids)
+        for buffer in self._support.values():
+            buffer[:P, k:Q - 1] = buffer[:P, k + 1:Q]
+        counts = np.diff(self.conflict_indptr)
+        del self.proposal_ids[k]
+        del self.proposals[k]
+        for j in self.proposal_ids[k:]:
+            self._proposal_slots[j] -= 1
+
+        keep = np.repeat(np.arange(len(counts)) != k, counts) & (self.conflict_ids != idx)
+        rows = np.repeat(np.arange(len(counts)), counts)[keep]
+        self.conflict_ids, self.conflict = self.conflict_ids[keep], self.conflict[keep]
+        counts = np.bincount(rows, minlength=len(counts))
+        self.conflict_indptr = np.concatenate([[0], np.cumsum(np.delete(counts, k))]).astype(np.int64)
+
+    def get_support(self, participant_idx: int, proposal_idx: int) -> ParticipantSupport:
+        e = self._participant_slots[participant_idx], self._proposal_slots[proposal_idx]
+        s = self._support
+        return ParticipantSupport(affinity=s["affinity"].item(e), tokens=s["tokens"].item(e),
+                                  conviction=s["conviction"].item(e), is_author=s["is_author"].item(e))
+
+    def set_support(self, participant_idx: int, proposal_idx: int, support: ParticipantSupport):
+        e = self._participant_slots[participant_idx], self._proposal_slots[proposal_idx]
+        s = self._support
+        s["affinity"][e], s["tokens"][e], s["conviction"][e], s["is_author"][e] = support
+
+    def get_support_edges(self, proposal_idx: int = None) -> List[Tuple[int, int, ParticipantSupport]]:
+        """
+        Every support edge, or those to the Proposal proposal_idx, in the
+        order the DiGraph's edges come in.
+        """
+        proposal_ids = self.proposal_ids if proposal_idx is None else [proposal_idx]
+        return [(i, j, self.get_support(i, j)) for i in self.get_participant_ids() for j in proposal_ids]
+
+    def get_edges_by_type(self, edge_type: str) -> List[Tuple[int, int]]:
+        if edge_type == "support":
+            return [(i, j) for i in self.get_participant_ids() for j in self.proposal_ids]
+        if edge_type == "conflict":
+            return [(i, int(j)) for k, i in enumerate(self.proposal_ids)
+                    for j in self.conflict_ids[self.conflict_indptr[k]:self.conflict_indptr[k + 1]]]
+        return []
+
+    def find_in_edges_of_type(self, proposal_idx: int, edge_type: str) -> List[Tuple[int, int, str]]:
+        if edge_type == "support":
+            return [(i, proposal_idx, edge_type) for i in self.get_participant_ids()]
+        return [(i, j, edge_type) for i, j in self.get_edges_by_type(edge_type) if j == proposal_idx]
+
+    def get_conflict(self, proposal_idx: int, other_proposal_idx: int) -> float:
+        k = self._proposal_slots[proposal_idx]
+        start, end = self.conflict_indptr[k], self.conflict_indptr[k + 1]
+        for j, conflict in zip(self.conflict_ids[start:end], self.conflict[start:end]):
+            if j == other_proposal_idx:
+                return float(conflict)
+        raise KeyError((proposal_idx, other_proposal_idx))
+
+    def candidate_mask(self) -> np.ndarray:
+        return np.array([p.status == ProposalStatus.CANDIDATE for p in self.proposals], dtype=bool)
+
+    def update_conviction(self, alpha: float):
+        """
+        ProposalFunding.su_calculate_conviction() for every support edge to a
+        Candidate Proposal at once.
+        """
+        candidates = self.candidate_mask()
+        self.conviction[:, candidates] = self.tokens[:, candidates] + alpha * self.conviction[:, candidates]
+
+    def total_conviction(self, proposal_idx: int) -> float:
+        return np.sum(self.conviction[:, self._proposal_slots[proposal_idx]], dtype=np.float64)
+
+    def total_affinity(self) -> float:
+        return np.sum(self.live_rows(self.affinity), dtype=np.float64)
+
+    def median_affinity(self) -> Optional[float]:
+        """
+        The median affinity of the support edges, None without any.
+        """
+        if not self.number_of_support_edges():
+            return None
+        return float(np.median(self.live_rows(self.affinity)))
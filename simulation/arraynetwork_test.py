@@ -0,0 +1,237 @@
+import unittest
+
+import numpy as np
+
+from arraynetwork import ArrayNetwork
+from entities import Participant, ParticipantSupport, Proposal, ProposalStatus
+from hatch import TokenBatch
+from network_utils import (add_participant, add_proposal, archive_proposals, bootstrap_network, calc_median_affinity,
+                           calc_total_affinity, calc_total_conviction, find_in_edges_of_type_for_proposal,
+                           get_edges_by_type, get_item, get_participants, get_proposals, get_support,
+                           get_support_edges, remove_participant, remove_participants, set_support, snapshot_network,
+                           update_conviction)
+from simrunner import get_simulation_results
+from simulation import CommonsSimulationConfiguration
+from utils import new_exponential_func, new_gamma_func, new_probability_func, new_random_number_func
+
+
+def bootstrap(seed=1):
+    token_batches = [TokenBatch(1000, 1000) for _ in range(6)]
+    return bootstrap_network(token_batches, 4, 3000, 4e6, 0.2, new_probability_func(seed),
+                             new_random_number_func(seed), new_gamma_func(seed), new_exponential_func(seed))
+
+
+class TestArrayNetwork(unittest.TestCase):
+    def setUp(self):
+        self.graph = bootstrap()
+        self.network = ArrayNetwork.from_graph(bootstrap())
+
+    def assertSameNetwork(self, network, graph):
+        self.assertEqual([i for i, _ in get_participants(network)], [i for i, _ in get_participants(graph)])
+        self.assertEqual([j for j, _ in get_proposals(network)], [j for j, _ in get_proposals(graph)])
+        self.assertEqual(get_support_edges(network), get_support_edges(graph))
+        self.assertEqual(list(get_edges_by_type(network, "support")), list(get_edges_by_type(graph, "support")))
+
+    def test_from_graph(self):
+        self.assertSameNetwork(self.network, self.graph)
+        self.assertEqual(len(self.network), len(self.graph))
+        self.assertEqual(sorted(get_edges_by_type(self.network, "conflict")),
+                         sorted(get_edges_by_type(self.graph, "conflict")))
+        for i, j in get_edges_by_type(self.graph, "conflict"):
+            self.assertEqual(self.network.get_conflict(i, j), self.graph.edges[i, j]["conflict"])
+
+    def test_add_and_remove(self):
+        """
+        Adding and removing Participants and Proposals gives them the same
+        ids, draws the same affinities and keeps the same order as a DiGraph.
+        """
+        for network in (self.graph, self.network):
+            random_number_func = new_random_number_func(2)
+            remove_participant(network, 3)
+            network, i = add_participant(network, Participant(TokenBatch(0, 50), 0.5), None, random_number_func)
+            self.assertEqual(i, 10)
+            network, j = add_proposal(network, Proposal(100, 1000), random_number_func)
+            self.assertEqual(j, 11)
+            remove_participant(network, i)
+            network, i = add_participant(network, Participant(TokenBatch(0, 50), 0.5), None, random_number_func)
+            self.assertEqual(i, 12)
+            # the newest node's id is free again once it is removed
+            remove_participant(network, i)
+            network, i = add_participant(network, Participant(TokenBatch(0, 50), 0.5), None, random_number_func)
+            self.assertEqual(i, 12)
+        self.assertSameNetwork(self.network, self.graph)
+        self.assertNotIn(3, self.network)
+        self.assertIsInstance(get_item(self.network, 11), Proposal)
+
+    def test_archive_proposals(self):
+        for network in (self.graph, self.network):
+            for j in (6, 9):
+                get_item(network, j).status = ProposalStatus.FAILED
+            archive_proposals(network, [6, 9])
+            network, i = add_participant(network, Participant(TokenBatch(0, 50), 0.5), None, new_random_number_func(2))
+            self.assertEqual(i, 10)
+        self.assertSameNetwork(self.network, self.graph)
+        self.assertEqual(sorted(get_edges_by_type(self.network, "conflict")),
+                         sorted(get_edges_by_type(self.graph, "conflict")))
+        self.assertEqual([j for j, _ in get_proposals(self.network)], [7, 8, 6, 9])
+        self.assertEqual(snapshot_network(self.network).archive.ids, [6, 9])
+        with self.assertRaises(KeyError):
+            self.network.get_support(0, 6)
+
+    def test_tombstones(self):
+        """
+        Removed Participants leave tombstones that no view shows, until enough
+        of them pile up for the arrays to be compacted.
+        """
+        random_number_func = new_random_number_func(2)
+        for network in (self.graph, self.network):
+            remove_participant(network, 2)
+        self.assertEqual((self.network.tombstones, self.network.compactions), (1, 0))
+        self.assertEqual(self.network.affinity.shape, (6, 4))
+        self.assertSameNetwork(self.network, self.graph)
+        self.assertEqual(calc_median_affinity(self.network), calc_median_affinity(self.graph))
+        self.assertAlmostEqual(calc_total_affinity(self.network),
+                               sum(support.affinity for _, _, support in get_support_edges(self.graph)))
+        self.assertEqual(find_in_edges_of_type_for_proposal(self.network, 7, "support"),
+                         find_in_edges_of_type_for_proposal(self.graph, 7, "support"))
+
+        for network in (self.graph, self.network):
+            random_number_func = new_random_number_func(2)
+            network, j = add_proposal(network, Proposal(100, 1000), random_number_func)
+            network, i = add_participant(network, Participant(TokenBatch(0, 50), 0.5), None, random_number_func)
+        self.assertSameNetwork(self.network, self.graph)
+
+        for network in (self.graph, self.network):
+            remove_participants(network, [0, i])
+        self.assertEqual((self.network.tombstones, self.network.compactions), (0, 1))
+        self.assertEqual(self.network.affinity.shape, (4, 5))
+        self.assertSameNetwork(self.network, self.graph)
+        self.assertEqual(calc_median_affinity(self.network), calc_median_affinity(self.graph))
+
+    def test_capacity_doubling(self):
+        """
+        Adding Participants and Proposals one at a time only reallocates the
+        support arrays when their capacity doubles, and keeps the same edges
+        as a DiGraph.
+        """
+        self.assertEqual(self.network.capacity, (6, 4))
+        for network in (self.graph, self.network):
+            random_number_func = new_random_number_func(2)
+            for n in range(200):
+                network, _ = add_participant(network, Participant(TokenBatch(0, 50), 0.5), None, random_number_func)
+                if n % 10 == 0:
+                    network, _ = add_proposal(network, Proposal(100, 1000), random_number_func)
+        self.assertSameNetwork(self.network, self.graph)
+
+        stats = self.network.storage_stats()
+        self.assertEqual((stats["participant_slots"], stats["proposal_slots"]), (206, 24))
+        self.assertEqual(stats["capacity"], [384, 32])
+        # rows 6 -> 12 -> ... -> 384 and columns 4 -> 8 -> 16 -> 32, with
+        # conflict_indptr growing along with the columns
+        self.assertEqual(stats["reallocations"], 9)
+        self.assertEqual(self.network.affinity.shape, (206, 24))
+        self.assertEqual(self.network.conflict_indptr.shape, (25,))
+        self.assertEqual(self.network._conflict_indptr.shape, (33,))
+        self.assertEqual(sorted(get_edges_by_type(self.network, "conflict")),
+                         sorted(get_edges_by_type(self.graph, "conflict")))
+
+        exits = [i for i, _ in get_participants(self.graph)][5:145]
+        remove_participants(self.graph, exits)
+        remove_participants(self.network, exits)
+        network, j = add_proposal(self.network, Proposal(100, 1000), new_random_number_func(3))
+        self.graph, _ = add_proposal(self.graph, Proposal(100, 1000), new_random_number_func(3))
+        self.assertSameNetwork(self.network, self.graph)
+        self.assertEqual(self.network.capacity, (384, 32))
+        self.assertEqual(snapshot_network(self.network).capacity, (66, 25))
+
+    def test_support(self):
+        support = ParticipantSupport(affinity=0.5, tokens=20, conviction=30, is_author=True)
+        set_support(self.network, 2, 7, support)
+        self.assertEqual(get_support(self.network, 2, 7), support)
+        self.assertEqual(find_in_edges_of_type_for_proposal(self.network, 7, "support"),
+                         find_in_edges_of_type_for_proposal(self.graph, 7, "support"))
+
+    def test_update_conviction(self):
+        for network in (self.graph, self.network):
+            get_item(network, 6).status = ProposalStatus.ACTIVE
+            for i, j, support in get_support_edges(network):
+                set_support(network, i, j, support._replace(tokens=i + j, conviction=10))
+            update_conviction(network, 0.5)
+        self.assertSameNetwork(self.network, self.graph)
+        self.assertEqual(get_support(self.network, 1, 6).conviction, 10)
+        self.assertEqual(get_support(self.network, 1, 7).conviction, 13)
+        for j, _ in get_proposals(self.graph):
+            self.assertEqual(calc_total_conviction(self.network, j), calc_total_conviction(self.graph, j))
+        self.assertEqual(calc_median_affinity(self.network), calc_median_affinity(self.graph))
+
+    def test_float32(self):
+        network = ArrayNetwork.from_graph(self.graph, dtype="float32")
+        self.assertEqual(network.affinity.dtype, np.float32)
+        np.testing.assert_allclose(calc_median_affinity(network), calc_median_affinity(self.graph), rtol=1e-6)
+        network, i = add_participant(network, Participant(TokenBatch(0, 50), 0.5), None, new_random_number_func(2))
+        network, j = add_proposal(network, Proposal(100, 1000), new_random_number_func(2))
+        update_conviction(network, 0.5)
+        self.assertEqual((network.affinity.dtype, network.tokens.dtype, network.conviction.dtype),
+                         (np.float32, np.float32, np.float32))
+        self.assertIsInstance(calc_total_conviction(network, j), np.float64)
+        with self.assertRaises(Exception):
+            ArrayNetwork(dtype="float16")
+
+    def test_snapshot(self):
+        snapshot = snapshot_network(self.network)
+        get_item(self.network, 0).sentiment = 0
+        set_support(self.network, 0, 6, ParticipantSupport(affinity=0))
+        self.assertNotEqual(get_item(snapshot, 0).sentiment, 0)
+        self.assertNotEqual(get_support(snapshot, 0, 6).affinity, 0)
+        self.assertIsNot(get_item(snapshot, 0).holdings, get_item(self.network, 0).holdings)
+
+
+class TestSimulation(unittest.TestCase):
+    def test_same_results_as_networkx(self):
+        for seed in (1, 3):
+            with self.subTest(seed=seed):
+                results = [get_simulation_results(CommonsSimulationConfiguration(
+                    random_seed=seed, timesteps_days=120, network_backend=backend), engine="native")[0]
+                    for backend in ("networkx", "array")]
+                self.assertEqual(results[0], results[1])
+
+    def test_same_results_with_archived_proposals(self):
+        results = [get_simulation_results(CommonsSimulationConfiguration(
+            random_seed=3, timesteps_days=200, network_backend=backend, archive_proposals=True), engine="native")[0]
+            for backend in ("networkx", "array")]
+        self.assertEqual(results[0], results[1])
+
+    def test_float32_drift(self):
+        """
+        float32 support edges change funding_pool and token_price by far less
+        than the randomness does, and pass the same Proposals.
+        """
+        for seed in (1, 3):
+            with self.subTest(seed=seed):
+                results = [get_simulation_results(CommonsSimulationConfiguration(
+                    random_seed=seed, timesteps_days=200, network_backend="array", support_dtype=dtype),
+                    engine="native")[0] for dtype in ("float64", "float32")]
+                for name in ("funding_pool", "token_price"):
+                    np.testing.assert_allclose(results[1][name], results[0][name], rtol=1e-5)
+                self.assertEqual(results[1]["proposals"], results[0]["proposals"])
+
+    def test_storage_stats_with_profile(self):
+        result, _ = get_simulation_results(CommonsSimulationConfiguration(
+            random_seed=3, timesteps_days=40, network_backend="array"), engine="native", profile=True)
+        storage = result["network_storage"]
+        self.assertGreaterEqual(storage["capacity"][0], storage["participant_slots"])
+        self.assertGreater(storage["reallocations"], 0)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(Exception):
+            CommonsSimulationConfiguration(network_backend="igraph")
+
+    def test_unknown_or_unused_support_dtype(self):
+        with self.assertRaises(Exception):
+            CommonsSimulationConfiguration(network_backend="array", support_dtype="float16")
+        with self.assertRaises(Exception):
+            CommonsSimulationConfiguration(support_dtype="float32")
+
+
+if __name__ == '__main__':
+    unittest.main()
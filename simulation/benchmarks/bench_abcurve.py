@@ -0,0 +1,18 @@
+import pytest
+
+from hatch import Commons
+
+
+@pytest.mark.parametrize("batch_size", [10, 100, 1000, 10000])
+def bench_bonding_curve_batch(benchmark, batch_size):
+    """
+    A batch of alternating deposits and burns on the Commons' augmented
+    bonding curve, like the buy/sell/exit blocks perform every timestep.
+    """
+    def batch():
+        commons = Commons(1e6, 1e7, exit_tribute=0.35)
+        for i in range(batch_size):
+            tokens, _ = commons.deposit(100 + i % 7)
+            commons.burn(tokens / 2)
+        return commons
+    benchmark(batch)
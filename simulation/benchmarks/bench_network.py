@@ -0,0 +1,21 @@
+from hatch import TokenBatch, VestingOptions
+from network_utils import bootstrap_network, calc_median_affinity, calc_total_funds_requested
+
+from conftest import new_params
+
+
+def bench_bootstrap_network(benchmark, scale):
+    n_participants, n_proposals = scale
+    params = new_params()
+    token_batches = [TokenBatch(1000, 100, vesting_options=VestingOptions(20, 30)) for _ in range(n_participants)]
+    benchmark.pedantic(bootstrap_network, args=(token_batches, n_proposals, 1e6, 1e7, 0.2, params["probability_func"],
+                                                params["random_number_func"], params["gamma_func"],
+                                                params["exponential_func"]), rounds=3)
+
+
+def bench_calc_median_affinity(benchmark, network):
+    benchmark(calc_median_affinity, network)
+
+
+def bench_calc_total_funds_requested(benchmark, network):
+    benchmark(calc_total_funds_requested, network)
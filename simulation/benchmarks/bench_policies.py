@@ -0,0 +1,41 @@
+from hatch import Commons
+from policies import (ParticipantBuysTokens, ParticipantSellsTokens,
+                      ParticipantSentiment, ParticipantVoting, ProposalFunding)
+
+from conftest import ROUNDS
+
+
+def bench_su_calculate_conviction(benchmark, new_network, params):
+    def setup():
+        return (params, 0, [], {"network": new_network(), "timestep": 1}, {}), {}
+    benchmark.pedantic(ProposalFunding.su_calculate_conviction, setup=setup, rounds=ROUNDS)
+
+
+def bench_p_compare_conviction_and_threshold(benchmark, network, params):
+    state = {"network": network, "funding_pool": 1e6, "token_supply": 1e7}
+    benchmark(ProposalFunding.p_compare_conviction_and_threshold, params, 0, [], state)
+
+
+def bench_participant_voting(benchmark, new_network, params):
+    def setup():
+        return ({"network": new_network()},), {}
+
+    def vote(state):
+        _input = ParticipantVoting.p_participant_votes_on_proposal_according_to_affinity(params, 0, [], state)
+        ParticipantVoting.su_update_participants_votes(params, 0, [], state, _input)
+    benchmark.pedantic(vote, setup=setup, rounds=ROUNDS)
+
+
+def bench_sentiment_decay(benchmark, new_network, params):
+    def setup():
+        return (params, 0, [], {"network": new_network()}, {}), {}
+    benchmark.pedantic(ParticipantSentiment.su_update_sentiment_decay, setup=setup, rounds=ROUNDS)
+
+
+def bench_buy_and_sell_decisions(benchmark, network, params):
+    state = {"network": network, "commons": Commons(1e6, 1e7)}
+
+    def decide():
+        ParticipantBuysTokens.p_decide_to_buy_tokens_bulk(params, 0, [], state)
+        ParticipantSellsTokens.p_decide_to_sell_tokens_bulk(params, 0, [], state)
+    benchmark(decide)
@@ -0,0 +1,58 @@
+import pytest
+
+from engine import Engine
+from ensemble import bootstrap_ensemble
+from simrunner import run_simulation
+from simulation import (CommonsSimulationConfiguration, bootstrap_simulation,
+                        partial_state_update_blocks)
+
+TIMESTEPS = 30
+
+
+@pytest.mark.parametrize("hatchers,proposals", [(5, 2), (50, 10), (200, 50)])
+def bench_native_run(benchmark, hatchers, proposals):
+    """
+    A short-horizon run of the full model on the native engine, not counting
+    the bootstrap.
+    """
+    def setup():
+        c = CommonsSimulationConfiguration(hatchers=hatchers, proposals=proposals, random_seed=1,
+                                           timesteps_days=TIMESTEPS)
+        initial_conditions, simulation_parameters = bootstrap_simulation(c)
+        return (Engine(partial_state_update_blocks, simulation_parameters["M"]), initial_conditions, TIMESTEPS), {}
+
+    benchmark.pedantic(lambda engine, state, timesteps: engine.run(state, timesteps), setup=setup, rounds=3)
+
+
+def bench_cadcad_run(benchmark):
+    """
+    The same run as bench_native_run[5-2] through cadCAD, for comparison.
+    """
+    c = CommonsSimulationConfiguration(random_seed=1, timesteps_days=TIMESTEPS)
+    benchmark.pedantic(run_simulation, args=(c,), rounds=1)
+
+
+@pytest.mark.parametrize("runs", [1, 16, 64])
+def bench_ensemble_run(benchmark, runs):
+    """
+    runs runs of the default configuration in lockstep on an
+    ensemble.Ensemble, to compare with runs times bench_native_run[5-2].
+    """
+    def setup():
+        return (bootstrap_ensemble(runs, random_seed=1, timesteps_days=TIMESTEPS), TIMESTEPS), {}
+
+    benchmark.pedantic(lambda ensemble, timesteps: ensemble.run(timesteps), setup=setup, rounds=3)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "numba"])
+def bench_ensemble_backend(benchmark, backend):
+    """
+    bench_ensemble_run[64] with each of kernels.py's backends.
+    """
+    if backend == "numba":
+        pytest.importorskip("numba")
+
+    def setup():
+        return (bootstrap_ensemble(64, random_seed=1, backend=backend, timesteps_days=TIMESTEPS), TIMESTEPS), {}
+
+    benchmark.pedantic(lambda ensemble, timesteps: ensemble.run(timesteps), setup=setup, rounds=3)
@@ -0,0 +1,92 @@
+import functools
+import os
+import sys
+
+import pytest
+
+# The simulation modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hatch import TokenBatch, VestingOptions  # noqa: E402
+from network_utils import bootstrap_network, snapshot_network  # noqa: E402
+from policies import ParticipantVoting  # noqa: E402
+from utils import (new_probability_func, new_exponential_func,  # noqa: E402
+                   new_gamma_func, new_random_number_func, new_choice_func)
+
+PARTICIPANTS = [10, 100, 1000, 10000]
+PROPOSALS = [10, 100, 1000]
+# Rounds of the benchmarks that change the network, which each get a copy of
+# it of their own
+ROUNDS = 10
+
+
+def pytest_addoption(parser):
+    parser.addoption("--max-support-edges", type=int, default=100000,
+                     help="skip scales with more participants x proposals than this (default: %(default)s)")
+
+
+def pytest_generate_tests(metafunc):
+    """
+    Benchmarks that take a `scale` fixture run once per (participants,
+    proposals) combination, up to --max-support-edges support edges.
+    """
+    if "scale" in metafunc.fixturenames:
+        max_edges = metafunc.config.getoption("max_support_edges")
+        scales = [(n, m) for n in PARTICIPANTS for m in PROPOSALS if n * m <= max_edges]
+        metafunc.parametrize("scale", scales, ids=["{}x{}".format(n, m) for n, m in scales])
+
+
+def new_params(seed=0):
+    return {
+        "debug": False,
+        "alpha_days_to_80p_of_max_voting_weight": 0.2 ** (1/10),
+        "max_proposal_request": 0.2,
+        "probability_func": new_probability_func(seed),
+        "exponential_func": new_exponential_func(seed),
+        "gamma_func": new_gamma_func(seed),
+        "random_number_func": new_random_number_func(seed),
+        "choice_func": new_choice_func(seed),
+        "speculation_days": 30,
+        "multiplier_new_participants": 5,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def build_network(n_participants, n_proposals):
+    """
+    A bootstrapped network where every Participant has staked on the
+    Candidate Proposals they care about, built once per scale. Benchmarks only
+    get copies of it.
+    """
+    params = new_params()
+    token_batches = [TokenBatch(1000, 100, vesting_options=VestingOptions(20, 30)) for _ in range(n_participants)]
+    network = bootstrap_network(token_batches, n_proposals, 1e6, 1e7, 0.2, params["probability_func"],
+                                params["random_number_func"], params["gamma_func"], params["exponential_func"])
+    state = {"network": network}
+    _input = ParticipantVoting.p_participant_votes_on_proposal_according_to_affinity(params, 0, [], state)
+    ParticipantVoting.su_update_participants_votes(params, 0, [], state, _input)
+    return network
+
+
+@pytest.fixture
+def params():
+    return new_params()
+
+
+@pytest.fixture
+def network(scale):
+    """
+    A copy of build_network(*scale) for benchmarks that only read it, every
+    round the same network.
+    """
+    return snapshot_network(build_network(*scale))
+
+
+@pytest.fixture
+def new_network(scale):
+    """
+    Returns a new copy of build_network(*scale) on every call, for benchmarks
+    that change the network to take one per round in benchmark.pedantic()'s
+    setup, so that no round starts from what the previous one left.
+    """
+    return functools.partial(snapshot_network, build_network(*scale))
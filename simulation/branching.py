@@ -0,0 +1,97 @@
+"""
+Runs several continuations ("branches") of one simulation that share a common
+warm-up prefix.
+
+Parameter studies that vary a governance knob after the hatch (e.g.
+max_proposal_request or exit_tribute) would otherwise re-simulate the
+bootstrap and the speculation period for every point. Here the prefix is
+simulated once with the native engine, snapshotted in memory with
+checkpoint.dumps_checkpoint(), and every branch starts from that snapshot with
+its own parameter overrides.
+
+Every branch also continues with the same random number generator states, so
+differences between branches come from the overrides and not from different
+random draws.
+"""
+import multiprocessing
+from typing import List
+
+from checkpoint import dumps_checkpoint, loads_checkpoint
+from engine import Engine
+from simrunner import summarize_simulation
+from simulation import (CommonsSimulationConfiguration, bootstrap_simulation,
+                        partial_state_update_blocks)
+
+
+def apply_overrides(state: dict, params: dict, overrides: dict):
+    """
+    Overrides are keys of the simulation parameters ('M'). exit_tribute is
+    the exception, because it is read from the Commons object.
+    """
+    for key, value in overrides.items():
+        if key == "exit_tribute":
+            state["commons"].exit_tribute = value
+        elif key in params:
+            params[key] = value
+        else:
+            raise Exception("{} is not a simulation parameter that can be changed in a branch".format(key))
+
+
+def run_prefix(c: CommonsSimulationConfiguration, prefix_days: int) -> bytes:
+    """
+    Simulates the first prefix_days timesteps and returns the snapshot the
+    branches start from.
+    """
+    if not 0 < prefix_days < c.timesteps_days:
+        raise Exception("prefix_days must be between 0 and timesteps_days ({})".format(c.timesteps_days))
+    initial_conditions, simulation_parameters = bootstrap_simulation(c)
+    engine = Engine(partial_state_update_blocks, simulation_parameters["M"])
+    records = engine.run(initial_conditions, prefix_days)
+    return dumps_checkpoint(engine.state, engine.params, records)
+
+
+def run_branch(snapshot: bytes, c: CommonsSimulationConfiguration, overrides: dict):
+    """
+    Continues the snapshot with overrides applied until c.timesteps_days.
+    Returns the same (result, df_final) as simrunner.get_simulation_results().
+    """
+    import pandas as pd
+
+    checkpoint = loads_checkpoint(snapshot)
+    apply_overrides(checkpoint.state, checkpoint.params, overrides)
+    engine = Engine(partial_state_update_blocks, checkpoint.params)
+    records = engine.run(checkpoint.state, c.timesteps_days, records=checkpoint.records)
+    return summarize_simulation(c, pd.DataFrame(records))
+
+
+_snapshot = None
+
+
+def _init_worker(snapshot):
+    # With the fork start method the snapshot is inherited copy-on-write
+    # instead of being sent to every worker.
+    global _snapshot
+    _snapshot = snapshot
+
+
+def _run_branch_in_worker(c, overrides):
+    result, _ = run_branch(_snapshot, c, overrides)
+    return result
+
+
+def run_branches(c: CommonsSimulationConfiguration, prefix_days: int, variants: List[dict],
+                 processes: int = None) -> List[dict]:
+    """
+    Simulates the first prefix_days timesteps once, then one branch per dict
+    of overrides in variants. Returns the result dict of every branch, in the
+    order of variants.
+
+    The branches run in a pool of processes (by default one per CPU). With
+    processes=0 they run one after the other in this process.
+    """
+    snapshot = run_prefix(c, prefix_days)
+    if processes == 0:
+        return [run_branch(snapshot, c, overrides)[0] for overrides in variants]
+
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(snapshot,)) as pool:
+        return pool.starmap(_run_branch_in_worker, [(c, overrides) for overrides in variants])
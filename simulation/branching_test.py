@@ -0,0 +1,60 @@
+import unittest
+
+from branching import apply_overrides, run_branches
+from hatch import Commons
+from simrunner import get_simulation_results
+from simulation import CommonsSimulationConfiguration
+
+
+class TestBranching(unittest.TestCase):
+    def test_branch_without_overrides_matches_straight_run(self):
+        """
+        Branching only changes how the run is executed. A branch with no
+        overrides is the same run as one that was never branched, whether the
+        branches run in worker processes or in this process.
+        """
+        straight, _ = get_simulation_results(CommonsSimulationConfiguration(random_seed=3, timesteps_days=60),
+                                             engine="native")
+
+        variants = [{}, {"max_proposal_request": 0.25}]
+        branches = run_branches(CommonsSimulationConfiguration(random_seed=3, timesteps_days=60), 30, variants,
+                                processes=2)
+        self.assertEqual(branches[0], straight)
+        self.assertEqual(branches[1]["timestep"], straight["timestep"])
+
+        in_process = run_branches(CommonsSimulationConfiguration(random_seed=3, timesteps_days=60), 30, variants,
+                                  processes=0)
+        self.assertEqual(in_process, branches)
+
+    def test_overridden_branches_diverge_after_the_fork(self):
+        """
+        A branch that overrides max_proposal_request or exit_tribute is the
+        straight run up to the fork, and a different one after it.
+        """
+        straight, _ = get_simulation_results(CommonsSimulationConfiguration(random_seed=3, timesteps_days=60),
+                                             engine="native")
+
+        variants = [{"max_proposal_request": 0.05}, {"exit_tribute": 0.05}]
+        branches = run_branches(CommonsSimulationConfiguration(random_seed=3, timesteps_days=60), 30, variants,
+                                processes=0)
+        prefix = straight["timestep"].index(30) + 1
+        for overrides, branch in zip(variants, branches):
+            with self.subTest(**overrides):
+                self.assertEqual(branch["timestep"], straight["timestep"])
+                for name in ("funding_pool", "token_price", "sentiment"):
+                    self.assertEqual(branch[name][:prefix], straight[name][:prefix])
+                self.assertNotEqual(branch["funding_pool"][prefix:], straight["funding_pool"][prefix:])
+
+    def test_apply_overrides(self):
+        state = {"commons": Commons(10000, 1000, exit_tribute=0.35)}
+        params = {"max_proposal_request": 0.2}
+        apply_overrides(state, params, {"exit_tribute": 0.1, "max_proposal_request": 0.3})
+        self.assertEqual(state["commons"].exit_tribute, 0.1)
+        self.assertEqual(params["max_proposal_request"], 0.3)
+
+        with self.assertRaises(Exception):
+            apply_overrides(state, params, {"not_a_parameter": 1})
+
+    def test_prefix_must_be_shorter_than_the_run(self):
+        with self.assertRaises(Exception):
+            run_branches(CommonsSimulationConfiguration(timesteps_days=10), 10, [{}])
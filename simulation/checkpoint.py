@@ -0,0 +1,60 @@
+"""
+Saving and loading the complete state of a running simulation.
+
+A checkpoint holds everything engine.Engine needs to continue a run as if it
+had never stopped: the state (network, commons and the synced variables), the
+simulation parameters including the random number funcs with their
+RandomStates, and the records produced so far. Everything is pickled in one go
+so that objects shared between them (e.g. the random number funcs referenced by
+params) stay shared after loading.
+"""
+import gzip
+import os
+import pickle
+from typing import NamedTuple
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint(NamedTuple):
+    timestep: int
+    state: dict
+    params: dict
+    records: list
+
+
+def dumps_checkpoint(state: dict, params: dict, records: list) -> bytes:
+    """
+    Serializes a checkpoint into memory, e.g. to fork several continuations
+    from the same state without going through the disk.
+    """
+    return pickle.dumps((CHECKPOINT_VERSION, state["timestep"], state, params, records),
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads_checkpoint(data: bytes) -> Checkpoint:
+    version, *checkpoint = pickle.loads(data)
+    if version != CHECKPOINT_VERSION:
+        raise Exception("Checkpoint version {} is not supported (expected {})".format(
+            version, CHECKPOINT_VERSION))
+    return Checkpoint(*checkpoint)
+
+
+def save_checkpoint(path: str, state: dict, params: dict, records: list) -> str:
+    """
+    Writes a gzipped checkpoint to path. path may contain a {timestep} field,
+    otherwise the previous checkpoint is overwritten. The file is written
+    under a temporary name first, so a crash while writing never leaves a
+    truncated checkpoint behind.
+    """
+    path = path.format(timestep=state["timestep"])
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=1) as f:
+        f.write(dumps_checkpoint(state, params, records))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    with gzip.open(path, "rb") as f:
+        return loads_checkpoint(f.read())
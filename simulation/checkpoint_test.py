@@ -0,0 +1,74 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from checkpoint import (dumps_checkpoint, load_checkpoint, loads_checkpoint,
+                        save_checkpoint)
+from network_utils import get_participants, get_proposals
+from simrunner import run_simulation
+from simulation import CommonsSimulationConfiguration, bootstrap_simulation
+
+STATE_VARIABLES = ["funding_pool", "collateral_pool", "token_supply", "token_price", "sentiment"]
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_roundtrip_keeps_shared_random_funcs(self):
+        """
+        The Participants and params reference the same random number funcs.
+        After loading they must still be shared, and continue the same stream.
+        """
+        initial_conditions, simulation_parameters = bootstrap_simulation(
+            CommonsSimulationConfiguration(random_seed=3))
+        state = dict(initial_conditions, timestep=0)
+        params = simulation_parameters["M"]
+
+        path = save_checkpoint(os.path.join(self.dir.name, "cp-{timestep}.gz"), state, params, [])
+        self.assertEqual(os.path.basename(path), "cp-0.gz")
+        checkpoint = load_checkpoint(path)
+
+        self.assertEqual(checkpoint.timestep, 0)
+        self.assertEqual(len(checkpoint.state["network"]), len(state["network"]))
+        self.assertEqual(checkpoint.params["random_number_func"](), params["random_number_func"]())
+
+    def test_unsupported_version(self):
+        data = pickle.dumps((0, 0, {}, {}, []))
+        with self.assertRaises(Exception):
+            loads_checkpoint(data)
+        self.assertEqual(loads_checkpoint(dumps_checkpoint({"timestep": 4}, {}, [])).timestep, 4)
+
+    def test_resume_is_identical(self):
+        """
+        A run resumed from a checkpoint should produce exactly the same records
+        and final network as a run that was never interrupted.
+        """
+        path = os.path.join(self.dir.name, "cp-{timestep}.gz")
+        df = run_simulation(CommonsSimulationConfiguration(random_seed=5, timesteps_days=60), engine="native",
+                            checkpoint_every=20, checkpoint_path=path)
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ["cp-20.gz", "cp-40.gz", "cp-60.gz"])
+
+        df_resumed = run_simulation(CommonsSimulationConfiguration(timesteps_days=60), engine="native",
+                                    resume_from=path.format(timestep=20))
+
+        self.assertEqual(df_resumed.shape, df.shape)
+        for col in STATE_VARIABLES + ["timestep", "substep"]:
+            np.testing.assert_array_equal(df_resumed[col].values, df[col].values)
+
+        network, network_resumed = df.iloc[-1, 0], df_resumed.iloc[-1, 0]
+        self.assertEqual([(i, p.sentiment, p.holdings.total) for i, p in get_participants(network)],
+                         [(i, p.sentiment, p.holdings.total) for i, p in get_participants(network_resumed)])
+        self.assertEqual([(i, p.status, p.conviction) for i, p in get_proposals(network)],
+                         [(i, p.status, p.conviction) for i, p in get_proposals(network_resumed)])
+
+    def test_cadcad_engine_cannot_checkpoint(self):
+        with self.assertRaises(Exception):
+            run_simulation(CommonsSimulationConfiguration(timesteps_days=1), checkpoint_every=1,
+                           checkpoint_path=os.path.join(self.dir.name, "cp.gz"))
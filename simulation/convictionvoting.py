@@ -16,3 +16,15 @@ def trigger_threshold(funds_requested, funding_pool, token_supply, max_proposal_
         return rho*token_supply/(max_proposal_request-fraction)**2
     else:
         return np.inf
+
+
+def trigger_thresholds(funds_requested, funding_pool, token_supply, max_proposal_request):
+    """
+    trigger_threshold() for arrays of Proposals, e.g. ensemble.Ensemble's.
+    The arguments broadcast against each other.
+    """
+    rho = config.rho_multiplier * max_proposal_request**config.rho_power
+
+    fraction = funds_requested/funding_pool
+    with np.errstate(divide="ignore"):
+        return np.where(fraction < max_proposal_request, rho*token_supply/(max_proposal_request-fraction)**2, np.inf)
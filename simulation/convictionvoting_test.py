@@ -1,5 +1,8 @@
 import unittest
-from convictionvoting import trigger_threshold
+
+import numpy as np
+
+from convictionvoting import trigger_threshold, trigger_thresholds
 
 
 class ConvictionThresholdTest(unittest.TestCase):
@@ -8,3 +11,9 @@ class ConvictionThresholdTest(unittest.TestCase):
 
         # This number is not special, just used to make sure everything stays the same
         self.assertEqual(threshold, 5540166.20498615)
+
+    def test_trigger_thresholds(self):
+        funds_requested = np.array([[10, 150], [250, 1e9]])
+        funding_pool = np.array([[1000], [2000]])
+        expected = [[trigger_threshold(f, p, 10000000, 0.2) for f in row] for row, p in zip(funds_requested, [1000, 2000])]
+        np.testing.assert_array_equal(trigger_thresholds(funds_requested, funding_pool, 10000000, 0.2), expected)
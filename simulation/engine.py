@@ -0,0 +1,163 @@
+"""
+A small in-process runner for partial_state_update_blocks.
+
+It follows the semantics of cadCAD's local execution mode: in every timestep
+the blocks run in order, each block's policies see the state left behind by
+the previous block, all of a block's state update functions see the same state
+and its policies' aggregated output, and a record of the state is kept after
+every substep. The difference is that cadCAD deep-copies the entire state
+(including the network) before every substep, while the Engine passes the same
+objects along. That makes it much faster, and it means records share the
+network and commons objects, which always reflect the latest state. Only the
+records of the final timestep get their own copy of the state, so that they
+hold the same values as cadCAD's records would.
+
+Because the Engine owns the loop, it can stop after any timestep and continue
+later from a checkpoint (see checkpoint.py), observers can look at the
+state after every timestep while the run goes on (see history.py), and the
+run can end early once a stop condition holds (see stopping.py).
+"""
+import copy
+from typing import List, NamedTuple
+
+from checkpoint import save_checkpoint
+
+
+class Stopped(NamedTuple):
+    timestep: int
+    condition: str
+
+
+class Engine:
+    def __init__(self, partial_state_update_blocks: List[dict], params: dict, record_substeps=None,
+                 checkpoint_every: int = None, checkpoint_path: str = None, observers: List = None,
+                 stop_conditions: List = None, gc_manager=None):
+        """
+        params is the 'M' dict of simulation parameters. record_substeps
+        selects which substeps are recorded (None records all of them, like
+        cadCAD). If checkpoint_every is set, a checkpoint is written to
+        checkpoint_path after every checkpoint_every timesteps.
+
+        observers are called with the state at the start of a new run and
+        after every timestep. They must not modify it.
+
+        stop_conditions are stopping.StopCondition instances, evaluated before
+        every timestep. Once one of them holds, the remaining timesteps are
+        filled in by fill() instead of being simulated, and Engine.stopped
+        tells when and why.
+
+        A gcmanager.GCManager collects garbage after every checkpoint.
+        """
+        if checkpoint_every and not checkpoint_path:
+            raise Exception("checkpoint_every needs a checkpoint_path")
+        self.partial_state_update_blocks = partial_state_update_blocks
+        self.params = params
+        self.record_substeps = record_substeps
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_path = checkpoint_path
+        self.observers = observers or []
+        self.stop_conditions = stop_conditions or []
+        self.gc_manager = gc_manager
+        self.state = None
+        self.stopped = None
+
+    def run(self, state: dict, timesteps: int, records: List[dict] = None) -> List[dict]:
+        """
+        Runs the simulation until timestep timesteps and returns the records.
+        The state at the end of the run is kept in Engine.state.
+
+        Without records, state is the initial state of a new run, which is
+        tagged and recorded as timestep 0 the same way cadCAD does. To resume a
+        run, pass the state and records of a checkpoint instead; records is
+        then appended to.
+        """
+        if records is None:
+            state, records = self.start(state)
+
+        for timestep in range(state["timestep"] + 1, timesteps + 1):
+            condition = next((c for c in self.stop_conditions if c.holds(self.params, state)), None)
+            if condition:
+                self.fill(condition, state, timesteps, records)
+                break
+            self.step(state, timestep, records, copy_records=timestep == timesteps)
+            for observer in self.observers:
+                observer(state)
+            if self.checkpoint_every and timestep % self.checkpoint_every == 0:
+                self.checkpoint(state, records)
+        self.state = state
+        return records
+
+    def checkpoint(self, state: dict, records: List[dict]):
+        save_checkpoint(self.checkpoint_path, state, self.params, records)
+        if self.gc_manager:
+            self.gc_manager.collect()
+
+    def start(self, state: dict):
+        """
+        Tags state as timestep 0 of a new run. Returns the tagged copy and the
+        records holding it.
+        """
+        state = dict(state)
+        state["simulation"], state["subset"], state["run"], state["substep"], state["timestep"] = 0, 0, 1, 0, 0
+        for observer in self.observers:
+            observer(state)
+        return state, [dict(state)]
+
+    def fill(self, condition, state: dict, timesteps: int, records: List[dict]):
+        """
+        Appends the records of the timesteps after state up to timesteps, as
+        extrapolated by condition. Like in a simulated timestep, a substep's
+        record holds the previous timestep's value of a state variable that no
+        block up to that substep has updated yet.
+        """
+        params = self.params
+        stopped_at = state["timestep"]
+        substeps = range(1, len(self.partial_state_update_blocks) + 1)
+        updated = [set()]
+        for block in self.partial_state_update_blocks:
+            updated.append(updated[-1] | set(block["variables"]))
+
+        values = {}
+        for timestep in range(stopped_at + 1, timesteps + 1):
+            previous = values
+            values = condition.extrapolate(params, state, timestep - stopped_at)
+            for substep in substeps:
+                if self.record_substeps is None or substep in self.record_substeps:
+                    record = dict(state, substep=substep, timestep=timestep)
+                    record.update({k: v if k in updated[substep] else previous.get(k, state[k])
+                                   for k, v in values.items()})
+                    records.append(record)
+            for observer in self.observers:
+                observer(dict(state, **values, substep=substeps[-1], timestep=timestep))
+
+        condition.advance(params, state, timesteps - stopped_at)
+        state.update(values)
+        state["substep"], state["timestep"] = substeps[-1], timesteps
+
+        # As in step(), the final timestep's records hold copies of the state.
+        for i in range(len(records) - 1, -1, -1):
+            if records[i]["timestep"] != timesteps:
+                break
+            records[i] = copy.deepcopy(records[i])
+        self.stopped = Stopped(stopped_at, condition.name)
+
+    def step(self, state: dict, timestep: int, records: List[dict], copy_records: bool = False,
+             params: dict = None):
+        """
+        Runs all blocks once. state is updated in place. If copy_records is
+        set, the records are deep copies of the state instead of sharing its
+        objects. params replaces Engine.params for this timestep only.
+        """
+        params = params or self.params
+        for substep, block in enumerate(self.partial_state_update_blocks, start=1):
+            _input = {}
+            for policy in block["policies"].values():
+                for k, v in policy(params, substep, records, state).items():
+                    _input[k] = _input[k] + v if k in _input else v
+
+            updates = [f(params, substep, records, state, _input) for f in block["variables"].values()]
+            state.update(updates)
+            state["substep"], state["timestep"] = substep, timestep
+
+            if self.record_substeps is None or substep in self.record_substeps:
+                records.append(copy.deepcopy(state) if copy_records else dict(state))
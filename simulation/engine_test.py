@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+from engine import Engine
+from simrunner import get_simulation_results, run_simulation
+from network_utils import get_participants
+from simulation import (CommonsSimulationConfiguration, bootstrap_simulation, network_snapshot,
+                        partial_state_update_blocks)
+
+STATE_VARIABLES = ["funding_pool", "collateral_pool", "token_supply", "token_price", "sentiment"]
+
+
+class TestEngine(unittest.TestCase):
+    def test_same_records_as_cadcad(self):
+        """
+        The native engine must follow cadCAD's semantics exactly: with the same
+        random seed, every substep of every timestep should hold the same
+        values.
+        """
+        df_cadcad = run_simulation(CommonsSimulationConfiguration(random_seed=5, timesteps_days=10))
+        df_native = run_simulation(CommonsSimulationConfiguration(random_seed=5, timesteps_days=10), engine="native")
+
+        self.assertEqual(list(df_native.columns), list(df_cadcad.columns))
+        self.assertEqual(df_native.shape, df_cadcad.shape)
+        for col in STATE_VARIABLES + ["timestep", "substep"]:
+            np.testing.assert_array_equal(df_native[col].values, df_cadcad[col].values)
+
+    def test_same_results_as_cadcad(self):
+        """
+        The final records hold copies of the state, so the final network used
+        for the proposal counts and the score is the same as with cadCAD.
+        """
+        result_cadcad, _ = get_simulation_results(CommonsSimulationConfiguration(random_seed=3, timesteps_days=40))
+        result_native, _ = get_simulation_results(CommonsSimulationConfiguration(random_seed=3, timesteps_days=40),
+                                                  engine="native")
+        self.assertEqual(result_native, result_cadcad)
+
+    def test_record_substeps(self):
+        initial_conditions, simulation_parameters = bootstrap_simulation(
+            CommonsSimulationConfiguration(random_seed=1, timesteps_days=5))
+        engine = Engine(partial_state_update_blocks, simulation_parameters["M"], record_substeps={2})
+        records = engine.run(initial_conditions, 5)
+
+        # The initial state is always recorded as timestep 0, substep 0
+        self.assertEqual([(r["timestep"], r["substep"]) for r in records],
+                         [(0, 0)] + [(t, 2) for t in range(1, 6)])
+
+    def test_network_snapshots(self):
+        """
+        With the network_snapshot block at the end of every timestep, the
+        network recorded before it is left as it was at the end of that
+        timestep, while the simulation continues with the snapshot.
+        """
+        initial_conditions, simulation_parameters = bootstrap_simulation(
+            CommonsSimulationConfiguration(random_seed=1, timesteps_days=5))
+        blocks = partial_state_update_blocks + [network_snapshot]
+        engine = Engine(blocks, simulation_parameters["M"], record_substeps={len(blocks) - 1})
+        records = engine.run(initial_conditions, 5)
+
+        networks = [r["network"] for r in records[1:]]
+        self.assertEqual(len({id(network) for network in networks}), 5)
+        for timestep, network in enumerate(networks, start=1):
+            ages = [p.holdings.age_days for _, p in get_participants(network)]
+            self.assertEqual(max(ages), timestep)
+
+    def test_checkpoint_every_needs_path(self):
+        with self.assertRaises(Exception):
+            Engine(partial_state_update_blocks, {}, checkpoint_every=10)
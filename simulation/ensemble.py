@@ -0,0 +1,608 @@
+"""
+Many Monte Carlo runs of one configuration, simulated in lockstep.
+
+engine.Engine runs partial_state_update_blocks once per run, and most of the
+time goes into the interpreter walking the network one Participant, Proposal
+or support edge at a time. An Ensemble holds R runs at once in NumPy arrays
+that all have a leading run axis instead:
+
+    commons        (R,)       funding pool, collateral pool, token supply...
+    participants   (R, P)     sentiment and the TokenBatch's fields
+    proposals      (R, Q)     status, funds requested, trigger, age, conviction
+    support edges  (R, P, Q)  affinity, tokens, conviction, is_author
+
+and step() applies the logic of every block in policies.py to all runs with a
+fixed number of NumPy operations, so R runs cost about one run's interpreter
+overhead plus the array work. Voting, conviction, sentiment and the buy
+and sell decisions go through kernels.py, which can compile them with numba.
+Runs gain and lose different numbers of
+Participants and Proposals, so P and Q are capacities: participant_mask tells
+which slots hold a Participant that has not exited, and a Proposal status of
+0 marks an empty slot. Every live Participant has a support edge to every
+Proposal, as in the network. The support edges take up most of the memory;
+with dtype="float32" they take half as much, while the Commons, holdings and
+Proposals stay float64 and sums over support edges are taken in float64.
+
+The blocks behave as in policies.py, with a few differences in how they draw
+random numbers, which make a run of an Ensemble a different sample than an
+engine.Engine run with the same seed, but not a different model:
+
+- All runs share one RandomState and draw in bulk, e.g. both of an Active
+  Proposal's Bernoulli trials are drawn whether or not the first succeeds.
+- GenerateNewParticipant.p_randomly() returns the same dict for every new
+  Participant of a timestep, so they all invest the last investment drawn.
+  The Ensemble draws that one investment per run.
+
+How many Participants may arrive comes from
+GenerateNewParticipant.arrivals() itself, so the stress scenarios'
+parameters (see scenarios.py) apply to an Ensemble too. Parameters the
+Ensemble does not model, e.g. scheduled Proposal lifetimes or archiving, are
+rejected rather than ignored.
+
+Bootstrap an Ensemble with the same code a single run uses:
+
+    ensemble = bootstrap_ensemble(256, random_seed=1, timesteps_days=730)
+    ensemble.run(730)
+    ensemble.results()  # one simrunner result dict per run, with its score
+"""
+import argparse
+import json
+from typing import Dict, List
+
+import numpy as np
+
+import abcurve
+import config
+from arraynetwork import DTYPES
+from convictionvoting import trigger_thresholds
+from entities import ProposalStatus
+from hatch import vesting_curve
+from kernels import BACKENDS, get_kernels
+from network_utils import get_participants, get_proposals, get_support_edges
+from policies import GenerateNewParticipant
+from score import CommonsScore, Metrics
+from simulation import CommonsSimulationConfiguration, bootstrap_simulation
+
+CANDIDATE = ProposalStatus.CANDIDATE.value
+ACTIVE = ProposalStatus.ACTIVE.value
+COMPLETED = ProposalStatus.COMPLETED.value
+FAILED = ProposalStatus.FAILED.value
+
+SYNCED_VARIABLES = ("funding_pool", "collateral_pool", "token_supply", "token_price", "sentiment")
+PARTICIPANT_FIELDS = ("participant_sentiment", "vesting", "vesting_spent", "nonvesting", "age_days",
+                      "cliff_days", "halflife_days")
+PROPOSAL_FIELDS = ("status", "funds_requested", "trigger", "age", "proposal_conviction")
+SUPPORT_FIELDS = ("affinity", "tokens", "conviction", "is_author")
+# The simulation parameters an Ensemble models. It draws from its own
+# RandomState instead of the random number funcs.
+MODELED_PARAMS = ("debug", "alpha_days_to_80p_of_max_voting_weight", "max_proposal_request", "random_seed",
+                  "probability_func", "exponential_func", "gamma_func", "random_number_func", "choice_func",
+                  "speculation_days", "multiplier_new_participants", "proposal_lifetimes", "archive_proposals",
+                  "max_new_participants", "arrival_rate_denominator", "load_profile")
+
+
+def _grow(array: np.ndarray, axis: int, size: int) -> np.ndarray:
+    """
+    array padded with zeros along axis up to size.
+    """
+    pad = [(0, 0)] * array.ndim
+    pad[axis] = (0, size - array.shape[axis])
+    return np.pad(array, pad)
+
+
+class Ensemble:
+    def __init__(self, states: List[dict], params: List[dict], random_seed=None, backend: str = None,
+                 dtype: str = "float64", configurations: List[CommonsSimulationConfiguration] = None):
+        """
+        states and params are the initial conditions and the 'M' dicts of
+        simulation parameters of the runs, as bootstrap_simulation() returns
+        them. The Ensemble copies everything it needs out of the networks and
+        Commons, and draws its random numbers from its own RandomState seeded
+        with random_seed instead of the random number funcs in params.
+
+        backend selects the kernels.py backend of the busiest blocks (by
+        default numba if it is installed), dtype one of arraynetwork.DTYPES
+        for the support edges. configurations are the runs'
+        CommonsSimulationConfigurations, which results() needs for the score.
+        """
+        if np.dtype(dtype).name not in DTYPES:
+            raise Exception("Unsupported dtype {}, expected one of {}".format(dtype, DTYPES))
+        if any(p.get("proposal_lifetimes", "daily") != "daily" for p in params):
+            raise Exception("The Ensemble only supports proposal_lifetimes=\"daily\"")
+        if any(p.get("archive_proposals") for p in params):
+            raise Exception("The Ensemble does not support archive_proposals")
+        unmodeled = sorted({key for p in params for key in p if key not in MODELED_PARAMS})
+        if unmodeled:
+            raise Exception("The Ensemble does not model the simulation parameters {}".format(unmodeled))
+        self.configurations = configurations
+        self.params = params
+        self.dtype = np.dtype(dtype)
+        R = self.runs = len(states)
+        self.random_state = np.random.RandomState(random_seed)
+        self.kernels = get_kernels(backend)
+        self.timestep = 0
+
+        self.alpha = np.array([p["alpha_days_to_80p_of_max_voting_weight"] for p in params])
+        self.max_proposal_request = np.array([p["max_proposal_request"] for p in params])
+
+        commons = [s["commons"] for s in states]
+        self.kappa = np.array([c.bonding_curve.kappa for c in commons], dtype=np.float64)
+        self.invariant = np.array([c.bonding_curve.invariant for c in commons])
+        self.exit_tribute = np.array([c.exit_tribute for c in commons], dtype=np.float64)
+        self._funding_pool = np.array([c._funding_pool for c in commons])
+        self._collateral_pool = np.array([c._collateral_pool for c in commons])
+        self._token_supply = np.array([c._token_supply for c in commons])
+        for name in SYNCED_VARIABLES:
+            setattr(self, name, np.array([s[name] for s in states], dtype=np.float64))
+
+        participants = [sorted(get_participants(s["network"])) for s in states]
+        proposals = [sorted(get_proposals(s["network"])) for s in states]
+        P = max(len(p) for p in participants)
+        Q = max(len(p) for p in proposals)
+
+        self.participant_slots = np.array([len(p) for p in participants])
+        self.proposal_slots = np.array([len(p) for p in proposals])
+        self.participant_mask = np.zeros((R, P), dtype=bool)
+        for name in PARTICIPANT_FIELDS:
+            setattr(self, name, np.zeros((R, P)))
+        self.status = np.zeros((R, Q), dtype=np.int8)
+        self.funds_requested = np.zeros((R, Q))
+        self.trigger = np.zeros((R, Q))
+        self.age = np.zeros((R, Q))
+        self.proposal_conviction = np.zeros((R, Q))
+        self.affinity = np.zeros((R, P, Q), dtype=self.dtype)
+        self.tokens = np.zeros((R, P, Q), dtype=self.dtype)
+        self.conviction = np.zeros((R, P, Q), dtype=self.dtype)
+        self.is_author = np.zeros((R, P, Q), dtype=bool)
+
+        for r, state in enumerate(states):
+            slot_of_participant = {}
+            for k, (i, participant) in enumerate(participants[r]):
+                slot_of_participant[i] = k
+                holdings = participant.holdings
+                self.participant_mask[r, k] = True
+                self.participant_sentiment[r, k] = participant.sentiment
+                for name in PARTICIPANT_FIELDS[1:]:
+                    getattr(self, name)[r, k] = getattr(holdings, name)
+            slot_of_proposal = {}
+            for k, (j, proposal) in enumerate(proposals[r]):
+                slot_of_proposal[j] = k
+                self.status[r, k] = proposal.status.value
+                self.funds_requested[r, k] = proposal.funds_requested
+                self.trigger[r, k] = proposal.trigger
+                self.age[r, k] = proposal.age
+                self.proposal_conviction[r, k] = proposal.conviction
+            for i, j, support in get_support_edges(state["network"]):
+                e = r, slot_of_participant[i], slot_of_proposal[j]
+                self.affinity[e], self.tokens[e], self.conviction[e], self.is_author[e] = support
+
+        self.policy_output = {}
+        self.history = {name: [getattr(self, name).copy()] for name in SYNCED_VARIABLES}
+        self.counts = self._counts()
+
+    @property
+    def proposal_mask(self) -> np.ndarray:
+        return self.status > 0
+
+    @property
+    def support_mask(self) -> np.ndarray:
+        """
+        Which (run, participant, proposal) slots hold a support edge.
+        """
+        return self.participant_mask[:, :, None] & self.proposal_mask[:, None, :]
+
+    # Storage
+    def _compact_participants(self):
+        """
+        Moves every run's live Participants to the front of the participant
+        axis, freeing the slots of the Participants that exited.
+        """
+        order = np.argsort(~self.participant_mask, axis=1, kind="stable")
+        for name in ("participant_mask",) + PARTICIPANT_FIELDS:
+            setattr(self, name, np.take_along_axis(getattr(self, name), order, axis=1))
+        for name in SUPPORT_FIELDS:
+            setattr(self, name, np.take_along_axis(getattr(self, name), order[:, :, None], axis=1))
+        freed = ~self.participant_mask
+        for name in PARTICIPANT_FIELDS + SUPPORT_FIELDS:
+            getattr(self, name)[freed] = 0
+        self.participant_slots = self.participant_mask.sum(axis=1)
+
+    def _reserve(self, participants: int = 0, proposals: int = 0):
+        """
+        Makes room for participants more Participants and proposals more
+        Proposals in every run. Exited Participants' slots are reclaimed
+        before the participant axis grows, and the capacity at least doubles
+        whenever it has to grow, so that adding Participants costs amortized
+        O(1).
+        """
+        P, Q = self.participant_mask.shape[1], self.status.shape[1]
+        if (self.participant_slots + participants).max() > P:
+            self._compact_participants()
+        needed_P = (self.participant_slots + participants).max()
+        needed_Q = (self.proposal_slots + proposals).max()
+        if needed_P > P:
+            size = max(needed_P, 2 * P)
+            for name in ("participant_mask",) + PARTICIPANT_FIELDS:
+                setattr(self, name, _grow(getattr(self, name), 1, size))
+            for name in SUPPORT_FIELDS:
+                setattr(self, name, _grow(getattr(self, name), 1, size))
+        if needed_Q > Q:
+            size = max(needed_Q, 2 * Q)
+            for name in PROPOSAL_FIELDS:
+                setattr(self, name, _grow(getattr(self, name), 1, size))
+            for name in SUPPORT_FIELDS:
+                setattr(self, name, _grow(getattr(self, name), 2, size))
+
+    def _new_slots(self, counts: np.ndarray, next_slot: np.ndarray):
+        """
+        The (run, slot, k) indices of counts[run] new slots per run, starting
+        at next_slot[run], k numbering them within their run.
+        """
+        runs = np.repeat(np.arange(self.runs), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return runs, next_slot[runs] + k, k
+
+    # The commons
+    def _deposit(self, dai: np.ndarray) -> np.ndarray:
+        """
+        Commons.deposit() for every run with dai > 0. Returns the tokens minted.
+        """
+        depositing = dai > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tokens, _ = abcurve.mint(dai, self._collateral_pool, self._token_supply, self.kappa, self.invariant)
+        tokens = np.where(depositing, tokens, 0)
+        self._token_supply = self._token_supply + tokens
+        self._collateral_pool = self._collateral_pool + np.where(depositing, dai, 0)
+        return tokens
+
+    def _burn(self, tokens: np.ndarray):
+        """
+        Commons.burn() for every run with tokens > 0.
+        """
+        burning = tokens > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dai, _ = abcurve.withdraw(tokens, self._collateral_pool, self._token_supply, self.kappa, self.invariant)
+        dai = np.where(burning, dai, 0)
+        self._token_supply = self._token_supply - np.where(burning, tokens, 0)
+        self._collateral_pool = self._collateral_pool - dai
+        self._funding_pool = self._funding_pool + self.exit_tribute * dai
+
+    def _spot_price(self) -> np.ndarray:
+        return abcurve.spot_price(self._collateral_pool, self.kappa, self.invariant)
+
+    def _holdings_total(self) -> np.ndarray:
+        return self.vesting - self.vesting_spent + self.nonvesting
+
+    def _counts(self) -> dict:
+        """
+        The number of Participants, and the number of Proposals and their
+        funds requested by status.
+        """
+        counts = {"participants": self.participant_mask.sum(axis=1)}
+        for status in ProposalStatus:
+            has_status = self.status == status.value
+            counts[status.name.lower()] = has_status.sum(axis=1)
+            counts["funds_" + status.name.lower()] = np.where(has_status, self.funds_requested, 0).sum(axis=1)
+        return counts
+
+    # The blocks, in the order of simulation.partial_state_update_blocks
+    def step(self):
+        """
+        Runs all blocks once for every run.
+        """
+        self.timestep += 1
+        self.generate_new_participants()
+        self.update_token_batch_age()
+        # summarize_simulation() takes the final counts from substep 2
+        self.counts = self._counts()
+        self.sync_state_variables()
+        self.generate_new_proposals()
+        self.generate_new_funding()
+        self.update_age_and_conviction_thresholds()
+        self.make_proposals_active()
+        self.update_sentiment_when_proposals_become_active()
+        self.sync_state_variables()
+        self.finish_active_proposals()
+        self.update_sentiment_when_proposals_become_failed_or_completed()
+        self.vote_on_proposals()
+        self.calculate_conviction()
+        self.buy_tokens()
+        self.sync_state_variables()
+        self.sell_tokens()
+        self.exit_participants()
+        self.decay_sentiment()
+        self.sync_state_variables()
+        for name in SYNCED_VARIABLES:
+            self.history[name].append(getattr(self, name).copy())
+
+    def run(self, timesteps: int) -> Dict[str, np.ndarray]:
+        """
+        Steps every run until timestep timesteps. Returns the synced state
+        variables at the end of every timestep so far, as arrays of shape
+        (runs, timesteps + 1) starting with the initial conditions.
+        """
+        while self.timestep < timesteps:
+            self.step()
+        return {name: np.stack(values, axis=1) for name, values in self.history.items()}
+
+    def generate_new_participants(self):
+        R = self.runs
+        random_state = self.random_state
+        allowed = [GenerateNewParticipant.arrivals(params, self.timestep - 1, sentiment)
+                   for params, sentiment in zip(self.params, self.sentiment)]
+        maximum = np.array([m for m, _ in allowed], dtype=np.int64)
+        arrival_rate = np.array([rate for _, rate in allowed])
+        rv = random_state.rand(R, maximum.max())
+        arrivals = ((rv < arrival_rate[:, None]) & (np.arange(rv.shape[1]) < maximum[:, None])).sum(axis=1)
+
+        investment = random_state.standard_exponential(R) * config.investment_new_participant_stdev + \
+            config.investment_new_participant_min
+        tokens = investment / self._spot_price()
+        self._deposit(arrivals * investment)
+
+        self._reserve(participants=arrivals.max())
+        runs, slots, k = self._new_slots(arrivals, self.participant_slots)
+        self.participant_mask[runs, slots] = True
+        self.participant_sentiment[runs, slots] = random_state.rand(len(runs))
+        self.nonvesting[runs, slots] = tokens[runs]
+        rv = random_state.rand(len(runs), self.status.shape[1])
+        self.affinity[runs, slots] = 1 - 4 * (1 - rv) * rv
+        self.participant_slots = self.participant_slots + arrivals
+
+    def update_token_batch_age(self):
+        self.age_days += self.participant_mask
+
+    def sync_state_variables(self):
+        self.funding_pool = self._funding_pool.copy()
+        self.collateral_pool = self._collateral_pool.copy()
+        self.token_supply = self._token_supply.copy()
+        self.token_price = self._spot_price()
+        participants = self.participant_mask.sum(axis=1)
+        total = np.where(self.participant_mask, self.participant_sentiment, 0).sum(axis=1)
+        self.sentiment = np.divide(total, participants, out=np.zeros(self.runs), where=participants > 0)
+
+    def generate_new_proposals(self):
+        R = self.runs
+        random_state = self.random_state
+        participants = self.participant_mask.sum(axis=1)
+
+        # choice_func() picks one of the Participants
+        pick = np.floor(random_state.rand(R) * participants)
+        proposer = (np.cumsum(self.participant_mask, axis=1) <= pick[:, None]).sum(axis=1)
+
+        total_funds_requested = np.where(self.status == CANDIDATE, self.funds_requested, 0).sum(axis=1)
+        # The median of every run's support edges' affinities, with the
+        # missing edges sorted to the end
+        support_mask = self.support_mask.reshape(R, -1)
+        affinities = np.sort(np.where(support_mask, self.affinity.reshape(R, -1), np.inf), axis=1)
+        edges = support_mask.sum(axis=1)
+        has_edges = edges > 0
+        lower = np.maximum(edges - 1, 0) // 2
+        upper = edges // 2
+        median_affinity = np.where(has_edges, (np.take_along_axis(affinities, lower[:, None], axis=1)[:, 0] +
+                                               np.take_along_axis(affinities, upper[:, None], axis=1)[:, 0]) / 2, 0)
+        proposal_rate = median_affinity / (1 + total_funds_requested / self.funding_pool)
+        new = (random_state.rand(R) < proposal_rate) & has_edges
+
+        funds_requested = random_state.standard_gamma(config.funds_requested_alpha, R) * \
+            self.funding_pool * config.scale_factor + config.funds_requested_min
+        rv = random_state.rand(R, self.participant_mask.shape[1])
+
+        self._reserve(proposals=1)
+        runs = np.nonzero(new)[0]
+        slots = self.proposal_slots[runs]
+        self.status[runs, slots] = CANDIDATE
+        self.funds_requested[runs, slots] = funds_requested[runs]
+        self.trigger[runs, slots] = trigger_thresholds(funds_requested[runs], self.funding_pool[runs],
+                                                       self.token_supply[runs], self.max_proposal_request[runs])
+        self.affinity[runs, :, slots] = np.where(self.participant_mask[runs], 1 - 4 * (1 - rv[runs]) * rv[runs], 0)
+        self.affinity[runs, proposer[runs], slots] = 1
+        self.is_author[runs, proposer[runs], slots] = True
+        self.proposal_slots = self.proposal_slots + new
+
+    def generate_new_funding(self):
+        exits = self.random_state.standard_exponential((self.runs, config.speculators)) * \
+            config.speculator_position_size_stdev + config.speculator_position_size_min
+        self._funding_pool = self._funding_pool + exits.sum(axis=1) * self.exit_tribute
+
+    def _thresholds(self) -> np.ndarray:
+        return trigger_thresholds(self.funds_requested, self.funding_pool[:, None], self.token_supply[:, None],
+                                  self.max_proposal_request[:, None])
+
+    def update_age_and_conviction_thresholds(self):
+        candidates = self.status == CANDIDATE
+        self.age += candidates
+        self.trigger = np.where(candidates, self._thresholds(), self.trigger)
+
+    def make_proposals_active(self):
+        candidates = self.status == CANDIDATE
+        total_conviction = np.where(self.participant_mask[:, :, None], self.conviction, 0).sum(
+            axis=1, dtype=np.float64)
+        self.proposal_conviction = np.where(candidates, total_conviction, self.proposal_conviction)
+        passed = candidates & ~(self.proposal_conviction < self._thresholds())
+
+        spent = np.where(passed, self.funds_requested, 0).sum(axis=1)
+        overdrawn = self._funding_pool - spent < 0
+        if overdrawn.any():
+            r = np.argmax(overdrawn)
+            raise Exception("Run {}: {} funds requested but funding pool only has {}".format(
+                r, spent[r], self._funding_pool[r]))
+        self.status[passed] = ACTIVE
+        self._funding_pool = self._funding_pool - spent
+        self.policy_output = {"passed": passed}
+
+    def update_sentiment_when_proposals_become_active(self):
+        passed = self.policy_output["passed"]
+        authored = (self.is_author & passed[:, None, :]).sum(axis=2) * self.participant_mask
+        self.participant_sentiment = self.kernels.shift_sentiment(
+            self.participant_sentiment, authored > 0, authored * config.sentiment_bonus_proposal_becomes_active)
+
+    def finish_active_proposals(self):
+        actives = self.status == ACTIVE
+        with np.errstate(divide="ignore"):
+            log_funds = np.log(self.funds_requested)
+        r_failure = 1 / (config.base_failure_rate + log_funds)
+        r_success = 1 / (config.base_success_rate + log_funds)
+        rv = self.random_state.rand(2, *actives.shape)
+        failed = actives & (rv[0] < r_failure)
+        succeeded = actives & ~failed & (rv[1] < r_success)
+        self.status[failed] = FAILED
+        self.status[succeeded] = COMPLETED
+        self.policy_output = {"failed": failed, "succeeded": succeeded}
+
+    def update_sentiment_when_proposals_become_failed_or_completed(self):
+        # The sentiment is clipped after every Proposal, so each run applies
+        # its Proposals one at a time, the failed ones first, like the policy.
+        # Round k applies every run's k-th Proposal.
+        R = self.runs
+        failed, succeeded = self.policy_output["failed"], self.policy_output["succeeded"]
+        changed = np.concatenate([failed, succeeded], axis=1)
+        deltas = np.repeat([config.sentiment_bonus_proposal_becomes_failed,
+                            config.sentiment_bonus_proposal_becomes_completed], failed.shape[1])
+        order = np.argsort(~changed, axis=1, kind="stable")
+        runs = np.arange(R)
+        for k in range(changed.sum(axis=1).max()):
+            i = order[:, k]
+            q = i % failed.shape[1]
+            affected = changed[runs, i][:, None] & self.participant_mask & \
+                (self.is_author[runs, :, q] | (self.tokens[runs, :, q] > 0))
+            self.participant_sentiment = self.kernels.shift_sentiment(
+                self.participant_sentiment, affected, self.affinity[runs, :, q] * deltas[i][:, None])
+
+    def vote_on_proposals(self):
+        self.tokens = self.kernels.votes(self.affinity, self.tokens, self._holdings_total(),
+                                         self.status == CANDIDATE, self.participant_mask)
+
+    def calculate_conviction(self):
+        self.conviction = self.kernels.conviction(self.tokens, self.conviction, self.alpha,
+                                                  self.status == CANDIDATE, self.participant_mask)
+
+    def buy_tokens(self):
+        rv = self.random_state.rand(2, *self.participant_sentiment.shape)
+        buys, dai = self.kernels.buy_decisions(self.participant_sentiment, self.participant_mask, rv[0], rv[1])
+        total_dai = dai.sum(axis=1)
+
+        tokens = self._deposit(total_dai)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.where(buys, dai / total_dai[:, None], 0)
+        self.nonvesting = self.nonvesting + share * tokens[:, None]
+
+    def _spendable(self) -> np.ndarray:
+        vesting = (self.cliff_days > 0) & (self.halflife_days > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            unlocked = np.where(vesting, np.maximum(
+                vesting_curve(self.age_days, self.cliff_days, self.halflife_days), 0), 1.0)
+        return unlocked * self.vesting - self.vesting_spent + self.nonvesting
+
+    def sell_tokens(self):
+        rv = self.random_state.rand(2, *self.participant_sentiment.shape)
+        sells, tokens = self.kernels.sell_decisions(self.participant_sentiment, self.participant_mask, rv[0], rv[1],
+                                                    self._spendable())
+
+        self._burn(tokens.sum(axis=1))
+        # TokenBatch.spend()
+        y = tokens - self.nonvesting
+        self.vesting_spent = np.where(sells & (y > 0), self.vesting_spent + y, self.vesting_spent)
+        self.nonvesting = np.where(sells, np.where(y > 0, 0.0, np.abs(y)), self.nonvesting)
+
+    def exit_participants(self):
+        rv = self.random_state.rand(*self.participant_sentiment.shape)
+        engagement_rate = config.engagement_rate_multiplier_exit * self.participant_sentiment
+        exits = self.participant_mask & (self.participant_sentiment < config.sentiment_sensitivity_exit) & \
+            (self.vesting == 0) & (rv < 1 - engagement_rate)
+        self._burn(np.where(exits, self._holdings_total(), 0).sum(axis=1))
+        self.participant_mask = self.participant_mask & ~exits
+
+    def decay_sentiment(self):
+        self.participant_sentiment = self.kernels.decay_sentiment(self.participant_sentiment, self.participant_mask,
+                                                                  config.sentiment_decay)
+
+    # Results
+    def metrics(self) -> List[Metrics]:
+        """
+        score.Metrics of every run at substep 2 of the current timestep.
+        """
+        counts = self.counts
+        return [Metrics(participants=int(counts["participants"][r]),
+                        candidates=int(counts["candidate"][r]), funds_candidates=counts["funds_candidate"][r],
+                        actives=int(counts["active"][r]), funds_actives=counts["funds_active"][r],
+                        completed=int(counts["completed"][r]), funds_completed=counts["funds_completed"][r],
+                        failed=int(counts["failed"][r]), funds_failed=counts["funds_failed"][r])
+                for r in range(self.runs)]
+
+    def results(self, configurations: List[CommonsSimulationConfiguration] = None) -> List[dict]:
+        """
+        The results of every run in the format of
+        simrunner.get_simulation_results(): the time series as recorded at
+        substep 2, where the synced state variables still hold the previous
+        timestep's values, and the final counts. The score needs each run's
+        CommonsSimulationConfiguration; without configurations, or when
+        CommonsScore fails for a run (e.g. because no Proposal failed), it is
+        None. configurations defaults to the Ensemble's own.
+        """
+        import pandas as pd
+
+        T = self.timestep
+        timeseries = {name: np.stack(self.history[name], axis=1)[:, :T] for name in
+                      ("funding_pool", "token_price", "sentiment")}
+        metrics = self.metrics()
+        configurations = configurations or self.configurations
+        ans = []
+        for r in range(self.runs):
+            result = {"timestep": list(range(1, T + 1))}
+            result.update({name: values[r].tolist() for name, values in timeseries.items()})
+            result["score"] = None
+            if configurations:
+                df_final = pd.DataFrame({name: values[r] for name, values in timeseries.items()})
+                try:
+                    result["score"] = CommonsScore(configurations[r], df_final, metrics=metrics[r]).eval()
+                except ZeroDivisionError:
+                    pass
+            result["participants"] = metrics[r].participants
+            result["proposals"] = {"candidates": metrics[r].candidates, "actives": metrics[r].actives,
+                                   "completed": metrics[r].completed, "failed": metrics[r].failed}
+            ans.append(result)
+        return ans
+
+
+def bootstrap_ensemble(runs: int, random_seed=None, backend: str = None, dtype: str = "float64",
+                       **kwargs) -> Ensemble:
+    """
+    Bootstraps runs runs of the CommonsSimulationConfiguration(**kwargs) with
+    the random seeds random_seed, random_seed + 1... (or unseeded) and returns
+    them as an Ensemble.
+    """
+    configurations = [CommonsSimulationConfiguration(
+        random_seed=None if random_seed is None else random_seed + r, **kwargs) for r in range(runs)]
+    bootstraps = [bootstrap_simulation(c) for c in configurations]
+    return Ensemble([b[0] for b in bootstraps], [b[1]["M"] for b in bootstraps], random_seed=random_seed,
+                    backend=backend, dtype=dtype, configurations=configurations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many runs of one configuration in lockstep")
+    parser.add_argument("--runs", type=int, default=256)
+    parser.add_argument("-T", "--timesteps_days", type=int, default=730)
+    parser.add_argument("--random_seed", type=int, default=None)
+    parser.add_argument("--hatchers", type=int, default=5)
+    parser.add_argument("--proposals", type=int, default=2)
+    parser.add_argument("--backend", choices=BACKENDS, help="the kernels' backend, see kernels.py")
+    parser.add_argument("--dtype", choices=DTYPES, default="float64",
+                        help="of the support edges, float32 takes half the memory")
+    parser.add_argument("--store", help="write the results into this result store (see resultstore.py) instead "
+                                        "of printing a line of JSON per run")
+    args = parser.parse_args()
+
+    ensemble = bootstrap_ensemble(args.runs, random_seed=args.random_seed, backend=args.backend, dtype=args.dtype,
+                                  hatchers=args.hatchers, proposals=args.proposals,
+                                  timesteps_days=args.timesteps_days)
+    ensemble.run(args.timesteps_days)
+    results = ensemble.results()
+    if args.store:
+        from resultstore import open_store
+        store = open_store(args.store, mode="r+")
+        for r, result in enumerate(results):
+            store.write_run(r, result)
+    else:
+        for result in results:
+            print(json.dumps(result))
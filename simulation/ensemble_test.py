@@ -0,0 +1,154 @@
+import unittest
+
+import numpy as np
+
+from engine import Engine
+from ensemble import Ensemble, SYNCED_VARIABLES, bootstrap_ensemble
+from score import network_metrics
+from simrunner import get_simulation_results
+from simulation import CommonsSimulationConfiguration, bootstrap_simulation, partial_state_update_blocks
+
+
+class ConstantRandomState:
+    """
+    Stands in for an Ensemble's RandomState, drawing the same numbers as the
+    funcs of constant_params().
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def rand(self, *shape):
+        return np.full(shape, self.value)
+
+    def standard_exponential(self, size):
+        return np.ones(size)
+
+    def standard_gamma(self, alpha, size):
+        return np.full(size, float(alpha))
+
+
+def constant_params(params, value):
+    params = dict(params)
+    params["probability_func"] = lambda rate: value < rate
+    params["random_number_func"] = lambda: value
+    params["exponential_func"] = lambda loc, scale: scale + loc
+    params["gamma_func"] = lambda alpha, loc, scale: alpha * scale + loc
+    params["choice_func"] = lambda choices: choices[int(value * len(choices))]
+    return params
+
+
+def bootstrap(seed, hatchers):
+    initial_conditions, simulation_parameters = bootstrap_simulation(
+        CommonsSimulationConfiguration(random_seed=seed, hatchers=hatchers, proposals=3))
+    return initial_conditions, simulation_parameters["M"]
+
+
+class TestEnsemble(unittest.TestCase):
+    def test_same_as_engine_with_the_same_random_numbers(self):
+        """
+        With random numbers that do not depend on the order in which they are
+        drawn, every run of an Ensemble follows the same path as the same run
+        on engine.Engine, although the runs have different numbers of
+        Participants and Proposals.
+        """
+        T = 60
+        runs = [(1, 5), (2, 12), (3, 8)]
+        for value in (0.05, 0.2, 0.5):
+            with self.subTest(value=value):
+                bootstraps = [bootstrap(seed, hatchers) for seed, hatchers in runs]
+                ensemble = Ensemble([s for s, _ in bootstraps], [constant_params(p, value) for _, p in bootstraps])
+                ensemble.random_state = ConstantRandomState(value)
+                history = ensemble.run(T)
+                metrics = ensemble.metrics()
+
+                for r, (seed, hatchers) in enumerate(runs):
+                    state, params = bootstrap(seed, hatchers)
+                    engine = Engine(partial_state_update_blocks, constant_params(params, value),
+                                    record_substeps={2, len(partial_state_update_blocks)})
+                    records = engine.run(state, T)
+                    for name in SYNCED_VARIABLES:
+                        np.testing.assert_allclose(history[name][r], [rec[name] for rec in records
+                                                                      if rec["substep"] != 2], rtol=1e-9)
+                    np.testing.assert_allclose(metrics[r], network_metrics(records[-2]["network"]), rtol=1e-9)
+
+    def test_results(self):
+        ensemble = bootstrap_ensemble(4, random_seed=3, timesteps_days=40)
+        ensemble.run(40)
+        results = ensemble.results()
+        expected, _ = get_simulation_results(CommonsSimulationConfiguration(random_seed=3, timesteps_days=40),
+                                             engine="native")
+
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertEqual(set(result), set(expected))
+            self.assertEqual(result["timestep"], expected["timestep"])
+            self.assertEqual(len(result["funding_pool"]), 40)
+        # The first record is taken before the first timestep changes anything
+        self.assertEqual(results[0]["funding_pool"][0], expected["funding_pool"][0])
+        self.assertEqual(results[0]["token_price"][0], expected["token_price"][0])
+
+    def test_unmodeled_parameters(self):
+        for overrides in ({"proposal_lifetimes": "scheduled"}, {"archive_proposals": True},
+                          {"not_a_parameter": 1}):
+            with self.subTest(**overrides):
+                state, params = bootstrap(1, 5)
+                params.update(overrides)
+                with self.assertRaises(Exception):
+                    Ensemble([state], [params])
+
+    def test_stress_parameters(self):
+        """
+        The stress scenarios' parameters go through
+        GenerateNewParticipant.arrivals(), as on engine.Engine.
+        """
+        bootstraps = [bootstrap(seed, 5) for seed in (1, 2)]
+        for _, params in bootstraps:
+            params["load_profile"] = lambda timestep, max_new_participants: 0
+        ensemble = Ensemble([s for s, _ in bootstraps], [p for _, p in bootstraps], random_seed=1)
+        ensemble.run(30)
+        self.assertEqual(ensemble.participant_slots.tolist(), [5, 5])
+
+    def test_seeded(self):
+        histories = []
+        for _ in range(2):
+            ensemble = bootstrap_ensemble(3, random_seed=7, timesteps_days=20)
+            histories.append(ensemble.run(20))
+        for name in SYNCED_VARIABLES:
+            np.testing.assert_array_equal(histories[0][name], histories[1][name])
+            self.assertEqual(histories[0][name].shape, (3, 21))
+
+    def test_float32_drift(self):
+        """
+        float32 support edges change the Commons by far less than the
+        randomness does, and pass the same Proposals.
+        """
+        ensembles = [bootstrap_ensemble(8, random_seed=1, timesteps_days=200, dtype=dtype)
+                     for dtype in ("float64", "float32")]
+        histories = [ensemble.run(200) for ensemble in ensembles]
+        self.assertEqual(ensembles[1].conviction.dtype, np.float32)
+        self.assertEqual(ensembles[1]._funding_pool.dtype, np.float64)
+        for name in ("funding_pool", "token_price"):
+            np.testing.assert_allclose(histories[1][name], histories[0][name], rtol=1e-5)
+        for m, expected in zip(ensembles[1].metrics(), ensembles[0].metrics()):
+            self.assertEqual((m.participants, m.candidates, m.actives, m.completed, m.failed),
+                             (expected.participants, expected.candidates, expected.actives, expected.completed,
+                              expected.failed))
+
+    def test_exited_participants_slots_are_reused(self):
+        """
+        With a constant 0.2, new Participants arrive with a sentiment of 0.2
+        every day of the speculation period and exit a few days later.
+        """
+        bootstraps = [bootstrap(seed, 5) for seed in (1, 2)]
+        ensemble = Ensemble([s for s, _ in bootstraps], [p for _, p in bootstraps])
+        ensemble.random_state = ConstantRandomState(0.2)
+        ensemble.run(60)
+        self.assertTrue((ensemble.participant_mask.sum(axis=1) == 5).all())
+        self.assertLess(ensemble.participant_mask.shape[1], 60)
+        # Hatchers never exit while they have vesting tokens
+        self.assertTrue(ensemble.participant_mask[:, :5].all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,8 @@ ProposalStatus = Enum("ProposalStatus", "CANDIDATE ACTIVE COMPLETED FAILED")
 
 
 class Proposal:
+    __slots__ = ("conviction", "status", "age", "funds_requested", "trigger")
+
     def __init__(self, funds_requested: int, trigger: float):
         self.conviction = 0
         self.status = ProposalStatus.CANDIDATE
@@ -59,16 +61,22 @@ class Proposal:
 
 
 class Participant:
-    def __init__(self, holdings: TokenBatch, probability_func, random_number_func):
-        self._probability_func = probability_func
-        self._random_number_func = random_number_func
-        self.sentiment = self._random_number_func()
+    """
+    Participants only hold their own state. There may be tens of thousands of
+    them in a network, so they have no __dict__, and the random number funcs
+    their decisions depend on are passed in by the policies instead of being
+    referenced from every Participant.
+    """
+    __slots__ = ("sentiment", "holdings")
+
+    def __init__(self, holdings: TokenBatch, sentiment: float):
+        self.sentiment = sentiment
         self.holdings = holdings
 
     def __repr__(self):
         return "<{} {}>".format(self.__class__.__name__, attrs(self))
 
-    def buy(self) -> float:
+    def buy(self, probability_func, random_number_func) -> float:
         """
         If the Participant decides to buy more tokens, returns the number of
         tokens. Otherwise, return 0.
@@ -79,12 +87,12 @@ class Participant:
         """
         engagement_rate = config.engagement_rate_multiplier_buy * self.sentiment
         force = self.sentiment - config.sentiment_sensitivity
-        if self._probability_func(engagement_rate) and force > 0:
-            delta_holdings = self._random_number_func() * force * config.delta_holdings_scale
+        if probability_func(engagement_rate) and force > 0:
+            delta_holdings = random_number_func() * force * config.delta_holdings_scale
             return delta_holdings
         return 0
 
-    def sell(self) -> float:
+    def sell(self, probability_func, random_number_func) -> float:
         """
         Decides to sell some tokens, and if so how many. If the Participant
         decides to sell some tokens, returns the number of tokens. Otherwise,
@@ -96,12 +104,12 @@ class Participant:
         """
         engagement_rate = config.engagement_rate_multiplier_sell * self.sentiment
         force = self.sentiment - config.sentiment_sensitivity
-        if self._probability_func(engagement_rate) and force < 0:
+        if probability_func(engagement_rate) and force < 0:
             spendable = self.holdings.spendable()
             # It is expected that the function returns a positive value for the
             # amount sold. 
             force = -1 * force 
-            delta_holdings = self._random_number_func() * force * spendable
+            delta_holdings = random_number_func() * force * spendable
             return delta_holdings
         return 0
 
@@ -119,7 +127,7 @@ class Participant:
         """
         return self.holdings.spend(x)
 
-    def create_proposal(self, total_funds_requested, median_affinity, funding_pool) -> bool:
+    def create_proposal(self, total_funds_requested, median_affinity, funding_pool, probability_func) -> bool:
         """
         Here the Participant will decide whether or not to create a new
         Proposal.
@@ -139,10 +147,10 @@ class Participant:
         percent_of_funding_pool_being_requested = total_funds_requested/funding_pool
         proposal_rate = median_affinity / \
             (1 + percent_of_funding_pool_being_requested)
-        new_proposal = self._probability_func(proposal_rate)
+        new_proposal = probability_func(proposal_rate)
         return new_proposal
 
-    def vote_on_candidate_proposals(self, candidate_proposals: dict) -> dict:
+    def vote_on_candidate_proposals(self, candidate_proposals: dict, probability_func) -> dict:
         """
         Here the Participant decides which Candidate Proposals he will stake
         tokens on. This method does not decide how many tokens he will stake
@@ -166,7 +174,7 @@ class Participant:
         """
         new_voted_proposals = {}
         engagement_rate = 1.0
-        if self._probability_func(engagement_rate):
+        if probability_func(engagement_rate):
             # Put your tokens on your favourite Proposals, where favourite is
             # calculated as 0.75 * (the affinity for the Proposal you like the
             # most) e.g. if there are 2 Proposals that you have affinity 0.8,
@@ -210,7 +218,7 @@ class Participant:
 
         return tokens_per_supported_proposal
 
-    def wants_to_exit(self):
+    def wants_to_exit(self, probability_func):
         """
         Returns True if the Participant wants to exit (if sentiment < 0.5,
         random chance of exiting) and if the Participant has no vesting
@@ -221,7 +229,7 @@ class Participant:
 
         if self.sentiment < sensitivity_exit and vesting == 0:
             engagement_rate = config.engagement_rate_multiplier_exit * self.sentiment
-            return self._probability_func(1-engagement_rate)
+            return probability_func(1-engagement_rate)
         return False
 
     def update_token_batch_age(self):
@@ -237,3 +245,101 @@ class ParticipantSupport(NamedTuple):
     tokens: float = 0.
     conviction: float = 0.
     is_author: bool = False
+
+
+class ProposalSchedule:
+    """
+    The days on which Active Proposals fail or complete, when their lifetimes
+    are sampled once as they become Active instead of being tried every day
+    (see ProposalFunding.su_schedule_proposal_endings()). Keyed by day, so
+    that a day only has to look at the Proposals that end on it.
+    """
+
+    def __init__(self):
+        self.days = {}
+
+    def __repr__(self):
+        return "<{} {}>".format(self.__class__.__name__, self.days)
+
+    def __len__(self):
+        return sum(len(endings) for endings in self.days.values())
+
+    def add(self, day: int, proposal_idx: int, status: ProposalStatus):
+        self.days.setdefault(day, []).append((proposal_idx, status))
+
+    def due(self, day: int) -> List[Tuple[int, ProposalStatus]]:
+        """
+        The (proposal_idx, status) of the Proposals that end on day.
+        """
+        return self.days.get(day, [])
+
+    def remove(self, day: int):
+        self.days.pop(day, None)
+
+
+class ProposalArchive:
+    """
+    Proposals that have failed or completed, kept out of the network (see
+    network_utils.archive_proposals()). Instead of a support edge from every
+    Participant, an archived Proposal keeps what reporting needs of them: how
+    many Participants staked on it, and the tokens and conviction they had on
+    it when it was archived.
+
+    Archived Proposals never change again, so copies of the archive share them.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.proposals = []
+        self.supporters = []
+        self.tokens = []
+        self.conviction = []
+        self.max_id = -1
+        self._slots = {}
+
+    def __repr__(self):
+        return "<{} {} proposals>".format(self.__class__.__name__, len(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, idx):
+        return idx in self._slots
+
+    def add(self, idx: int, proposal: Proposal, supports: List[ParticipantSupport]):
+        self.add_entry(idx, proposal, sum(1 for s in supports if s.tokens > 0),
+                       float(sum(s.tokens for s in supports)), float(sum(s.conviction for s in supports)))
+
+    def add_entry(self, idx: int, proposal: Proposal, supporters: int, tokens: float, conviction: float):
+        self._slots[idx] = len(self.ids)
+        self.ids.append(idx)
+        self.proposals.append(proposal)
+        self.supporters.append(supporters)
+        self.tokens.append(tokens)
+        self.conviction.append(conviction)
+        self.max_id = max(self.max_id, idx)
+
+    def entries(self, start: int = 0) -> List[tuple]:
+        """
+        The (idx, Proposal, supporters, tokens, conviction) of the Proposals
+        archived after the first start, as add_entry() takes them.
+        """
+        return list(zip(self.ids, self.proposals, self.supporters, self.tokens, self.conviction))[start:]
+
+    def item(self, idx: int) -> Proposal:
+        return self.proposals[self._slots[idx]]
+
+    def get_proposals(self, status: ProposalStatus = None) -> List[Tuple[int, Proposal]]:
+        return [(j, p) for j, p in zip(self.ids, self.proposals) if not status or p.status == status]
+
+    def summary(self, idx: int) -> dict:
+        k = self._slots[idx]
+        return {"supporters": self.supporters[k], "tokens": self.tokens[k], "conviction": self.conviction[k]}
+
+    def copy(self) -> "ProposalArchive":
+        archive = ProposalArchive()
+        for name in ("ids", "proposals", "supporters", "tokens", "conviction"):
+            setattr(archive, name, list(getattr(self, name)))
+        archive.max_id = self.max_id
+        archive._slots = dict(self._slots)
+        return archive
@@ -4,6 +4,8 @@ from unittest.mock import MagicMock, patch
 
 import numpy as np
 import math
+import pickle
+import sys
 
 import utils
 from entities import Participant, ParticipantSupport, Proposal, ProposalStatus
@@ -51,7 +53,8 @@ class TestParticipant(unittest.TestCase):
             "probability_func": new_probability_func(seed=None),
             "random_number_func": new_random_number_func(seed=None)
         }
-        self.p = Participant(TokenBatch(100, 100), self.params["probability_func"], self.params["random_number_func"])
+        self.random_number_func = self.params["random_number_func"]
+        self.p = Participant(TokenBatch(100, 100), self.random_number_func())
 
     def test_buy(self):
         """
@@ -61,12 +64,10 @@ class TestParticipant(unittest.TestCase):
 
         # Must set Participant's sentiment artificially high, because of Zargham's force calculation
         self.p.sentiment = 1
-        self.p._probability_func = always
-        delta_holdings = self.p.buy()
+        delta_holdings = self.p.buy(always, self.random_number_func)
         self.assertGreater(delta_holdings, 0)
 
-        self.p._probability_func = never
-        delta_holdings = self.p.buy()
+        delta_holdings = self.p.buy(never, self.random_number_func)
         self.assertEqual(delta_holdings, 0)
 
     def test_sell(self):
@@ -75,13 +76,11 @@ class TestParticipant(unittest.TestCase):
         If we set the probability to 0, 0 will be returned.
         """
 
-        self.p._probability_func = always
         self.p.sentiment = 0.1
-        delta_holdings = self.p.sell()
+        delta_holdings = self.p.sell(always, self.random_number_func)
         self.assertGreater(delta_holdings, 0)
 
-        self.p._probability_func = never
-        delta_holdings = self.p.sell()
+        delta_holdings = self.p.sell(never, self.random_number_func)
         self.assertEqual(delta_holdings, 0)
 
     def test_increase_holdings(self):
@@ -118,11 +117,9 @@ class TestParticipant(unittest.TestCase):
         get True. If not, we should get False.
         """
 
-        self.p._probability_func = always
-        self.assertTrue(self.p.create_proposal(10000, 0.5, 100000))
+        self.assertTrue(self.p.create_proposal(10000, 0.5, 100000, always))
 
-        self.p._probability_func = never
-        self.assertFalse(self.p.create_proposal(10000, 0.5, 100000))
+        self.assertFalse(self.p.create_proposal(10000, 0.5, 100000, never))
 
     def test_vote_on_candidate_proposals(self):
         """
@@ -136,12 +133,10 @@ class TestParticipant(unittest.TestCase):
             1: 1.0,
             2: 1.0,
         }
-        self.p._probability_func = never
-        ans = self.p.vote_on_candidate_proposals(candidate_proposals)
+        ans = self.p.vote_on_candidate_proposals(candidate_proposals, never)
         self.assertFalse(ans)
 
-        self.p._probability_func = always
-        ans = self.p.vote_on_candidate_proposals(candidate_proposals)
+        ans = self.p.vote_on_candidate_proposals(candidate_proposals, always)
         self.assertEqual(len(ans), 3)
 
     def test_vote_on_candidate_proposals_zargham_algorithm(self):
@@ -160,8 +155,7 @@ class TestParticipant(unittest.TestCase):
             2: 0.8,
             3: 0.4,
         }
-        self.p._probability_func = always
-        ans = self.p.vote_on_candidate_proposals(candidate_proposals)
+        ans = self.p.vote_on_candidate_proposals(candidate_proposals, always)
         reference = {
             0: 1.0,
             1: 0.9,
@@ -214,14 +208,12 @@ class TestParticipant(unittest.TestCase):
         """
         # Set a sentiment below the exit threshold
         self.p.sentiment = 0.2
-        self.p._probability_func = always
         # A participant with vesting should not be able to exit
-        self.assertFalse(self.p.wants_to_exit())
+        self.assertFalse(self.p.wants_to_exit(always))
         self.p.holdings.vesting = 0
         # After the participant has no vesting, he can exit
-        self.assertTrue(self.p.wants_to_exit())
-        self.p._probability_func = never
-        self.assertFalse(self.p.wants_to_exit())
+        self.assertTrue(self.p.wants_to_exit(always))
+        self.assertFalse(self.p.wants_to_exit(never))
 
 
 class TestParticipantSupport(unittest.TestCase):
@@ -243,3 +235,25 @@ class TestParticipantSupport(unittest.TestCase):
         self.assertEqual(self.pSupport.tokens, 0)
         self.assertEqual(self.pSupport.conviction, 0)
         self.assertEqual(self.pSupport.is_author, False)
+
+
+class TestEntitySize(unittest.TestCase):
+    """
+    Networks hold tens of thousands of these objects, so each of them must
+    stay within a byte budget (as measured by sys.getsizeof, which for
+    slotted objects covers all of their attributes' references).
+    """
+    BUDGETS = {Participant: 64, Proposal: 96, TokenBatch: 96}
+
+    def setUp(self):
+        self.entities = [Participant(TokenBatch(100, 100), 0.5), Proposal(500, 0.0),
+                         TokenBatch(100, 100, vesting_options=VestingOptions(10, 30))]
+
+    def test_byte_budget(self):
+        for entity in self.entities:
+            self.assertFalse(hasattr(entity, "__dict__"))
+            self.assertLessEqual(sys.getsizeof(entity), self.BUDGETS[type(entity)])
+
+    def test_pickle(self):
+        for entity in self.entities:
+            self.assertEqual(repr(pickle.loads(pickle.dumps(entity))), repr(entity))
@@ -0,0 +1,423 @@
+"""
+An engine that does not step through the quiet days of a run.
+
+Most of what happens in a day is decided by Bernoulli trials: whether a new
+Participant arrives, whether a Proposal is created, whether an Active
+Proposal fails or completes, and whether each Participant buys, sells or
+exits. A day is quiet when none of them succeeds and no Proposal passes. What
+is left of a quiet day is deterministic, apart from the speculators' funding:
+token batches and Candidate Proposals age, the Participants vote the same way
+as the day before, conviction grows towards the staked tokens and sentiment
+decays. Over a stretch of quiet days, all of that has a closed form (see
+stopping.py).
+
+EventEngine computes the hazard of every trial from the state at the start
+of a day, and with it the probability that the day is quiet. It draws one
+random number to decide whether it is. Quiet days are not run through the
+blocks; EventEngine keeps going through the following days from the closed
+form until one of them is not quiet, and only then brings the network up to
+date and fills in the quiet days' records. A day that is not quiet runs
+through the blocks as usual, but conditioned on something happening: the
+engine samples which trial succeeds first (ConditionedProbabilityFunc), and
+the trials before it fail.
+
+With proposal_lifetimes="scheduled", the Active Proposals have no daily
+trials: a day on which one of them is scheduled to end is never quiet.
+
+The speculators' funding is still drawn every day, because the funding pool
+decides the conviction thresholds and the proposal rate of the next day.
+
+The runs follow the same distribution as engine.Engine's, but not the same
+path for the same seed. How much they gain depends on the Commons: in the
+default configuration, somebody buys or sells almost every day and a new
+Proposal comes up every few days, so quiet days are rare and an EventEngine
+run is a little slower than an Engine run. It pays off for a Commons with few
+Participants that rarely trade.
+"""
+import copy
+from typing import List, Tuple
+
+import numpy as np
+
+import config
+from convictionvoting import trigger_threshold, trigger_thresholds
+from engine import Engine
+from entities import ProposalStatus
+from network_utils import (calc_median_affinity, calc_total_conviction, get_participants, get_proposals,
+                           get_support_edges, set_support)
+from policies import GenerateNewFunding, GenerateNewParticipant, ParticipantVoting
+from stopping import decayed_conviction
+
+SYNCED_VARIABLES = ("funding_pool", "collateral_pool", "token_supply", "token_price", "sentiment")
+FUNDING_BLOCK = "Generate new funding"
+DECAY_BLOCK = "Participants' sentiment decays"
+# What the blocks that save their policies' output save on a quiet day
+QUIET_POLICY_OUTPUTS = {
+    "Compare proposals' conviction and thresholds": {"proposal_idxs_with_enough_conviction": []},
+    "Proposals become failed or completed": {"failed": [], "succeeded": []},
+}
+
+
+def spendable(holdings, days: int) -> float:
+    """
+    TokenBatch.spendable() once the batch is days older.
+    """
+    unlocked = 1.0
+    if holdings.cliff_days and holdings.halflife_days:
+        unlocked = max(1 - config.vesting_curve_halflife ** ((holdings.age_days + days - holdings.cliff_days) /
+                                                            holdings.halflife_days), 0)
+    return unlocked * holdings.vesting - holdings.vesting_spent + holdings.nonvesting
+
+
+def day_trials(params: dict, state: dict) -> List[Tuple[float, bool]]:
+    """
+    The (rate, effective) of every call to params["probability_func"] the
+    blocks make in the day after state, in order, for as long as every trial
+    fails. A trial is effective if its success changes the state; the others
+    (e.g. a Participant with a sentiment below config.sentiment_sensitivity
+    deciding to buy) are made anyway.
+
+    Only valid if no Proposal passes that day.
+    """
+    network = state["network"]
+    commons = state["commons"]
+    max_new_participants, arrival_rate = GenerateNewParticipant.arrivals(params, state["timestep"],
+                                                                         state["sentiment"])
+    trials = [(arrival_rate, True)] * max_new_participants
+
+    participants = [p for _, p in get_participants(network)]
+    if participants:
+        total_funds_requested = sum(p.funds_requested for _, p in get_proposals(network, ProposalStatus.CANDIDATE))
+        # Participant.create_proposal()
+        trials.append((calc_median_affinity(network) / (1 + total_funds_requested / commons._funding_pool), True))
+
+    # With scheduled lifetimes, Active Proposals end on their days instead
+    if params.get("proposal_lifetimes") != "scheduled":
+        for _, proposal in get_proposals(network, status=ProposalStatus.ACTIVE):
+            log_funds = np.log(proposal.funds_requested)
+            trials.append((1 / (config.base_failure_rate + log_funds), True))
+            trials.append((1 / (config.base_success_rate + log_funds), True))
+
+    # Participant.vote_on_candidate_proposals()
+    trials.extend([(1.0, False)] * len(participants))
+    for p in participants:
+        trials.append((config.engagement_rate_multiplier_buy * p.sentiment,
+                       p.sentiment - config.sentiment_sensitivity > 0))
+    for p in participants:
+        # Token batches are a day older by the time Participants sell.
+        trials.append((config.engagement_rate_multiplier_sell * p.sentiment,
+                       p.sentiment - config.sentiment_sensitivity < 0 and spendable(p.holdings, 1) > 0))
+    for p in participants:
+        if p.sentiment < config.sentiment_sensitivity_exit and p.holdings.vesting == 0:
+            trials.append((1 - config.engagement_rate_multiplier_exit * p.sentiment, True))
+    return trials
+
+
+def quiet_probability(trials: List[Tuple[float, bool]]) -> float:
+    return float(np.prod([1 - rate for rate, effective in trials if effective]))
+
+
+class ConditionedProbabilityFunc:
+    """
+    Stands in for params["probability_func"] for one day that is known not to
+    be quiet. It samples which of the day's effective trials (see
+    day_trials()) succeeds first, with the probability of it doing so given
+    that one of them does, and decides the trials up to that one. Every other
+    call is passed on to probability_func.
+    """
+
+    def __init__(self, probability_func, trials: List[Tuple[float, bool]], random_number_func):
+        self.probability_func = probability_func
+        effective = [i for i, (_, e) in enumerate(trials) if e]
+        rates = np.array([trials[i][0] for i in effective])
+        first_success = rates * np.concatenate(([1.0], np.cumprod(1 - rates)[:-1]))
+        cumulative = np.cumsum(first_success)
+        n = min(int(np.searchsorted(cumulative, random_number_func() * cumulative[-1], side="right")),
+                len(effective) - 1)
+        self.first = effective[n]
+        self.outcomes = [(rate, i == self.first if e else None) for i, (rate, e) in enumerate(trials[:self.first + 1])]
+        self.calls = 0
+
+    def __call__(self, rate):
+        if self.calls < len(self.outcomes):
+            expected, outcome = self.outcomes[self.calls]
+            self.calls += 1
+            if not np.isclose(rate, expected, rtol=1e-9, atol=0):
+                raise Exception("ConditionedProbabilityFunc: trial {} has a rate of {}, expected {}".format(
+                    self.calls - 1, rate, expected))
+            if outcome is not None:
+                return outcome
+        return self.probability_func(rate)
+
+
+class QuietStretch:
+    """
+    The course of a Commons from the start of a day on, for as long as every
+    day is quiet. The Participants' sentiment, holdings and the Candidate
+    Proposals are taken from the network once, and every quiet day is derived
+    from them in closed form until apply() writes them back.
+    """
+
+    def __init__(self, params: dict, state: dict):
+        self.params = params
+        self.state = state
+        self.timestep = state["timestep"]
+        network = state["network"]
+        commons = state["commons"]
+
+        self.participants = [p for _, p in get_participants(network)]
+        holdings = [p.holdings for p in self.participants]
+        self.sentiment = np.array([p.sentiment for p in self.participants], dtype=float)
+        self.vesting = np.array([h.vesting for h in holdings], dtype=float)
+        self.holdings = holdings
+
+        self.candidates = list(get_proposals(network, status=ProposalStatus.CANDIDATE))
+        self.funds_requested = np.array([p.funds_requested for _, p in self.candidates], dtype=float)
+        self.conviction = np.array([calc_total_conviction(network, i) for i, _ in self.candidates], dtype=float)
+        self.total_funds_requested = sum(p.funds_requested for _, p in self.candidates)
+        self.median_affinity = calc_median_affinity(network) if self.participants else None
+        self.schedule = state["proposal_schedule"] if params.get("proposal_lifetimes") == "scheduled" else None
+        actives = [] if self.schedule is not None else get_proposals(network, status=ProposalStatus.ACTIVE)
+        log_funds = np.log([p.funds_requested for _, p in actives])
+        with np.errstate(divide="ignore"):
+            self.log_quiet_actives = float(np.sum(np.log1p(-1 / (config.base_failure_rate + log_funds)) +
+                                                  np.log1p(-1 / (config.base_success_rate + log_funds))))
+
+        # The synced sentiment the first day starts with, which new Participants arrive by
+        self.synced_sentiment = state["sentiment"]
+        self.token_supply = commons._token_supply
+        # The funding pool at the start of every day of the stretch
+        self.funding_pools = [commons._funding_pool]
+        self.funding = []
+        self._stakes = None
+        self._staked = None
+
+    @property
+    def days(self) -> int:
+        """
+        How many quiet days the stretch has so far.
+        """
+        return len(self.funding)
+
+    def sentiments(self, j: int) -> np.ndarray:
+        """
+        The Participants' sentiment after j quiet days (stopping.decayed_sentiment()).
+        """
+        return np.maximum(self.sentiment - j * config.sentiment_decay, 0)
+
+    def average_sentiment(self, j: int) -> float:
+        s = self.sentiments(j)
+        return float(s.mean()) if len(s) else 0.0
+
+    def stakes(self) -> dict:
+        """
+        The tokens every Participant stakes on a quiet day, which stay the
+        same as long as holdings and Candidate Proposals do.
+        """
+        if self._stakes is None:
+            self._stakes = ParticipantVoting.p_participant_votes_on_proposal_according_to_affinity(
+                self.params, 0, [], self.state)["participants_stake_on_proposals"]
+        return self._stakes
+
+    def staked(self) -> np.ndarray:
+        """
+        The tokens staked on each Candidate Proposal after the first quiet day's votes.
+        """
+        if self._staked is None:
+            network = self.state["network"]
+            stakes = self.stakes()
+            self._staked = np.array([
+                sum(stakes.get(i, {}).get(j, support.tokens) for i, _, support in get_support_edges(network, j))
+                for j, _ in self.candidates], dtype=float)
+        return self._staked
+
+    def conviction_after(self, j: int) -> np.ndarray:
+        """
+        The Candidate Proposals' conviction when they are compared with their
+        thresholds on day j.
+        """
+        if j == 0:
+            return self.conviction
+        return decayed_conviction(self.conviction, self.staked(), self.params["alpha_days_to_80p_of_max_voting_weight"],
+                                  j)
+
+    def quiet_probability(self) -> float:
+        """
+        The probability that the next day is quiet, too.
+        """
+        params = self.params
+        j = self.days
+        if self.schedule is not None and self.schedule.due(self.timestep + j + 1):
+            return 0.0
+        funding_pool = self.funding_pools[j]
+        if self.candidates:
+            thresholds = trigger_thresholds(self.funds_requested, funding_pool, self.token_supply,
+                                            params["max_proposal_request"])
+            if not (self.conviction_after(j) < thresholds).all():
+                return 0.0
+
+        s = self.sentiments(j)
+        log_q = self.log_quiet_actives
+        max_new_participants, arrival_rate = GenerateNewParticipant.arrivals(
+            params, self.timestep + j, self.average_sentiment(j) if j else self.synced_sentiment)
+        with np.errstate(divide="ignore"):
+            if max_new_participants:
+                log_q += max_new_participants * np.log1p(-arrival_rate)
+            if len(s):
+                log_q += np.log1p(-self.median_affinity / (1 + self.total_funds_requested / funding_pool))
+
+            force = s - config.sentiment_sensitivity
+            trade = np.log1p(-config.engagement_rate_multiplier_buy * s)
+            log_q += trade[force > 0].sum()
+            sells = (force < 0) & (np.array([spendable(h, j + 1) for h in self.holdings]) > 0)
+            log_q += np.log1p(-config.engagement_rate_multiplier_sell * s)[sells].sum()
+            exits = (s < config.sentiment_sensitivity_exit) & (self.vesting == 0)
+            log_q += np.log(config.engagement_rate_multiplier_exit * s[exits]).sum()
+        return float(np.exp(log_q))
+
+    def add_quiet_day(self, funding: float):
+        self.funding.append(funding)
+        self.funding_pools.append(self.funding_pools[-1] + funding)
+
+    def apply(self):
+        """
+        Brings the network and the Commons to the end of the stretch.
+        """
+        k = self.days
+        if not k:
+            return
+        params, state = self.params, self.state
+        network = state["network"]
+        alpha = params["alpha_days_to_80p_of_max_voting_weight"]
+
+        for participant, sentiment in zip(self.participants, self.sentiments(k)):
+            participant.sentiment = float(sentiment)
+            participant.holdings.update_age(k)
+
+        ParticipantVoting.su_update_participants_votes(params, 0, [], state,
+                                                       {"participants_stake_on_proposals": self.stakes()})
+        candidates = {i for i, _ in self.candidates}
+        for i, j, support in get_support_edges(network):
+            if j in candidates:
+                set_support(network, i, j, support._replace(
+                    conviction=decayed_conviction(support.conviction, support.tokens, alpha, k)))
+        for (_, proposal), conviction in zip(self.candidates, self.conviction_after(k - 1)):
+            proposal.age += k
+            proposal.trigger = trigger_threshold(proposal.funds_requested, self.funding_pools[k - 1],
+                                                 self.token_supply, params["max_proposal_request"])
+            proposal.conviction = conviction
+
+        commons = state["commons"]
+        commons._funding_pool = self.funding_pools[k]
+        state["funding_pool"] = commons._funding_pool
+        state["sentiment"] = self.average_sentiment(k)
+        state["timestep"] = self.timestep + k
+
+
+class EventEngine(Engine):
+    def __init__(self, partial_state_update_blocks: List[dict], params: dict, record_substeps=None,
+                 checkpoint_every: int = None, checkpoint_path: str = None, gc_manager=None):
+        """
+        Takes the same arguments as engine.Engine, except for observers and
+        stop conditions, which it does not support. partial_state_update_blocks
+        must be the simulation's (or an instrumented copy of them).
+
+        EventEngine.stepped and EventEngine.quiet count the days that were run
+        through the blocks and the ones that were not.
+        """
+        super().__init__(partial_state_update_blocks, params, record_substeps=record_substeps,
+                         checkpoint_every=checkpoint_every, checkpoint_path=checkpoint_path, gc_manager=gc_manager)
+        labels = [block["label"] for block in partial_state_update_blocks]
+        syncs = [n for n, block in enumerate(partial_state_update_blocks, start=1)
+                 if "funding_pool" in block["variables"]]
+        funding, decay = labels.index(FUNDING_BLOCK) + 1, labels.index(DECAY_BLOCK) + 1
+        self.first_sync = syncs[0]
+        self.funding_synced = min(n for n in syncs if n > funding)
+        self.decay_synced = min(n for n in syncs if n > decay)
+        self.policy_outputs = [(n, QUIET_POLICY_OUTPUTS[label]) for n, label in enumerate(labels, start=1)
+                               if label in QUIET_POLICY_OUTPUTS]
+        self.stepped = 0
+        self.quiet = 0
+
+    def run(self, state: dict, timesteps: int, records: List[dict] = None) -> List[dict]:
+        if records is None:
+            state, records = self.start(state)
+
+        params = self.params
+        stretch = None
+        timestep = state["timestep"] + 1
+        while timestep <= timesteps:
+            if stretch is None:
+                stretch = QuietStretch(params, state)
+            q = stretch.quiet_probability()
+            if q > 0 and params["random_number_func"]() < q:
+                funding = GenerateNewFunding.p_exit_tribute_of_average_speculator_position_size(
+                    params, 0, records, state)["funding"]
+                stretch.add_quiet_day(funding)
+                self.quiet += 1
+                checkpoint = self.checkpoint_every and timestep % self.checkpoint_every == 0
+                if checkpoint or timestep == timesteps:
+                    self.fill_quiet_days(stretch, records, copy_records=timestep == timesteps)
+                    stretch = None
+                    if checkpoint:
+                        self.checkpoint(state, records)
+                timestep += 1
+                continue
+
+            self.fill_quiet_days(stretch, records)
+            stretch = None
+            day_params = params
+            if q > 0:
+                conditioned = ConditionedProbabilityFunc(params["probability_func"], day_trials(params, state),
+                                                         params["random_number_func"])
+                day_params = dict(params, probability_func=conditioned)
+            self.step(state, timestep, records, copy_records=timestep == timesteps, params=day_params)
+            self.stepped += 1
+            if self.checkpoint_every and timestep % self.checkpoint_every == 0:
+                self.checkpoint(state, records)
+            timestep += 1
+
+        self.state = state
+        return records
+
+    def fill_quiet_days(self, stretch: QuietStretch, records: List[dict], copy_records: bool = False):
+        """
+        Applies the stretch to its state and appends the records of its quiet
+        days, with the synced state variables each substep would have seen.
+        """
+        if not stretch.days:
+            return
+        state = stretch.state
+        policy_output = state["policy_output"]
+        # Until the first sync, the first day's records hold the values the
+        # day before ended with.
+        synced = {k: state[k] for k in SYNCED_VARIABLES}
+        stretch.apply()
+        commons = state["commons"]
+        state.update(collateral_pool=commons._collateral_pool, token_supply=commons._token_supply,
+                     token_price=commons.token_price())
+        substeps = len(self.partial_state_update_blocks)
+        state["substep"] = substeps
+
+        start = len(records)
+        for j in range(stretch.days):
+            funding_pools = stretch.funding_pools[j], stretch.funding_pools[j + 1]
+            sentiments = stretch.average_sentiment(j), stretch.average_sentiment(j + 1)
+            for substep in range(1, substeps + 1):
+                for n, output in self.policy_outputs:
+                    if n == substep:
+                        policy_output = output
+                if substep >= self.first_sync:
+                    synced = dict(funding_pool=funding_pools[substep >= self.funding_synced],
+                                  sentiment=sentiments[substep >= self.decay_synced],
+                                  collateral_pool=state["collateral_pool"], token_supply=state["token_supply"],
+                                  token_price=state["token_price"])
+                if self.record_substeps is None or substep in self.record_substeps:
+                    records.append(dict(state, substep=substep, timestep=stretch.timestep + j + 1,
+                                        policy_output=policy_output, **synced))
+        state["policy_output"] = policy_output
+
+        if copy_records:
+            for i in range(start, len(records)):
+                if records[i]["timestep"] == state["timestep"]:
+                    records[i] = copy.deepcopy(records[i])
@@ -0,0 +1,199 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from checkpoint import load_checkpoint
+from engine import Engine
+from entities import Participant, ProposalStatus
+from events import ConditionedProbabilityFunc, EventEngine, QuietStretch, day_trials, quiet_probability
+from network_utils import get_edges_by_type, get_participants, get_proposals
+from simrunner import get_simulation_results, run_simulation
+from simulation import CommonsSimulationConfiguration, bootstrap_simulation, partial_state_update_blocks
+from stopping import NoParticipants
+
+STATE_VARIABLES = ["funding_pool", "collateral_pool", "token_supply", "token_price", "sentiment"]
+
+
+class RecordingProbabilityFunc:
+    """
+    Records every rate and lets only the certain trials succeed, so that
+    every day is quiet unless a Proposal passes.
+    """
+
+    def __init__(self):
+        self.rates = []
+
+    def __call__(self, rate):
+        self.rates.append(rate)
+        return rate >= 1.0
+
+
+def bootstrap(seed=1, actives=1):
+    initial_conditions, simulation_parameters = bootstrap_simulation(
+        CommonsSimulationConfiguration(random_seed=seed, timesteps_days=60))
+    params = simulation_parameters["M"]
+    for _, proposal in list(get_proposals(initial_conditions["network"]))[:actives]:
+        proposal.status = ProposalStatus.ACTIVE
+    return dict(initial_conditions, timestep=0, substep=0), params
+
+
+def quiet_params(params):
+    """
+    params under which every day is quiet, and a zero for every random
+    number, so that the EventEngine takes every day that can be quiet as quiet.
+    """
+    return dict(params, probability_func=RecordingProbabilityFunc(), random_number_func=lambda: 0.0)
+
+
+def quiet_commons():
+    """
+    Nobody arrives, the hatchers do not trade, and Proposals rarely come up.
+    """
+    state, params = bootstrap(actives=0)
+    params["max_new_participants"] = 0
+    network = state["network"]
+    for _, participant in get_participants(network):
+        participant.sentiment = 0
+    for i, j in get_edges_by_type(network, "support"):
+        network.edges[i, j]["support"] = network.edges[i, j]["support"]._replace(affinity=0.01)
+    return state, params
+
+
+class TestTrials(unittest.TestCase):
+    def test_same_calls_as_the_blocks(self):
+        state, params = bootstrap()
+        params = quiet_params(params)
+        engine = Engine(partial_state_update_blocks, params)
+        state, records = engine.start(state)
+        for timestep in range(1, 30):
+            trials = day_trials(params, state)
+            params["probability_func"].rates = []
+            engine.step(state, timestep, records)
+            # The blocks make different calls once a Proposal has passed
+            compared = next(r for r in reversed(records) if r["substep"] == 7)
+            if compared["policy_output"]["proposal_idxs_with_enough_conviction"]:
+                continue
+            self.assertEqual(params["probability_func"].rates, [rate for rate, _ in trials])
+
+    def test_quiet_probability(self):
+        for seed in (1, 2, 3):
+            state, params = bootstrap(seed)
+            q = quiet_probability(day_trials(params, state))
+            self.assertGreater(q, 0)
+            self.assertAlmostEqual(QuietStretch(params, state).quiet_probability(), q)
+
+    def test_a_proposal_that_passes_makes_the_day_eventful(self):
+        state, params = bootstrap()
+        _, proposal = next(iter(get_proposals(state["network"], status=ProposalStatus.CANDIDATE)))
+        proposal.funds_requested = 1
+        for i, j in get_edges_by_type(state["network"], "support"):
+            if state["network"].nodes[j]["item"] is proposal:
+                state["network"].edges[i, j]["support"] = state["network"].edges[i, j]["support"]._replace(
+                    conviction=1e12)
+        self.assertEqual(QuietStretch(params, state).quiet_probability(), 0)
+
+    def test_conditioned_probability_func(self):
+        trials = [(0.5, True), (1.0, False), (0.2, True), (0.3, False), (0.4, True)]
+        passed_on = RecordingProbabilityFunc()
+        # P(first success) is 0.5, 0.1, 0.16 for the effective trials, so
+        # 0.9 * 0.76 falls on the third one.
+        f = ConditionedProbabilityFunc(passed_on, trials, lambda: 0.9)
+        self.assertEqual(f.first, 4)
+        self.assertEqual([f(rate) for rate, _ in trials] + [f(0.9)], [False, True, False, False, True, False])
+        self.assertEqual(passed_on.rates, [1.0, 0.3, 0.9])
+
+        f = ConditionedProbabilityFunc(passed_on, trials, lambda: 0.1)
+        self.assertEqual(f.first, 0)
+        with self.assertRaises(Exception):
+            f(0.4)
+
+
+class TestEventEngine(unittest.TestCase):
+    def test_same_as_engine_on_quiet_days(self):
+        """
+        When nothing random happens, skipping the quiet days and filling them
+        in from the closed form gives the records of stepping through them.
+        """
+        T = 40
+        state, params = bootstrap()
+        expected = Engine(partial_state_update_blocks, quiet_params(params)).run(state, T)
+        state, params = bootstrap()
+        engine = EventEngine(partial_state_update_blocks, quiet_params(params))
+        records = engine.run(state, T)
+
+        self.assertGreater(engine.quiet, T / 2)
+        self.assertEqual([(r["timestep"], r["substep"]) for r in records],
+                         [(r["timestep"], r["substep"]) for r in expected])
+        for name in STATE_VARIABLES:
+            np.testing.assert_allclose([r[name] for r in records], [r[name] for r in expected], rtol=1e-9)
+        self.assertEqual([r["policy_output"] for r in records[1:]], [r["policy_output"] for r in expected[1:]])
+
+        network, expected_network = records[-1]["network"], expected[-1]["network"]
+        self.assertIsNot(network, engine.state["network"])
+        for (i, item), (_, expected_item) in zip(network.nodes(data="item"), expected_network.nodes(data="item")):
+            if isinstance(item, Participant):
+                self.assertAlmostEqual(item.sentiment, expected_item.sentiment)
+                self.assertEqual(item.holdings.age_days, expected_item.holdings.age_days)
+            else:
+                self.assertEqual((item.status, item.age), (expected_item.status, expected_item.age))
+                np.testing.assert_allclose([item.trigger, item.conviction],
+                                           [expected_item.trigger, expected_item.conviction], rtol=1e-9)
+        for e in get_edges_by_type(expected_network, "support"):
+            support, expected_support = network.edges[e]["support"], expected_network.edges[e]["support"]
+            np.testing.assert_allclose([support.tokens, support.conviction],
+                                       [expected_support.tokens, expected_support.conviction], rtol=1e-9)
+
+    def test_skips_most_days_of_a_quiet_commons(self):
+        state, params = quiet_commons()
+        engine = EventEngine(partial_state_update_blocks, params, record_substeps={2})
+        records = engine.run(state, 100)
+        self.assertEqual([r["timestep"] for r in records], list(range(101)))
+        self.assertEqual(engine.stepped + engine.quiet, 100)
+        self.assertGreater(engine.quiet, 80)
+
+    def test_scheduled_ending_is_not_quiet(self):
+        for days, status in ((29, ProposalStatus.ACTIVE), (30, ProposalStatus.COMPLETED)):
+            state, params = quiet_commons()
+            params["proposal_lifetimes"] = "scheduled"
+            j, proposal = list(get_proposals(state["network"]))[0]
+            proposal.status = ProposalStatus.ACTIVE
+            state["proposal_schedule"].add(30, j, ProposalStatus.COMPLETED)
+            records = EventEngine(partial_state_update_blocks, params).run(state, days)
+            self.assertEqual(records[-1]["network"].nodes[j]["item"].status, status)
+            self.assertEqual(len(records[-1]["proposal_schedule"]), int(status == ProposalStatus.ACTIVE))
+
+    def test_resume_is_identical(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "cp-{timestep}.gz")
+            state, params = quiet_commons()
+            records = EventEngine(partial_state_update_blocks, params, checkpoint_every=20,
+                                  checkpoint_path=path).run(state, 60)
+            checkpoint = load_checkpoint(path.format(timestep=20))
+            resumed = EventEngine(partial_state_update_blocks, checkpoint.params).run(
+                checkpoint.state, 60, records=checkpoint.records)
+
+        self.assertEqual(len(resumed), len(records))
+        for name in STATE_VARIABLES + ["timestep", "substep"]:
+            self.assertEqual([r[name] for r in resumed], [r[name] for r in records])
+
+    def test_simrunner(self):
+        c = CommonsSimulationConfiguration(random_seed=3, timesteps_days=40)
+        result, _ = get_simulation_results(c, engine="events")
+        expected, _ = get_simulation_results(c, engine="native")
+        self.assertEqual(set(result), set(expected))
+        self.assertEqual(result["timestep"], expected["timestep"])
+        with self.assertRaises(Exception):
+            run_simulation(c, engine="events", stop_conditions=[NoParticipants()])
+
+    def test_default_commons(self):
+        state, params = bootstrap(seed=3, actives=0)
+        engine = EventEngine(partial_state_update_blocks, params)
+        records = engine.run(state, 30)
+        self.assertEqual(len(records), 1 + 30 * len(partial_state_update_blocks))
+        self.assertEqual(engine.stepped + engine.quiet, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import gc
+import os
+import tempfile
+import unittest
+
+from engine import Engine
+from gcmanager import GCManager
+from simrunner import get_simulation_results
+from simulation import CommonsSimulationConfiguration, bootstrap_simulation, partial_state_update_blocks
+
+
+class TestGCManager(unittest.TestCase):
+    def test_restores_the_collector(self):
+        thresholds = gc.get_threshold()
+        for mode in ("default", "tuned", "disabled"):
+            with self.subTest(mode=mode):
+                manager = GCManager(mode)
+                manager.start()
+                manager.freeze()
+                self.assertGreater(gc.get_freeze_count(), 0)
+                self.assertEqual(gc.isenabled(), mode != "disabled")
+                if mode == "tuned":
+                    self.assertEqual(gc.get_threshold(), manager.thresholds)
+                manager.stop()
+
+                self.assertTrue(gc.isenabled())
+                self.assertEqual(gc.get_threshold(), thresholds)
+                self.assertEqual(gc.get_freeze_count(), 0)
+                self.assertNotIn(manager._callback, gc.callbacks)
+
+    def test_keeps_what_the_caller_froze(self):
+        gc.freeze()
+        try:
+            frozen = gc.get_freeze_count()
+            for freeze in (False, True):
+                with self.subTest(freeze=freeze):
+                    manager = GCManager("tuned")
+                    manager.start()
+                    if freeze:
+                        manager.freeze()
+                    manager.stop()
+                    self.assertGreaterEqual(gc.get_freeze_count(), frozen)
+        finally:
+            gc.unfreeze()
+
+    def test_collects_at_checkpoints(self):
+        initial_conditions, simulation_parameters = bootstrap_simulation(
+            CommonsSimulationConfiguration(random_seed=1))
+        manager = GCManager("disabled")
+        manager.start()
+        try:
+            manager.freeze()
+            with tempfile.TemporaryDirectory() as d:
+                Engine(partial_state_update_blocks, simulation_parameters["M"], checkpoint_every=5,
+                       checkpoint_path=os.path.join(d, "cp.gz"), gc_manager=manager).run(initial_conditions, 20)
+            self.assertFalse(gc.isenabled())
+        finally:
+            manager.stop()
+
+        report = manager.report()
+        # freeze(), 4 checkpoints and stop()
+        self.assertEqual(report["explicit_collections"], 6)
+        self.assertEqual(report["collections"], [0, 0, 6])
+        self.assertGreater(report["frozen"], 0)
+        self.assertGreaterEqual(report["pause_time"], report["max_pause"])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(Exception):
+            GCManager("generational")
+
+    def test_simrunner(self):
+        result, _ = get_simulation_results(CommonsSimulationConfiguration(random_seed=3, timesteps_days=40),
+                                           engine="native", gc_mode="tuned")
+        expected, _ = get_simulation_results(CommonsSimulationConfiguration(random_seed=3, timesteps_days=40),
+                                             engine="native")
+        self.assertEqual(result.pop("gc")["mode"], "tuned")
+        self.assertEqual(result, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+"""
+A compact history of how the network changes over a run.
+
+Keeping a snapshot of the whole network for every timestep takes memory in
+proportion to timesteps × edges. NetworkHistory instead records, after every
+timestep, only what changed since the previous one: added and removed nodes
+and edges, the new state of Participants and Proposals that changed, and the
+edge attributes that were replaced. Support edges hold immutable
+ParticipantSupport tuples which policies replace when a stake or conviction
+changes, so a changed edge is found with an identity check and its new tuple is
+shared with the network rather than copied.
+
+Proposals that network_utils.archive_proposals() moves out of the network are
+recorded as removed nodes, and the archive entries they became as part of the
+same delta, so that network_at() finds them in the archive too.
+
+Every keyframe_every timesteps a full snapshot is kept as well, so that
+network_at() only has to replay a bounded number of deltas to materialize the
+network at any timestep. edge_history() and node_history() return the
+history of a single edge or node without materializing any network.
+
+A NetworkHistory is an engine.Engine observer:
+
+    history = NetworkHistory()
+    Engine(partial_state_update_blocks, params, observers=[history]).run(state, 730)
+    history.network_at(365)
+"""
+import gzip
+import pickle
+from typing import Dict, List, NamedTuple, Tuple
+
+from entities import Participant, Proposal, ProposalArchive
+from hatch import TokenBatch
+from network_utils import get_archive, snapshot_network
+
+ENTITY_TYPES = (Participant, Proposal, TokenBatch)
+
+
+def entity_state(item) -> tuple:
+    """
+    The type and attribute values of a Participant, Proposal or TokenBatch
+    (including the TokenBatch a Participant holds), as a tuple that does not
+    change when the entity does.
+    """
+    return (type(item),) + tuple(
+        entity_state(v) if isinstance(v, ENTITY_TYPES) else v
+        for v in (getattr(item, name) for name in type(item).__slots__))
+
+
+def entity_from_state(state: tuple):
+    """
+    The inverse of entity_state().
+    """
+    cls, *values = state
+    item = cls.__new__(cls)
+    for name, v in zip(cls.__slots__, values):
+        setattr(item, name, entity_from_state(v) if isinstance(v, tuple) and v and v[0] in ENTITY_TYPES else v)
+    return item
+
+
+class Delta(NamedTuple):
+    timestep: int
+    removed_nodes: List[int]
+    nodes: Dict[int, tuple]  # added or changed nodes' entity_state()
+    removed_edges: List[Tuple[int, int]]
+    edges: Dict[Tuple[int, int], dict]  # added edges' attributes, changed edges' replaced attributes
+    archived: List[tuple] = []  # ProposalArchive.entries() added to the archive
+
+
+class NetworkHistory:
+    def __init__(self, keyframe_every: int = 50):
+        self.keyframe_every = keyframe_every
+        self.keyframes = {}
+        self.deltas = {}
+        self._nodes = {}
+        self._edges = {}
+        self._archived = 0
+
+    def __call__(self, state: dict):
+        self.record(state["timestep"], state["network"])
+
+    @property
+    def timesteps(self) -> List[int]:
+        return sorted(set(self.keyframes) | set(self.deltas))
+
+    def record(self, timestep: int, network):
+        """
+        Records the network as it is after timestep. The first timestep
+        recorded is always a keyframe.
+        """
+        nodes = {i: entity_state(item) for i, item in network.nodes(data="item")}
+        edges = {(u, v): dict(data) for u, v, data in network.edges(data=True)}
+        archive = get_archive(network)
+
+        if not self.keyframes or timestep % self.keyframe_every == 0:
+            self.keyframes[timestep] = snapshot_network(network)
+        else:
+            archived = archive.entries(self._archived) if archive is not None else []
+            self.deltas[timestep] = self._diff(timestep, nodes, edges)._replace(archived=archived)
+        self._nodes, self._edges = nodes, edges
+        self._archived = len(archive) if archive is not None else 0
+
+    def _diff(self, timestep: int, nodes: dict, edges: dict) -> Delta:
+        previous_nodes, previous_edges = self._nodes, self._edges
+        changed_nodes = {i: s for i, s in nodes.items() if previous_nodes.get(i) != s}
+
+        changed_edges = {}
+        for e, data in edges.items():
+            previous = previous_edges.get(e)
+            if previous is None:
+                changed_edges[e] = data
+                continue
+            changes = {k: v for k, v in data.items() if previous.get(k) is not v}
+            if changes:
+                changed_edges[e] = changes
+
+        return Delta(
+            timestep=timestep,
+            removed_nodes=[i for i in previous_nodes if i not in nodes],
+            nodes=changed_nodes,
+            removed_edges=[e for e in previous_edges if e not in edges],
+            edges=changed_edges,
+        )
+
+    def network_at(self, timestep: int):
+        """
+        Materializes the network as it was after timestep. The returned network
+        is new and may be modified.
+        """
+        keyframes = [t for t in self.keyframes if t <= timestep]
+        if not keyframes or timestep > max(self.timesteps):
+            raise Exception("Timestep {} was not recorded".format(timestep))
+        keyframe = max(keyframes)
+
+        network = snapshot_network(self.keyframes[keyframe])
+        for t in range(keyframe + 1, timestep + 1):
+            delta = self.deltas[t]
+            network.remove_edges_from(delta.removed_edges)
+            network.remove_nodes_from(delta.removed_nodes)
+            for i, s in delta.nodes.items():
+                network.add_node(i, item=entity_from_state(s))
+            for (u, v), data in delta.edges.items():
+                network.add_edge(u, v, **data)
+            if delta.archived:
+                archive = network.graph.setdefault("archive", ProposalArchive())
+                for entry in delta.archived:
+                    archive.add_entry(*entry)
+        return network
+
+    def edge_history(self, u: int, v: int, key: str = "support") -> List[Tuple[int, object]]:
+        """
+        [(timestep, value), ...] for every timestep at which the attribute key
+        of edge (u, v) was set or replaced, and (timestep, None) when the edge
+        was removed.
+        """
+        ans = []
+        for t in self.timesteps:
+            if t in self.keyframes:
+                network = self.keyframes[t]
+                value = network.edges[u, v].get(key) if network.has_edge(u, v) else None
+                if not ans or ans[-1][1] is not value:
+                    ans.append((t, value))
+                continue
+            delta = self.deltas[t]
+            if (u, v) in delta.removed_edges:
+                ans.append((t, None))
+            if key in delta.edges.get((u, v), {}):
+                ans.append((t, delta.edges[u, v][key]))
+        return ans
+
+    def node_history(self, i: int) -> List[Tuple[int, object]]:
+        """
+        [(timestep, entity), ...] for every timestep at which node i was added
+        or changed, and (timestep, None) when it was removed.
+        """
+        ans = []
+        for t in self.timesteps:
+            if t in self.keyframes:
+                network = self.keyframes[t]
+                s = entity_state(network.nodes[i]["item"]) if i in network else None
+            elif i in self.deltas[t].removed_nodes and i not in self.deltas[t].nodes:
+                s = None
+            elif i in self.deltas[t].nodes:
+                s = self.deltas[t].nodes[i]
+            else:
+                continue
+            if not ans or ans[-1][1] != s:
+                ans.append((t, s))
+        return [(t, entity_from_state(s) if s else None) for t, s in ans]
+
+    def save(self, path: str):
+        with gzip.open(path, "wb", compresslevel=1) as f:
+            pickle.dump((self.keyframe_every, self.keyframes, self.deltas), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_history(path: str) -> NetworkHistory:
+    """
+    Loads a NetworkHistory written by NetworkHistory.save() for analysis.
+    It cannot record further timesteps.
+    """
+    with gzip.open(path, "rb") as f:
+        keyframe_every, keyframes, deltas = pickle.load(f)
+    history = NetworkHistory(keyframe_every)
+    history.keyframes, history.deltas = keyframes, deltas
+    return history
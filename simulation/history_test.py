@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from engine import Engine
+from history import NetworkHistory, entity_from_state, entity_state, load_history
+from network_utils import get_archive, get_participants, snapshot_network
+from simulation import CommonsSimulationConfiguration, bootstrap_simulation, partial_state_update_blocks
+
+
+def run_with_history(timesteps, keyframe_every, **kwargs):
+    """
+    Runs the simulation with a NetworkHistory and, to compare against, a full
+    snapshot of the network after every timestep.
+    """
+    initial_conditions, simulation_parameters = bootstrap_simulation(
+        CommonsSimulationConfiguration(random_seed=2, timesteps_days=timesteps, **kwargs))
+    history = NetworkHistory(keyframe_every=keyframe_every)
+    snapshots = {}
+
+    def take_snapshot(state):
+        snapshots[state["timestep"]] = snapshot_network(state["network"])
+    Engine(partial_state_update_blocks, simulation_parameters["M"], record_substeps=(),
+           observers=[history, take_snapshot]).run(initial_conditions, timesteps)
+    return history, snapshots
+
+
+class TestNetworkHistory(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.history, cls.snapshots = run_with_history(40, keyframe_every=15)
+
+    def assertSameNetwork(self, network, expected):
+        self.assertEqual(list(network.nodes), list(expected.nodes))
+        for i, item in expected.nodes(data="item"):
+            self.assertEqual(entity_state(network.nodes[i]["item"]), entity_state(item))
+        self.assertEqual(sorted(network.edges(data=True)), sorted(expected.edges(data=True)))
+
+    def test_network_at_every_timestep(self):
+        self.assertEqual(self.history.timesteps, list(range(41)))
+        self.assertEqual(sorted(self.history.keyframes), [0, 15, 30])
+        for t, expected in self.snapshots.items():
+            self.assertSameNetwork(self.history.network_at(t), expected)
+
+        with self.assertRaises(Exception):
+            self.history.network_at(41)
+
+    def test_network_at_returns_a_new_network(self):
+        network = self.history.network_at(15)
+        for _, p in get_participants(network):
+            p.sentiment = 0
+        self.assertSameNetwork(self.history.network_at(15), self.snapshots[15])
+
+    def test_edge_and_node_history(self):
+        participant, proposal = next((u, v) for u, v, t in self.snapshots[40].edges(data="type") if t == "support")
+
+        supports = dict(self.history.edge_history(participant, proposal))
+        expected = {t: n.edges[participant, proposal]["support"] for t, n in self.snapshots.items()
+                    if n.has_edge(participant, proposal)}
+        for t, support in expected.items():
+            latest = max(k for k in supports if k <= t)
+            self.assertEqual(supports[latest], support)
+
+        nodes = self.history.node_history(participant)
+        for t, n in self.snapshots.items():
+            latest = max(k for k, _ in nodes if k <= t)
+            self.assertEqual(entity_state(dict(nodes)[latest]), entity_state(n.nodes[participant]["item"]))
+
+    def test_entity_state_roundtrip(self):
+        for _, item in self.snapshots[40].nodes(data="item"):
+            self.assertEqual(entity_state(entity_from_state(entity_state(item))), entity_state(item))
+
+    def test_network_at_with_archived_proposals(self):
+        history, snapshots = run_with_history(40, keyframe_every=15, archive_proposals=True)
+        archived = [t for t in range(1, 41) if len(get_archive(snapshots[t]) or []) >
+                    len(get_archive(snapshots[t - 1]) or [])]
+        self.assertTrue([t for t in archived if t % 15])
+        for t, expected in snapshots.items():
+            network = history.network_at(t)
+            self.assertSameNetwork(network, expected)
+            archive, expected_archive = get_archive(network), get_archive(expected)
+            if expected_archive is None:
+                self.assertIsNone(archive)
+                continue
+            self.assertEqual([(entity_state(p), s, tokens, c) for _, p, s, tokens, c in archive.entries()],
+                             [(entity_state(p), s, tokens, c) for _, p, s, tokens, c in expected_archive.entries()])
+            self.assertEqual(archive.ids, expected_archive.ids)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "history.pickle.gz")
+            self.history.save(path)
+            history = load_history(path)
+        self.assertSameNetwork(history.network_at(37), self.snapshots[37])
+
+
+if __name__ == '__main__':
+    unittest.main()
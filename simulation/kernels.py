@@ -0,0 +1,232 @@
+"""
+The numeric kernels of ensemble.Ensemble's busiest blocks, with a choice of
+backend.
+
+Once the state is in arrays (see ensemble.py), conviction, voting, sentiment
+and the buy and sell decisions are pure number crunching. The numpy backend
+computes them with whole-array operations, which need temporaries as large
+as the (runs, participants, proposals) support arrays and compute every
+element, masked or not. The numba backend compiles the same logic written as
+loops, which skips empty slots and keeps running maxima and sums in
+registers. numba is optional:
+
+    kernels = get_kernels("numba")  # ImportError if numba is not installed
+    kernels = get_kernels()         # numba if it is installed, else numpy
+
+The loops backend is the numba backend's source run by the interpreter. It
+is far too slow for real runs, but it is what the tests compare the numpy
+backend with when numba is not installed.
+
+All backends return the same results, except that sums may differ in the
+last bits because NumPy sums in a different order than a loop. Support arrays
+come back in the dtype they were given in, so that float32 ones stay float32.
+"""
+import numpy as np
+
+import config
+
+BACKENDS = ("numpy", "numba", "loops")
+
+
+class NumPyKernels:
+    name = "numpy"
+
+    @staticmethod
+    def conviction(tokens, conviction, alpha, candidates, participant_mask):
+        """
+        ProposalFunding.su_calculate_conviction() for the support edges of
+        live Participants to Candidate Proposals.
+        """
+        update = candidates[:, None, :] & participant_mask[:, :, None]
+        return np.where(update, tokens + alpha[:, None, None] * conviction, conviction).astype(
+            conviction.dtype, copy=False)
+
+    @staticmethod
+    def votes(affinity, tokens, holdings, candidates, participant_mask):
+        """
+        The tokens staked on every support edge after
+        ParticipantVoting.p_participant_votes_on_proposal_according_to_affinity():
+        every Participant spreads holdings over the Candidate Proposals above
+        the affinity cutoff in proportion to the affinity.
+        """
+        candidates = candidates[:, None, :]
+        masked = np.where(candidates, affinity, -np.inf)
+        cutoff = np.maximum(config.candidate_proposals_cutoff * masked.max(axis=2, initial=-np.inf), .5)
+        voted = candidates & (affinity > cutoff[:, :, None]) & participant_mask[:, :, None]
+        voted_affinity = np.where(voted, affinity, 0)
+        affinity_total = voted_affinity.sum(axis=2, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stakes = holdings[:, :, None] * (voted_affinity / affinity_total)
+        return np.where(voted, stakes, tokens).astype(tokens.dtype, copy=False)
+
+    @staticmethod
+    def decay_sentiment(sentiment, participant_mask, decay):
+        return np.where(participant_mask, np.maximum(sentiment - decay, 0), sentiment)
+
+    @staticmethod
+    def shift_sentiment(sentiment, affected, delta):
+        """
+        Adds delta to the sentiment of the affected Participants, clipped to [0, 1].
+        """
+        return np.where(affected, np.clip(sentiment + delta, 0., 1.), sentiment)
+
+    @staticmethod
+    def buy_decisions(sentiment, participant_mask, engaged, amount):
+        """
+        Participant.buy() with the random numbers engaged and amount: which
+        Participants buy, and for how much DAI.
+        """
+        force = sentiment - config.sentiment_sensitivity
+        buys = participant_mask & (engaged < config.engagement_rate_multiplier_buy * sentiment) & (force > 0)
+        return buys, np.where(buys, amount * force * config.delta_holdings_scale, 0)
+
+    @staticmethod
+    def sell_decisions(sentiment, participant_mask, engaged, amount, spendable):
+        """
+        Participant.sell() with the random numbers engaged and amount: which
+        Participants sell, and how many tokens.
+        """
+        force = sentiment - config.sentiment_sensitivity
+        sells = participant_mask & (engaged < config.engagement_rate_multiplier_sell * sentiment) & (force < 0)
+        tokens = np.where(sells, amount * -force * spendable, 0)
+        sells &= tokens > 0
+        return sells, np.where(sells, tokens, 0)
+
+
+def _conviction(tokens, conviction, alpha, candidates, participant_mask):
+    R, P, Q = conviction.shape
+    result = conviction.copy()
+    for r in range(R):
+        for p in range(P):
+            if participant_mask[r, p]:
+                for q in range(Q):
+                    if candidates[r, q]:
+                        result[r, p, q] = tokens[r, p, q] + alpha[r] * conviction[r, p, q]
+    return result
+
+
+def _votes(affinity, tokens, holdings, candidates, participant_mask):
+    R, P, Q = affinity.shape
+    result = tokens.copy()
+    for r in range(R):
+        for p in range(P):
+            if not participant_mask[r, p]:
+                continue
+            top = -np.inf
+            for q in range(Q):
+                if candidates[r, q] and affinity[r, p, q] > top:
+                    top = affinity[r, p, q]
+            cutoff = max(config.candidate_proposals_cutoff * top, .5)
+            total = 0.
+            for q in range(Q):
+                if candidates[r, q] and affinity[r, p, q] > cutoff:
+                    total += affinity[r, p, q]
+            for q in range(Q):
+                if candidates[r, q] and affinity[r, p, q] > cutoff:
+                    result[r, p, q] = holdings[r, p] * (affinity[r, p, q] / total)
+    return result
+
+
+def _decay_sentiment(sentiment, participant_mask, decay):
+    R, P = sentiment.shape
+    result = sentiment.copy()
+    for r in range(R):
+        for p in range(P):
+            if participant_mask[r, p]:
+                result[r, p] = max(sentiment[r, p] - decay, 0.)
+    return result
+
+
+def _shift_sentiment(sentiment, affected, delta):
+    R, P = sentiment.shape
+    result = sentiment.copy()
+    for r in range(R):
+        for p in range(P):
+            if affected[r, p]:
+                result[r, p] = min(max(sentiment[r, p] + delta[r, p], 0.), 1.)
+    return result
+
+
+def _buy_decisions(sentiment, participant_mask, engaged, amount):
+    R, P = sentiment.shape
+    buys = np.zeros((R, P), dtype=np.bool_)
+    dai = np.zeros((R, P))
+    for r in range(R):
+        for p in range(P):
+            force = sentiment[r, p] - config.sentiment_sensitivity
+            if participant_mask[r, p] and engaged[r, p] < config.engagement_rate_multiplier_buy * sentiment[r, p] \
+                    and force > 0:
+                buys[r, p] = True
+                dai[r, p] = amount[r, p] * force * config.delta_holdings_scale
+    return buys, dai
+
+
+def _sell_decisions(sentiment, participant_mask, engaged, amount, spendable):
+    R, P = sentiment.shape
+    sells = np.zeros((R, P), dtype=np.bool_)
+    tokens = np.zeros((R, P))
+    for r in range(R):
+        for p in range(P):
+            force = sentiment[r, p] - config.sentiment_sensitivity
+            if participant_mask[r, p] and engaged[r, p] < config.engagement_rate_multiplier_sell * sentiment[r, p] \
+                    and force < 0:
+                x = amount[r, p] * -force * spendable[r, p]
+                if x > 0:
+                    sells[r, p] = True
+                    tokens[r, p] = x
+    return sells, tokens
+
+
+_LOOPS = {"conviction": _conviction, "votes": _votes, "decay_sentiment": _decay_sentiment,
+          "shift_sentiment": _shift_sentiment, "buy_decisions": _buy_decisions, "sell_decisions": _sell_decisions}
+
+
+class LoopKernels:
+    name = "loops"
+
+
+for _name, _loop in _LOOPS.items():
+    setattr(LoopKernels, _name, staticmethod(_loop))
+
+_numba_kernels = None
+
+
+def _compile_numba_kernels():
+    try:
+        import numba
+    except ImportError:
+        raise ImportError("The numba kernel backend needs numba, install it with `pip install numba`")
+
+    class NumbaKernels:
+        name = "numba"
+
+    for name, loop in _LOOPS.items():
+        setattr(NumbaKernels, name, staticmethod(numba.njit(cache=True)(loop)))
+    return NumbaKernels
+
+
+def numba_available() -> bool:
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_kernels(backend: str = None):
+    """
+    The kernels of backend, one of BACKENDS. Without a backend, numba if it
+    is installed and numpy otherwise.
+    """
+    global _numba_kernels
+    if backend is None:
+        backend = "numba" if numba_available() else "numpy"
+    if backend == "numpy":
+        return NumPyKernels
+    if backend == "loops":
+        return LoopKernels
+    if backend == "numba":
+        if _numba_kernels is None:
+            _numba_kernels = _compile_numba_kernels()
+        return _numba_kernels
+    raise Exception("Unknown kernel backend {}, expected one of {}".format(backend, BACKENDS))
@@ -0,0 +1,116 @@
+import unittest
+
+import numpy as np
+
+import config
+from ensemble import SYNCED_VARIABLES, bootstrap_ensemble
+from kernels import NumPyKernels, get_kernels, numba_available
+
+
+def random_arrays(seed, R=3, P=7, Q=12):
+    """
+    Arrays shaped like an Ensemble's, with empty slots and sentiment on both
+    sides of every threshold.
+    """
+    rs = np.random.RandomState(seed)
+    return {
+        "sentiment": rs.rand(R, P),
+        "participant_mask": rs.rand(R, P) < 0.8,
+        "candidates": rs.rand(R, Q) < 0.6,
+        "affinity": rs.rand(R, P, Q),
+        "tokens": rs.rand(R, P, Q) * 100,
+        "conviction": rs.rand(R, P, Q) * 1000,
+        "holdings": rs.rand(R, P) * 1000,
+        "alpha": rs.rand(R),
+        "engaged": rs.rand(R, P),
+        "amount": rs.rand(R, P),
+        "spendable": rs.rand(R, P) * 100 - 10,
+        "delta": rs.rand(R, P) - 0.5,
+    }
+
+
+class KernelsTestCase:
+    """
+    Compares the kernels of backend with the numpy backend's.
+    """
+    backend = None
+
+    def setUp(self):
+        self.kernels = get_kernels(self.backend)
+
+    def assertSameResults(self, name, *args):
+        expected = getattr(NumPyKernels, name)(*args)
+        result = getattr(self.kernels, name)(*args)
+        if not isinstance(expected, tuple):
+            expected, result = (expected,), (result,)
+        for e, r in zip(expected, result):
+            self.assertEqual(r.dtype, e.dtype)
+            np.testing.assert_allclose(r, e, rtol=1e-14)
+
+    def test_kernels(self):
+        for seed in range(5):
+            a = random_arrays(seed)
+            with self.subTest(seed=seed):
+                self.assertSameResults("conviction", a["tokens"], a["conviction"], a["alpha"], a["candidates"],
+                                       a["participant_mask"])
+                self.assertSameResults("votes", a["affinity"], a["tokens"], a["holdings"], a["candidates"],
+                                       a["participant_mask"])
+                self.assertSameResults("decay_sentiment", a["sentiment"], a["participant_mask"],
+                                       config.sentiment_decay)
+                self.assertSameResults("shift_sentiment", a["sentiment"], a["participant_mask"], a["delta"])
+                self.assertSameResults("buy_decisions", a["sentiment"], a["participant_mask"], a["engaged"],
+                                       a["amount"])
+                self.assertSameResults("sell_decisions", a["sentiment"], a["participant_mask"], a["engaged"],
+                                       a["amount"], a["spendable"])
+
+    def test_votes_without_candidates(self):
+        a = random_arrays(1)
+        a["candidates"][:] = False
+        self.assertSameResults("votes", a["affinity"], a["tokens"], a["holdings"], a["candidates"],
+                               a["participant_mask"])
+
+    def test_float32_support_arrays(self):
+        a = random_arrays(2)
+        for name in ("affinity", "tokens", "conviction"):
+            a[name] = a[name].astype(np.float32)
+        conviction = self.kernels.conviction(a["tokens"], a["conviction"], a["alpha"], a["candidates"],
+                                             a["participant_mask"])
+        tokens = self.kernels.votes(a["affinity"], a["tokens"], a["holdings"], a["candidates"], a["participant_mask"])
+        self.assertEqual((conviction.dtype, tokens.dtype), (np.float32, np.float32))
+        np.testing.assert_allclose(conviction, NumPyKernels.conviction(
+            a["tokens"], a["conviction"], a["alpha"], a["candidates"], a["participant_mask"]), rtol=1e-6)
+        np.testing.assert_allclose(tokens, NumPyKernels.votes(
+            a["affinity"], a["tokens"], a["holdings"], a["candidates"], a["participant_mask"]), rtol=1e-6)
+
+    def test_ensemble(self):
+        histories = [bootstrap_ensemble(2, random_seed=4, backend=backend, timesteps_days=30).run(30)
+                     for backend in ("numpy", self.backend)]
+        for name in SYNCED_VARIABLES:
+            np.testing.assert_allclose(histories[1][name], histories[0][name], rtol=1e-9)
+
+
+class TestLoopKernels(KernelsTestCase, unittest.TestCase):
+    backend = "loops"
+
+
+@unittest.skipUnless(numba_available(), "numba is not installed")
+class TestNumbaKernels(KernelsTestCase, unittest.TestCase):
+    backend = "numba"
+
+
+class TestGetKernels(unittest.TestCase):
+    def test_default(self):
+        self.assertEqual(get_kernels().name, "numba" if numba_available() else "numpy")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(Exception):
+            get_kernels("fortran")
+
+    @unittest.skipIf(numba_available(), "numba is installed")
+    def test_numba_missing(self):
+        with self.assertRaises(ImportError):
+            get_kernels("numba")
+
+
+if __name__ == '__main__':
+    unittest.main()
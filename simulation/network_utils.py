@@ -1,22 +1,194 @@
-from typing import Dict, List, Tuple
+"""
+Functions that build the network of Participants and Proposals and everything
+the policies do with it: add and remove Participants and Proposals, look up
+and update support edges, iterate over edges by type and query Proposals by
+status. Policies only go through these functions, and the ones they use take
+either backend in NETWORK_BACKENDS:
+
+networkx: an nx.DiGraph with an "item" attribute on every node and a
+    ParticipantSupport under "support" on every support edge
+array: an arraynetwork.ArrayNetwork, which keeps the support edges in arrays
+    and scales to far larger networks
+
+They reach either backend through backend(), which returns an ArrayNetwork
+as it is and wraps a DiGraph in a GraphBackend with the same methods.
+
+The functions that build a network (create_network(), bootstrap_network() and
+the setup_*_edges() they call), get_edges_by_participant_and_type() and
+get_proposals_conviction_list() only take a DiGraph. An ArrayNetwork is made
+from one with ArrayNetwork.from_graph().
+
+Either network can move the Proposals that have failed or completed out of
+the way into an entities.ProposalArchive (see archive_proposals()).
+get_proposals() and get_item() still find them there, but they have no
+edges, and Participants that arrive later get none to them.
+"""
+import copy
+from typing import Dict, List, Optional, Tuple
 
 import networkx as nx
 import numpy as np
-from networkx.classes.reportviews import NodeDataView
 
+from arraynetwork import ArrayNetwork
 from convictionvoting import trigger_threshold
-from entities import Participant, ParticipantSupport, Proposal, ProposalStatus
+from entities import Participant, ParticipantSupport, Proposal, ProposalArchive, ProposalStatus
 from hatch import TokenBatch
 
+NETWORK_BACKENDS = ("networkx", "array")
+
+# setup_support_edges() draws affinities 1-4*(1-rv)*rv = (1-2*rv)**2, the
+# square of a uniform number between 0 and 1, so half of them are below 0.5**2
+MEDIAN_NEW_AFFINITY = 0.25
 
-def get_edges_by_type(network: nx.DiGraph, edge_type_selection: str):
-    def filter_by_type(n1, n2):
-        if network.edges[(n1, n2)]["type"] == edge_type_selection:
-            return True
-        return False
 
-    view = nx.subgraph_view(network, filter_edge=filter_by_type)
-    return view.edges()
+class GraphBackend:
+    """
+    The operations the functions below need from a network, on a DiGraph,
+    with the same names as ArrayNetwork's. backend() wraps a DiGraph in one
+    for every call, so it holds no state besides the graph.
+    """
+    __slots__ = ("graph",)
+
+    def __init__(self, graph: nx.DiGraph):
+        self.graph = graph
+
+    @property
+    def archive(self) -> ProposalArchive:
+        return self.graph.graph.get("archive")
+
+    @archive.setter
+    def archive(self, archive: ProposalArchive):
+        self.graph.graph["archive"] = archive
+
+    def item(self, idx: int):
+        return self.graph.nodes[idx]["item"]
+
+    def get_participants(self) -> List[Tuple[int, Participant]]:
+        network = self.graph
+
+        def filter_participant(n):
+            if isinstance(network.nodes[n]["item"], Participant):
+                return True
+            return False
+        view = nx.subgraph_view(network, filter_node=filter_participant)
+        return list(view.nodes(data="item"))
+
+    def get_proposals(self, status: ProposalStatus = None) -> List[Tuple[int, Proposal]]:
+        network = self.graph
+
+        def filter_proposal(n):
+            if isinstance(network.nodes[n]["item"], Proposal):
+                if status:
+                    return network.nodes[n]["item"].status == status
+                return True
+            return False
+
+        view = nx.subgraph_view(network, filter_node=filter_proposal)
+        return list(view.nodes(data="item"))
+
+    def get_edges_by_type(self, edge_type: str):
+        network = self.graph
+
+        def filter_by_type(n1, n2):
+            if network.edges[(n1, n2)]["type"] == edge_type:
+                return True
+            return False
+
+        view = nx.subgraph_view(network, filter_edge=filter_by_type)
+        return view.edges()
+
+    def find_in_edges_of_type(self, proposal_idx: int, edge_type: str) -> List[Tuple[int, int, str]]:
+        ans = []
+        for participant_idx, proposal_idx, t in self.graph.in_edges(proposal_idx, data="type"):
+            if t == edge_type:
+                ans.append((participant_idx, proposal_idx, edge_type))
+        return ans
+
+    def get_support(self, participant_idx: int, proposal_idx: int) -> ParticipantSupport:
+        return self.graph.edges[participant_idx, proposal_idx]["support"]
+
+    def set_support(self, participant_idx: int, proposal_idx: int, support: ParticipantSupport):
+        self.graph.edges[participant_idx, proposal_idx]["support"] = support
+
+    def get_support_edges(self, proposal_idx: int = None) -> List[Tuple[int, int, ParticipantSupport]]:
+        if proposal_idx is None:
+            edges = self.graph.edges(data="support")
+        else:
+            edges = self.graph.in_edges(proposal_idx, data="support")
+        return [(i, j, support) for i, j, support in edges if support]
+
+    def update_conviction(self, alpha: float):
+        network = self.graph
+        for i, j in self.get_edges_by_type("support"):
+            if network.nodes[j]["item"].status == ProposalStatus.CANDIDATE:
+                edge = network.edges[i, j]
+                edge["support"] = edge["support"]._replace(conviction=edge["support"].tokens + alpha*edge["support"].conviction)
+
+    def next_id(self) -> int:
+        archive = self.archive
+        return max(max(self.graph.nodes), archive.max_id if archive is not None else -1) + 1
+
+    def add_participant(self, participant: Participant, random_number_func) -> int:
+        j = self.next_id()
+        self.graph.add_node(j, item=participant)
+        # setup_influence_edges_single(self.graph, j, exponential_func) # TODO: Disabled as these aren't being used on any model policy
+        setup_support_edges(self.graph, random_number_func, j)
+        return j
+
+    def add_proposal(self, proposal: Proposal, random_number_func) -> int:
+        j = self.next_id()
+        self.graph.add_node(j, item=proposal)
+        setup_support_edges(self.graph, random_number_func, j)
+        return j
+
+    def remove_participants(self, idxs: List[int]):
+        self.graph.remove_nodes_from(idxs)
+
+    def remove_proposal(self, idx: int):
+        self.graph.remove_node(idx)
+
+    def total_conviction(self, proposal_idx: int) -> float:
+        incoming_edges = self.graph.in_edges(proposal_idx, data="support")
+        convictions = [support.conviction for _, _, support in incoming_edges if support]
+        return np.sum(convictions)
+
+    def total_affinity(self) -> float:
+        view = self.graph.edges(data="support")
+        affinities = [support.affinity for _, _, support in view]
+        return np.sum(affinities)
+
+    def median_affinity(self) -> Optional[float]:
+        supporters = self.get_edges_by_type("support")
+        if len(supporters) == 0:
+            return None
+        affinities = [self.graph.edges[e]["support"].affinity for e in supporters]
+        return np.median(affinities)
+
+    def copy(self) -> nx.DiGraph:
+        snapshot = self.graph.copy()
+        if "archive" in snapshot.graph:
+            snapshot.graph["archive"] = snapshot.graph["archive"].copy()
+        for _, data in snapshot.nodes(data=True):
+            item = data["item"]
+            if isinstance(item, Participant):
+                data["item"] = Participant(copy.copy(item.holdings), item.sentiment)
+            else:
+                data["item"] = copy.copy(item)
+        return snapshot
+
+
+def backend(network: nx.DiGraph):
+    """
+    The object the functions below call for either backend: an ArrayNetwork
+    itself, or a DiGraph wrapped in a GraphBackend.
+    """
+    if isinstance(network, ArrayNetwork):
+        return network
+    return GraphBackend(network)
+
+
+def get_edges_by_type(network: nx.DiGraph, edge_type_selection: str):
+    return backend(network).get_edges_by_type(edge_type_selection)
 
 
 def get_edges_by_participant_and_type(network: nx.DiGraph, participant_idx: int, edge_type_selection: str) -> Dict:
@@ -28,40 +200,121 @@ def get_edges_by_participant_and_type(network: nx.DiGraph, participant_idx: int,
     return answer
 
 
-def get_proposals(network: nx.DiGraph, status: ProposalStatus = None):
-    def filter_proposal(n):
-        if isinstance(network.nodes[n]["item"], Proposal):
-            if status:
-                return network.nodes[n]["item"].status == status
-            return True
-        return False
+def get_archive(network: nx.DiGraph) -> ProposalArchive:
+    """
+    The ProposalArchive of the network, or None if it never archived a
+    Proposal.
+    """
+    return backend(network).archive
 
-    view = nx.subgraph_view(network, filter_node=filter_proposal)
-    return view.nodes(data="item")
 
+def get_proposals(network: nx.DiGraph, status: ProposalStatus = None,
+                  archived: bool = True) -> List[Tuple[int, Proposal]]:
+    """
+    The (idx, Proposal) of the Proposals with status, or of all of them, the
+    archived ones after those in the network unless archived is False.
+    """
+    archive = get_archive(network) if archived else None
+    if archive and status in (None, ProposalStatus.COMPLETED, ProposalStatus.FAILED):
+        return get_proposals(network, status, archived=False) + archive.get_proposals(status)
+    return backend(network).get_proposals(status)
 
-def get_participants(network: nx.DiGraph) -> NodeDataView:
-    def filter_participant(n):
-        if isinstance(network.nodes[n]["item"], Participant):
-            return True
-        return False
-    view = nx.subgraph_view(network, filter_node=filter_participant)
-    return view.nodes(data="item")
+
+def get_participants(network: nx.DiGraph) -> List[Tuple[int, Participant]]:
+    return backend(network).get_participants()
+
+
+def get_item(network: nx.DiGraph, idx: int):
+    """
+    The Participant or Proposal with the index idx.
+    """
+    b = backend(network)
+    try:
+        return b.item(idx)
+    except KeyError:
+        archive = b.archive
+        if archive is None or idx not in archive:
+            raise
+        return archive.item(idx)
+
+
+def get_support(network: nx.DiGraph, participant_idx: int, proposal_idx: int) -> ParticipantSupport:
+    return backend(network).get_support(participant_idx, proposal_idx)
+
+
+def set_support(network: nx.DiGraph, participant_idx: int, proposal_idx: int, support: ParticipantSupport):
+    backend(network).set_support(participant_idx, proposal_idx, support)
+
+
+def get_support_edges(network: nx.DiGraph, proposal_idx: int = None) -> List[Tuple[int, int, ParticipantSupport]]:
+    """
+    (participant_idx, proposal_idx, ParticipantSupport) of every support
+    edge, or of the support edges to the Proposal proposal_idx.
+    """
+    return backend(network).get_support_edges(proposal_idx)
+
+
+def update_conviction(network: nx.DiGraph, alpha: float):
+    """
+    Adds the tokens staked on every support edge to a Candidate Proposal to
+    the edge's conviction, after decaying it with alpha.
+    """
+    backend(network).update_conviction(alpha)
 
 
 def add_proposal(network: nx.DiGraph, p: Proposal, random_number_func) -> Tuple[nx.DiGraph, int]:
-    j = max(network.nodes) + 1
-    network.add_node(j, item=p)
-    network = setup_support_edges(network, random_number_func, j)
-    return network, j
+    return network, backend(network).add_proposal(p, random_number_func)
 
 
 def add_participant(network: nx.DiGraph, p: Participant, exponential_func, random_number_func) -> Tuple[nx.DiGraph, int]:
-    j = max(network.nodes) + 1
-    network.add_node(j, item=p)
-    # network = setup_influence_edges_single(network, j, exponential_func) # TODO: Disabled as these aren't being used on any model policy
-    network = setup_support_edges(network, random_number_func, j)
-    return network, j
+    return network, backend(network).add_participant(p, random_number_func)
+
+
+def next_id(network: nx.DiGraph) -> int:
+    """
+    One more than the largest index in use, so that a new node never takes
+    the index of an archived Proposal.
+    """
+    return backend(network).next_id()
+
+
+def archive_proposals(network: nx.DiGraph, idxs: List[int]):
+    """
+    Moves the failed or completed Proposals idxs out of the network into its
+    ProposalArchive, dropping their support and conflict edges. The policies
+    only read those edges until the Participants' sentiment has been updated
+    for the Proposal's ending, and every Participant that arrives later would
+    otherwise get one more edge for every Proposal that ever ended.
+    """
+    if not idxs:
+        return
+    b = backend(network)
+    if b.archive is None:
+        b.archive = ProposalArchive()
+    archive = b.archive
+    for idx in idxs:
+        proposal = get_item(network, idx)
+        if proposal.status not in (ProposalStatus.COMPLETED, ProposalStatus.FAILED):
+            raise Exception("Proposal {} is {}, only failed or completed Proposals can be archived".format(
+                idx, proposal.status))
+        archive.add(idx, proposal, [support for _, _, support in b.get_support_edges(idx)])
+        b.remove_proposal(idx)
+
+
+def remove_participant(network: nx.DiGraph, idx: int):
+    """
+    Removes the Participant with the index idx and its support edges.
+    """
+    remove_participants(network, [idx])
+
+
+def remove_participants(network: nx.DiGraph, idxs: List[int]):
+    """
+    Removes the Participants with the indexes idxs and their support edges,
+    at once. An ArrayNetwork only leaves tombstones in their rows, which it
+    drops in batches (see ArrayNetwork.compact()).
+    """
+    backend(network).remove_participants(idxs)
 
 
 def create_network(token_batches: List[TokenBatch], probability_func, random_number_func) -> nx.DiGraph:
@@ -71,7 +324,7 @@ def create_network(token_batches: List[TokenBatch], probability_func, random_num
     """
     network = nx.DiGraph()
     for i, tb in enumerate(token_batches):
-        p_instance = Participant(tb, probability_func, random_number_func)
+        p_instance = Participant(tb, random_number_func())
         # Make the initial participants have sentiments between 0.5 and 1
         p_instance.sentiment = 0.5 + 0.5 * random_number_func()
         network.add_node(i, item=p_instance)
@@ -205,7 +458,7 @@ def setup_support_edges(network: nx.DiGraph, random_number_func, idx=None) -> nx
         n.add_edge(i, j, support=ParticipantSupport(affinity=a_rv, tokens=0, conviction=0), type="support")
         return n
     participants = dict(get_participants(network))
-    proposals = dict(get_proposals(network))
+    proposals = dict(get_proposals(network, archived=False))
 
     if idx is None:
         for prop in proposals:
@@ -249,35 +502,36 @@ def calc_total_funds_requested(network: nx.DiGraph):
 
 
 def calc_median_affinity(network: nx.DiGraph):
-    supporters = get_edges_by_type(network, 'support')
-    if len(supporters) == 0:
+    """
+    The median affinity of the support edges. A network that has archived
+    every Proposal it had has none left, and takes the median of the
+    distribution new support edges are drawn from instead.
+    """
+    b = backend(network)
+    median_affinity = b.median_affinity()
+    if median_affinity is None:
+        if b.archive:
+            return MEDIAN_NEW_AFFINITY
         raise Exception("The network has 0 support edges!")
-
-    affinities = [network.edges[e]['support'].affinity for e in supporters]
-    median_affinity = np.median(affinities)
     return median_affinity
 
 
 def calc_total_conviction(network: nx.DiGraph, proposal_idx: int) -> float:
-    proposal = network.nodes(data="item")[proposal_idx]
+    proposal = get_item(network, proposal_idx)
     if not isinstance(proposal, Proposal):
         raise Exception(
             "proposal_idx must point to a node that has a Proposal")
-
-    incoming_edges = network.in_edges(proposal_idx, data="support")
-    convictions = [support.conviction for _, _, support in incoming_edges if support]
-
-    return np.sum(convictions)
+    return backend(network).total_conviction(proposal_idx)
 
 
 def calc_total_affinity(network: nx.DiGraph) -> float:
-    view = network.edges(data="support")
-    affinities = [support.affinity for _, _, support in view]
-    return np.sum(affinities)
+    return backend(network).total_affinity()
 
 
 def calc_avg_sentiment(network: nx.DiGraph) -> float:
     participants = get_participants(network)
+    if len(participants) == 0:
+        return 0.0
     sentiment_total = 0.0
     for _, participant in participants:
         sentiment_total += participant.sentiment
@@ -286,13 +540,22 @@ def calc_avg_sentiment(network: nx.DiGraph) -> float:
     return sentiment_avg
 
 
-def find_in_edges_of_type_for_proposal(network: nx.DiGraph, proposal_idx: int, edge_type: str) -> List[Tuple[int, int, str]]:
-    ans = []
-    for participant_idx, proposal_idx, t in network.in_edges(proposal_idx, data="type"):
-        if t == edge_type:
-            ans.append((participant_idx, proposal_idx, edge_type))
+def snapshot_network(network: nx.DiGraph) -> nx.DiGraph:
+    """
+    Returns a copy of the network that stays as it is while the simulation
+    goes on, in a fraction of the time copy.deepcopy(network) takes.
+
+    The graph structure and the attribute dicts are new, but the attribute
+    values are shared with the network: they are floats, strings and
+    ParticipantSupport NamedTuples, which policies replace instead of
+    modifying. Only the Participants (with their TokenBatches) and Proposals,
+    which policies modify in place, are copied.
+    """
+    return backend(network).copy()
+
 
-    return ans
+def find_in_edges_of_type_for_proposal(network: nx.DiGraph, proposal_idx: int, edge_type: str) -> List[Tuple[int, int, str]]:
+    return backend(network).find_in_edges_of_type(proposal_idx, edge_type)
 
 
 def get_proposals_conviction_list(network):
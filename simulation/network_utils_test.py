@@ -7,12 +7,13 @@ import numpy as np
 from entities import Participant, Proposal, ProposalStatus
 from hatch import TokenBatch, VestingOptions
 from utils import new_probability_func, new_exponential_func, new_gamma_func, new_random_number_func
-from network_utils import (add_proposal, add_participant, bootstrap_network, calc_avg_sentiment,
+from network_utils import (MEDIAN_NEW_AFFINITY, add_proposal, add_participant, archive_proposals, bootstrap_network,
+                           calc_avg_sentiment,
                            calc_median_affinity, calc_total_affinity, calc_total_conviction,
                            calc_total_funds_requested, find_in_edges_of_type_for_proposal, get_edges_by_type, get_edges_by_participant_and_type,
-                           get_participants, get_proposals, get_proposals_conviction_list,
+                           get_archive, get_item, get_participants, get_proposals, get_proposals_conviction_list,
                            setup_conflict_edges, setup_influence_edges_bulk,
-                           setup_influence_edges_single, setup_support_edges)
+                           setup_influence_edges_single, setup_support_edges, snapshot_network)
 
 
 class TestNetworkUtils(unittest.TestCase):
@@ -26,8 +27,7 @@ class TestNetworkUtils(unittest.TestCase):
         }
 
         for i in range(0, 10, 2):
-            self.network.add_node(i, item=Participant(TokenBatch(0, 0), self.params["probability_func"],
-                                self.params["random_number_func"]))
+            self.network.add_node(i, item=Participant(TokenBatch(0, 0), self.params["random_number_func"]()))
             self.network.add_node(i+1, item=Proposal(10, 5))
 
     def test_get_participants(self):
@@ -265,8 +265,8 @@ class TestNetworkUtils(unittest.TestCase):
         particular node.
         """
         n1, j = add_participant(self.network,
-                                Participant(TokenBatch(0, 0), self.params["probability_func"],
-                                self.params["random_number_func"]), self.params["exponential_func"],
+                                Participant(TokenBatch(0, 0), self.params["random_number_func"]()),
+                                self.params["exponential_func"],
                                 self.params["random_number_func"])
         self.assertIsInstance(n1.nodes[j]["item"], Participant)
 
@@ -325,6 +325,71 @@ class TestNetworkUtils(unittest.TestCase):
         self.network.nodes[8]["item"].sentiment = 0.5
         self.assertEqual(0.9, calc_avg_sentiment(self.network))
 
+    def test_snapshot_network(self):
+        """
+        Ensure that the snapshot holds the same network, and that it does not
+        change when the network it was taken from changes.
+        """
+        self.network = setup_support_edges(self.network, self.params["random_number_func"])
+        self.network = setup_conflict_edges(self.network, self.params["random_number_func"], rate=1)
+        snapshot = snapshot_network(self.network)
+
+        self.assertEqual(list(snapshot.edges(data=True)), list(self.network.edges(data=True)))
+        for i, item in self.network.nodes(data="item"):
+            self.assertEqual(repr(snapshot.nodes[i]["item"]), repr(item))
+            self.assertIsNot(snapshot.nodes[i]["item"], item)
+
+        self.network.nodes[0]["item"].sentiment = 0.1
+        self.network.nodes[0]["item"].holdings.update_age()
+        self.network.nodes[1]["item"].status = ProposalStatus.ACTIVE
+        self.network.edges[0, 1]["support"] = self.network.edges[0, 1]["support"]._replace(tokens=10)
+        self.network.remove_node(2)
+
+        self.assertNotEqual(snapshot.nodes[0]["item"].sentiment, 0.1)
+        self.assertEqual(snapshot.nodes[0]["item"].holdings.age_days, 0)
+        self.assertEqual(snapshot.nodes[1]["item"].status, ProposalStatus.CANDIDATE)
+        self.assertEqual(snapshot.edges[0, 1]["support"].tokens, 0)
+        self.assertIn(2, snapshot)
+
+    def test_archive_proposals(self):
+        """
+        Archived Proposals lose their edges but are still found by
+        get_proposals() and get_item(), and later Participants and Proposals
+        neither connect to them nor take their indexes.
+        """
+        self.network = setup_support_edges(self.network, self.params["random_number_func"])
+        self.network = setup_conflict_edges(self.network, self.params["random_number_func"], rate=1)
+        self.network.edges[0, 9]["support"] = self.network.edges[0, 9]["support"]._replace(tokens=10, conviction=30)
+        self.network.nodes[9]["item"].status = ProposalStatus.COMPLETED
+        self.network.nodes[7]["item"].status = ProposalStatus.FAILED
+        with self.assertRaises(Exception):
+            archive_proposals(self.network, [5])
+
+        archive_proposals(self.network, [7, 9])
+        self.assertNotIn(9, self.network)
+        self.assertEqual(len(get_edges_by_type(self.network, "support")), 15)
+        self.assertEqual(len(get_edges_by_type(self.network, "conflict")), 6)
+        self.assertEqual([j for j, _ in get_proposals(self.network)], [1, 3, 5, 7, 9])
+        self.assertEqual([j for j, _ in get_proposals(self.network, status=ProposalStatus.COMPLETED)], [9])
+        self.assertEqual([j for j, _ in get_proposals(self.network, status=ProposalStatus.CANDIDATE)], [1, 3, 5])
+        self.assertEqual(get_item(self.network, 7).status, ProposalStatus.FAILED)
+        self.assertEqual(get_archive(self.network).summary(9), {"supporters": 1, "tokens": 10, "conviction": 30})
+
+        snapshot = snapshot_network(self.network)
+        self.network, i = add_participant(self.network, Participant(TokenBatch(0, 0), 0.5),
+                                          self.params["exponential_func"], self.params["random_number_func"])
+        self.assertEqual(i, 10)
+        self.assertEqual(sorted(j for _, j in self.network.out_edges(i)), [1, 3, 5])
+        self.network.nodes[5]["item"].status = ProposalStatus.FAILED
+        archive_proposals(self.network, [5])
+        self.assertEqual(len(get_archive(snapshot)), 2)
+        self.assertEqual(len(get_archive(self.network)), 3)
+
+        for j in (1, 3):
+            self.network.nodes[j]["item"].status = ProposalStatus.COMPLETED
+        archive_proposals(self.network, [1, 3])
+        self.assertEqual(calc_median_affinity(self.network), MEDIAN_NEW_AFFINITY)
+
     def test_find_in_edges_of_type_for_proposal(self):
         """
         Ensure that only edges of the specified type are included in the answer
@@ -1,41 +1,64 @@
 import config
 import copy
+from typing import Optional, Tuple
+
 import numpy as np
 
 import config
 from convictionvoting import trigger_threshold
 from entities import Participant, Proposal, ProposalStatus
 from hatch import TokenBatch
-from network_utils import (add_proposal, add_participant, calc_median_affinity, calc_total_conviction,
-                           calc_total_funds_requested, find_in_edges_of_type_for_proposal, get_edges_by_type,
-                           get_participants, get_proposals)
+from network_utils import (add_proposal, add_participant, archive_proposals, calc_median_affinity, calc_total_conviction,
+                           calc_total_funds_requested, find_in_edges_of_type_for_proposal, get_item,
+                           get_participants, get_proposals, get_support, get_support_edges, remove_participants,
+                           set_support, update_conviction)
+
+# How Active Proposals come to fail or complete. "daily" tries every Active
+# Proposal every day, "scheduled" samples the day once as the Proposal becomes
+# Active (see ProposalFunding.su_schedule_proposal_endings()).
+PROPOSAL_LIFETIMES = ("daily", "scheduled")
 
 
 class GenerateNewParticipant:
+    @staticmethod
+    def arrivals(params, timestep, sentiment):
+        """
+        How many Participants may arrive after timestep, and the chance of
+        each of them arriving.
+        """
+        speculation_days = params["speculation_days"]
+        multiplier_new_participants = params["multiplier_new_participants"]
+
+        # Stress scenarios (see scenarios.py) override how many Participants
+        # may arrive each day through params.
+        base_max_new_participants = params.get("max_new_participants", config.max_new_participants)
+        arrival_rate_denominator = params.get("arrival_rate_denominator", config.arrival_rate_denominator)
+        load_profile = params.get("load_profile")
+        if load_profile:
+            base_max_new_participants = load_profile(timestep, base_max_new_participants)
+
+        if timestep < speculation_days:
+            # If in speculation period, the arrival rate is higher
+            arrival_rate = 0.5 + 0.5 * sentiment
+            multiplier = multiplier_new_participants
+            max_new_participants = base_max_new_participants * multiplier
+        else:
+            arrival_rate = (1+sentiment)/arrival_rate_denominator
+            max_new_participants = base_max_new_participants
+        return max_new_participants, arrival_rate
+
     @staticmethod
     def p_randomly(params, step, sL, s, **kwargs):
         commons = s["commons"]
-        sentiment = s["sentiment"]
-        timestep = s["timestep"]
         probability_func = params["probability_func"]
         exponential_func = params["exponential_func"]
-        speculation_days = params["speculation_days"]
-        multiplier_new_participants = params["multiplier_new_participants"]
+        max_new_participants, arrival_rate = GenerateNewParticipant.arrivals(params, s["timestep"], s["sentiment"])
 
         ans = {
             "new_participant_investment": None,
             "new_participant_tokens": None
         }
         dict_ans = {}
-        if timestep < speculation_days:
-            # If in speculation period, the arrival rate is higher
-            arrival_rate = 0.5 + 0.5 * sentiment
-            multiplier = multiplier_new_participants
-            max_new_participants = config.max_new_participants * multiplier
-        else:
-            arrival_rate = (1+sentiment)/config.arrival_rate_denominator
-            max_new_participants = config.max_new_participants
-
         for i in range(max_new_participants):
             if probability_func(arrival_rate):
                 # Here we randomly generate each participant's post-Hatch
@@ -59,7 +82,6 @@ class GenerateNewParticipant:
     @staticmethod
     def su_add_to_network(params, step, sL, s, _input, **kwargs):
         network = s["network"]
-        probability_func = params["probability_func"]
         exponential_func = params["exponential_func"]
         random_number_func = params["random_number_func"]
 
@@ -67,8 +89,8 @@ class GenerateNewParticipant:
             ans = _input[i]
             if ans != 0:
                 network, i = add_participant(network, Participant(TokenBatch(
-                    0, ans["new_participant_tokens"]), probability_func,
-                    random_number_func), exponential_func, random_number_func)
+                    0, ans["new_participant_tokens"]), random_number_func()),
+                    exponential_func, random_number_func)
 
                 if params.get("debug"):
                     print("GenerateNewParticipant: A new Participant {} invested {}DAI for {} tokens".format(
@@ -104,15 +126,18 @@ class GenerateNewProposal:
         """
         funding_pool = s["funding_pool"]
         network = s["network"]
+        probability_func = params["probability_func"]
         choice_func = params["choice_func"]
 
         participants = get_participants(network)
         participants_dict = dict(participants)
+        if not participants_dict:
+            return {"new_proposal": False, "proposed_by_participant": None}
         i = choice_func(list(participants_dict))
         participant = participants_dict[i]
 
         wants_to_create_proposal = participant.create_proposal(calc_total_funds_requested(
-            network), calc_median_affinity(network), funding_pool)
+            network), calc_median_affinity(network), funding_pool, probability_func)
 
         return {"new_proposal": wants_to_create_proposal, "proposed_by_participant": i}
 
@@ -134,9 +159,9 @@ class GenerateNewProposal:
             # add_proposal() has created support edges from other Participants
             # to this Proposal. If the Participant is the one who created this
             # Proposal, set the participant's role as author and change his affinity for the Proposal to 1 (maximum).
-            network.edges[_input["proposed_by_participant"],
-                            proposal_idx]["support"] = \
-                                network.edges[_input["proposed_by_participant"], proposal_idx]["support"]._replace(affinity=1, is_author=True)
+            author_idx = _input["proposed_by_participant"]
+            set_support(network, author_idx, proposal_idx,
+                        get_support(network, author_idx, proposal_idx)._replace(affinity=1, is_author=True))
             if params.get("debug"):
                 print("GenerateNewProposal: Participant {} created Proposal {}".format(
                     _input["proposed_by_participant"], proposal_idx))
@@ -168,20 +193,57 @@ class GenerateNewFunding:
 
 
 class ActiveProposals:
+    @staticmethod
+    def rates(proposal: Proposal) -> Tuple[float, float]:
+        """
+        The daily chance of an Active Proposal failing, and of it completing
+        if it does not fail.
+        """
+        r_failure = 1/(config.base_failure_rate +
+                       np.log(proposal.funds_requested))
+        r_success = 1/(config.base_success_rate +
+                       np.log(proposal.funds_requested))
+        return r_failure, r_success
+
+    @staticmethod
+    def sample_lifetime(proposal: Proposal, random_number_func) -> Tuple[Optional[int], ProposalStatus]:
+        """
+        On which of its days as an Active Proposal (1 being the day it became
+        Active) the Proposal fails or completes, and which of the two.
+
+        Trying rates() every day until one of them succeeds ends on the
+        first success of Bernoulli trials with p = 1 - (1 - r_failure) * (1 -
+        r_success), so the day is geometric with that p, and the Proposal
+        fails with probability r_failure / p. The day is None if the
+        Proposal can never end.
+        """
+        r_failure, r_success = ActiveProposals.rates(proposal)
+        p = 1 - (1 - r_failure) * (1 - r_success)
+        if p <= 0:
+            return None, ProposalStatus.ACTIVE
+        days = 1
+        u = random_number_func()
+        if p < 1:
+            days = int(np.floor(np.log1p(-u) / np.log1p(-p))) + 1
+        status = ProposalStatus.FAILED if random_number_func() * p < r_failure else ProposalStatus.COMPLETED
+        return days, status
+
     @staticmethod
     def p_influenced_by_grant_size(params, step, sL, s, **kwargs):
         network = s["network"]
         probability_func = params["probability_func"]
 
+        if params.get("proposal_lifetimes") == "scheduled":
+            due = sorted(s["proposal_schedule"].due(s["timestep"]))
+            return {"failed": [idx for idx, status in due if status == ProposalStatus.FAILED],
+                    "succeeded": [idx for idx, status in due if status == ProposalStatus.COMPLETED]}
+
         active_proposals = get_proposals(network, status=ProposalStatus.ACTIVE)
         proposals_that_will_fail = []
         proposals_that_will_succeed = []
 
         for idx, proposal in active_proposals:
-            r_failure = 1/(config.base_failure_rate +
-                           np.log(proposal.funds_requested))
-            r_success = 1/(config.base_success_rate +
-                           np.log(proposal.funds_requested))
+            r_failure, r_success = ActiveProposals.rates(proposal)
             if probability_func(r_failure):
                 proposals_that_will_fail.append(idx)
             elif probability_func(r_success):
@@ -192,13 +254,20 @@ class ActiveProposals:
     def su_set_proposal_status(params, step, sL, s, _input, **kwargs):
         network = s["network"]
         for idx in _input["failed"]:
-            network.nodes[idx]["item"].status = ProposalStatus.FAILED
+            get_item(network, idx).status = ProposalStatus.FAILED
 
         for idx in _input["succeeded"]:
-            network.nodes[idx]["item"].status = ProposalStatus.COMPLETED
+            get_item(network, idx).status = ProposalStatus.COMPLETED
 
         return "network", network
 
+    @staticmethod
+    def su_remove_due_endings(params, step, sL, s, _input, **kwargs):
+        schedule = s["proposal_schedule"]
+        if params.get("proposal_lifetimes") == "scheduled":
+            schedule.remove(s["timestep"])
+        return "proposal_schedule", schedule
+
 
 class ProposalFunding:
     @staticmethod
@@ -232,16 +301,36 @@ class ProposalFunding:
         network = s["network"]
 
         for idx in _input["proposal_idxs_with_enough_conviction"]:
-            network.nodes[idx]["item"].status = ProposalStatus.ACTIVE
+            get_item(network, idx).status = ProposalStatus.ACTIVE
 
         return "network", network
 
+    @staticmethod
+    def su_schedule_proposal_endings(params, step, sL, s, _input, **kwargs):
+        """
+        With params["proposal_lifetimes"] == "scheduled", samples on which
+        day each Proposal that becomes Active will fail or complete (see
+        ActiveProposals.sample_lifetime()). Its first day as an Active
+        Proposal is today, because the Proposals become failed or completed
+        later in the same timestep.
+        """
+        schedule = s["proposal_schedule"]
+        if params.get("proposal_lifetimes") != "scheduled":
+            return "proposal_schedule", schedule
+
+        network = s["network"]
+        for idx in _input["proposal_idxs_with_enough_conviction"]:
+            days, status = ActiveProposals.sample_lifetime(get_item(network, idx), params["random_number_func"])
+            if days is not None:
+                schedule.add(s["timestep"] + days - 1, idx, status)
+        return "proposal_schedule", schedule
+
     @staticmethod
     def su_deduct_funds_from_funding_pool(params, step, sL, s, _input, **kwargs):
         commons = s["commons"]
         network = s["network"]
         for idx in _input["proposal_idxs_with_enough_conviction"]:
-            funds = network.nodes[idx]["item"].funds_requested
+            funds = get_item(network, idx).funds_requested
             if params.get("debug"):
                 print("ProposalFunding: Proposal {} passed! deducting {} from Commons funding pool".format(
                     idx, funds))
@@ -272,18 +361,12 @@ class ProposalFunding:
         network = s["network"]
         alpha = params["alpha_days_to_80p_of_max_voting_weight"]
 
-        support_edges = get_edges_by_type(network, "support")
-        for i, j in support_edges:
-            proposal_status = network.nodes[j]['item'].status
-            if proposal_status == ProposalStatus.CANDIDATE:
-                edge = network.edges[i, j]
-                prior_conviction = edge['support'].conviction
-                current_tokens = edge['support'].tokens
-
-                edge['support'] = edge['support']._replace(conviction=current_tokens + alpha*prior_conviction)
-                if params.get("debug") and s["timestep"] == 1:
+        update_conviction(network, alpha)
+        if params.get("debug") and s["timestep"] == 1:
+            for i, j, support in get_support_edges(network):
+                if get_item(network, j).status == ProposalStatus.CANDIDATE:
                     print("ProposalFunding: Participant {} initially has staked {} tokens on Proposal {}, which will result in {} conviction in the next timestep".format(
-                        i, current_tokens, j, edge["support"].conviction))
+                        i, support.tokens, j, support.conviction))
 
         return "network", network
 
@@ -301,6 +384,7 @@ class ParticipantVoting:
         how much it will stake on each of them.
         """
         network = s["network"]
+        probability_func = params["probability_func"]
         participants = get_participants(network)
         candidate_proposals = get_proposals(
             network, status=ProposalStatus.CANDIDATE)
@@ -309,9 +393,9 @@ class ParticipantVoting:
         for participant_idx, participant in participants:
             proposal_idx_affinity = {}  # {4: 0.9, 5: 0.9}
             for proposal_idx, _ in candidate_proposals:
-                proposal_idx_affinity[proposal_idx] = network[participant_idx][proposal_idx]["support"].affinity
+                proposal_idx_affinity[proposal_idx] = get_support(network, participant_idx, proposal_idx).affinity
             proposals_that_participant_cares_enough_to_vote_on = participant.vote_on_candidate_proposals(
-                proposal_idx_affinity)
+                proposal_idx_affinity, probability_func)
 
             stake_across_all_supported_proposals_input = []
             for proposal_idx, affinity in proposals_that_participant_cares_enough_to_vote_on.items():
@@ -347,7 +431,8 @@ class ParticipantVoting:
                 # the affinities in
                 # p_participant_votes_on_proposal_according_to_affinity()
                 # Also, do not recalculate conviction here. Leave that to ProposalFunding.su_calculate_conviction()
-                network[participant_idx][proposal_idx]["support"] = network[participant_idx][proposal_idx]["support"]._replace(tokens=tokens_staked)
+                set_support(network, participant_idx, proposal_idx,
+                            get_support(network, participant_idx, proposal_idx)._replace(tokens=tokens_staked))
 
         return "network", network
 
@@ -371,13 +456,15 @@ class ParticipantBuysTokens:
     def p_decide_to_buy_tokens_bulk(params, step, sL, s, **kwargs):
         network = s["network"]
         commons = s["commons"]
+        probability_func = params["probability_func"]
+        random_number_func = params["random_number_func"]
         participants = get_participants(network)
         ans = {}
         total_dai = 0
         for i, participant in participants:
             # If a participant decides to buy, it will be specified in units of DAI.
             # If a participant decides to sell, it will be specified in units of tokens.
-            x = participant.buy()
+            x = participant.buy(probability_func, random_number_func)
             if x > 0:
                 total_dai += x
                 ans[i] = x
@@ -429,7 +516,7 @@ class ParticipantBuysTokens:
         tokens = _input["tokens"]
 
         for participant_idx, decision in decisions.items():
-            network.nodes[participant_idx]["item"].increase_holdings(
+            get_item(network, participant_idx).increase_holdings(
                 final_token_distribution[participant_idx] * tokens)
 
         return "network", network
@@ -440,13 +527,15 @@ class ParticipantSellsTokens:
     def p_decide_to_sell_tokens_bulk(params, step, sL, s, **kwargs):
         network = s["network"]
         commons = s["commons"]
+        probability_func = params["probability_func"]
+        random_number_func = params["random_number_func"]
         participants = get_participants(network)
         ans = {}
         total_tokens = 0
         for i, participant in participants:
             # If a participant decides to buy, it will be specified in units of DAI.
             # If a participant decides to sell, it will be specified in units of tokens.
-            x = participant.sell()
+            x = participant.sell(probability_func, random_number_func)
             if x > 0:
                 total_tokens += x
                 ans[i] = x
@@ -495,7 +584,7 @@ class ParticipantSellsTokens:
         dai_returned = _input["dai_returned"]
 
         for participant_idx, decision in decisions.items():
-            network.nodes[participant_idx]["item"].spend(decision)
+            get_item(network, participant_idx).spend(decision)
 
         return "network", network
 
@@ -504,10 +593,11 @@ class ParticipantExits:
     @staticmethod
     def p_participant_decides_if_he_wants_to_exit(params, step, sL, s, **kwargs):
         network = s["network"]
+        probability_func = params["probability_func"]
         participants = get_participants(network)
         defectors = {}
         for i, participant in participants:
-            e = participant.wants_to_exit()
+            e = participant.wants_to_exit(probability_func)
             if e:
                 defectors[i] = {
                     "sentiment": participant.sentiment,
@@ -524,8 +614,7 @@ class ParticipantExits:
         network = s["network"]
         defectors = _input["defectors"]
 
-        for i, _ in defectors.items():
-            network.remove_node(i)
+        remove_participants(network, list(defectors))
 
         return "network", network
 
@@ -551,12 +640,13 @@ class ParticipantExits:
         report = {}
         for idx in policy_output_passthru["proposal_idxs_with_enough_conviction"]:
             for participant_idx, proposal_idx, _ in find_in_edges_of_type_for_proposal(network, idx, "support"):
-                edge = network.edges[participant_idx, proposal_idx]
-                if edge["support"].is_author:
-                    sentiment_old = network.nodes[participant_idx]["item"].sentiment
+                support = get_support(network, participant_idx, proposal_idx)
+                if support.is_author:
+                    participant = get_item(network, participant_idx)
+                    sentiment_old = participant.sentiment
                     sentiment_new = sentiment_old + config.sentiment_bonus_proposal_becomes_active
                     sentiment_new = 1 if sentiment_new > 1 else sentiment_new
-                    network.nodes[participant_idx]["item"].sentiment = sentiment_new
+                    participant.sentiment = sentiment_new
 
                     report[participant_idx] = {
                         "proposal_idx": proposal_idx,
@@ -582,15 +672,15 @@ class ParticipantExits:
         report = {}
         for status, delta in proposal_status_delta.items():
             for idx in policy_output_passthru[status]:
-                for participant_idx, proposal_idx, _ in find_in_edges_of_type_for_proposal(network, idx, "support"):
-                    edge = network.edges[participant_idx, proposal_idx]
+                for participant_idx, proposal_idx, support in get_support_edges(network, idx):
                     # Update the participant sentiment if he/she is the proposal creator
                     # or if participant has staked on the proposal (tokens > 0)
-                    if edge["support"].is_author or edge["support"].tokens > 0:
-                        sentiment_old = network.nodes[participant_idx]["item"].sentiment
-                        sentiment_new = sentiment_old + (edge["support"].affinity * delta)
+                    if support.is_author or support.tokens > 0:
+                        participant = get_item(network, participant_idx)
+                        sentiment_old = participant.sentiment
+                        sentiment_new = sentiment_old + (support.affinity * delta)
                         sentiment_new = np.clip(sentiment_new, a_min=0., a_max=1.)
-                        network.nodes[participant_idx]["item"].sentiment = sentiment_new
+                        participant.sentiment = sentiment_new
 
                         report[participant_idx] = {
                             "proposal_idx": proposal_idx,
@@ -599,6 +689,10 @@ class ParticipantExits:
                             "status": status
                         }
 
+        # Nothing reads the support edges of these Proposals any more
+        if params.get("archive_proposals"):
+            archive_proposals(network, policy_output_passthru["failed"] + policy_output_passthru["succeeded"])
+
         if params.get("debug"):
             for i in report:
                 print(
@@ -613,9 +707,9 @@ class ParticipantSentiment:
 
         participants = get_participants(network)
         for participant_idx, participant in participants:
-            sentiment_old = network.nodes[participant_idx]["item"].sentiment
+            sentiment_old = participant.sentiment
             sentiment_new = sentiment_old - config.sentiment_decay
             sentiment_new = 0 if sentiment_new < 0 else sentiment_new
-            network.nodes[participant_idx]["item"].sentiment = sentiment_new
+            participant.sentiment = sentiment_new
 
         return "network", network
@@ -10,7 +10,7 @@ import networkx as nx
 from utils import (new_probability_func, new_exponential_func,
                    new_gamma_func, new_random_number_func,
                    new_choice_func)
-from entities import Proposal, ProposalStatus
+from entities import Proposal, ProposalSchedule, ProposalStatus
 from hatch import Commons, TokenBatch, VestingOptions
 from network_utils import (add_proposal, bootstrap_network,
                            calc_total_conviction, get_edges_by_type,
@@ -255,6 +255,39 @@ class TestActiveProposals(unittest.TestCase):
         self.assertEqual(network1.nodes[5]
                          ["item"].status, ProposalStatus.COMPLETED)
 
+    def test_sample_lifetime(self):
+        """
+        The sampled day and outcome follow the distribution of trying the
+        daily Bernoulli trials until one succeeds.
+        """
+        proposal = Proposal(100, 1)
+        r_failure, r_success = ActiveProposals.rates(proposal)
+        p = 1 - (1 - r_failure) * (1 - r_success)
+        random_number_func = new_random_number_func(1)
+        samples = [ActiveProposals.sample_lifetime(proposal, random_number_func) for _ in range(20000)]
+        days = np.array([d for d, _ in samples])
+        failed = np.array([status == ProposalStatus.FAILED for _, status in samples])
+
+        self.assertTrue((days >= 1).all())
+        self.assertAlmostEqual(days.mean() * p, 1, delta=0.03)
+        self.assertAlmostEqual((days == 1).mean(), p, delta=0.01)
+        self.assertAlmostEqual(failed.mean(), r_failure / p, delta=0.01)
+
+    def test_p_influenced_by_grant_size_scheduled(self):
+        schedule = ProposalSchedule()
+        schedule.add(3, 5, ProposalStatus.COMPLETED)
+        schedule.add(3, 4, ProposalStatus.FAILED)
+        schedule.add(7, 4, ProposalStatus.COMPLETED)
+        self.params["proposal_lifetimes"] = "scheduled"
+        self.params["probability_func"] = always
+        s = {"network": self.network, "proposal_schedule": schedule, "timestep": 3}
+
+        ans = ActiveProposals.p_influenced_by_grant_size(self.params, 0, 0, s)
+        self.assertEqual(ans, {"failed": [4], "succeeded": [5]})
+        _, schedule = ActiveProposals.su_remove_due_endings(self.params, 0, 0, s, ans)
+        self.assertEqual(schedule.due(3), [])
+        self.assertEqual(len(schedule), 1)
+
 
 class TestProposalFunding(unittest.TestCase):
     def setUp(self):
@@ -297,15 +330,27 @@ class TestProposalFunding(unittest.TestCase):
             self.assertEqual(
                 n_new.nodes[i]["item"].status, ProposalStatus.ACTIVE)
 
+    def test_su_schedule_proposal_endings(self):
+        state = {"network": self.network, "proposal_schedule": ProposalSchedule(), "timestep": 10}
+        _input = {"proposal_idxs_with_enough_conviction": [4, 5]}
+        _, schedule = ProposalFunding.su_schedule_proposal_endings(self.params, 0, 0, state, _input)
+        self.assertEqual(len(schedule), 0)
+
+        params = dict(self.params, proposal_lifetimes="scheduled")
+        _, schedule = ProposalFunding.su_schedule_proposal_endings(params, 0, 0, state, _input)
+        endings = sorted((idx, day) for day, due in schedule.days.items() for idx, _ in due)
+        self.assertEqual([idx for idx, _ in endings], [4, 5])
+        self.assertTrue(all(day >= 10 for _, day in endings))
+
     def test_su_deduct_funds_from_funding_pool(self):
         """
         Test that the code runs and if there is any proposal with enough
         conviction, the fund requested by the proposal will be deducted
         from de funding pool.
         """
-        _input = {"proposal_idxs_with_enough_conviction": [3]}
+        _input = {"proposal_idxs_with_enough_conviction": [4]}
         network_copy = copy.copy(self.network)
-        network_copy.nodes[3]["item"].funds_requested = 50
+        network_copy.nodes[4]["item"].funds_requested = 50
         old_funding_pool = self.commons._funding_pool
         ProposalFunding.su_deduct_funds_from_funding_pool(
             self.params, 0, 0, {"commons": self.commons,"network": network_copy, "funding_pool": 1000, "token_supply": 1000}, _input)
@@ -758,6 +803,18 @@ class TestParticipantExits(unittest.TestCase):
         self.assertEqual(n_network.nodes[2]["item"].sentiment, new_sentiment_2)
         self.assertEqual(n_network.nodes[3]["item"].sentiment, new_sentiment_3)
 
+    def test_su_update_sentiment_when_proposal_becomes_failed_or_completed_archives(self):
+        self.network.nodes[4]["item"].status = ProposalStatus.FAILED
+        self.network.nodes[5]["item"].status = ProposalStatus.COMPLETED
+        self.default_state["policy_output"] = {"failed": [4], "succeeded": [5]}
+        params = dict(self.params, archive_proposals=True)
+        _, n_network = ParticipantExits.su_update_sentiment_when_proposal_becomes_failed_or_completed(
+            params, 0, 0, self.default_state, {})
+
+        self.assertNotIn(4, n_network)
+        self.assertNotIn(5, n_network)
+        self.assertEqual([j for j, _ in get_proposals(n_network, status=ProposalStatus.COMPLETED)], [5])
+
 
 class TestParticipantSentiment(unittest.TestCase):
     def setUp(self):
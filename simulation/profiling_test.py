@@ -0,0 +1,68 @@
+import tracemalloc
+import unittest
+
+from engine import Engine
+from profiling import Profiler
+from simulation import (CommonsSimulationConfiguration, bootstrap_simulation,
+                        partial_state_update_blocks)
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        initial_conditions, simulation_parameters = bootstrap_simulation(
+            CommonsSimulationConfiguration(random_seed=1))
+        self.initial_conditions = initial_conditions
+        self.params = simulation_parameters["M"]
+
+    def test_report(self):
+        """
+        Every block label shows up in the report with the number of times it
+        ran. "Sync state variables" is used 4 times per timestep.
+        """
+        profiler = Profiler()
+        blocks = profiler.instrument(partial_state_update_blocks)
+        Engine(blocks, self.params).run(self.initial_conditions, 5)
+        report = profiler.report()
+
+        self.assertEqual(set(report), {block["label"] for block in partial_state_update_blocks})
+        self.assertEqual(report["Sync state variables"]["calls"], 4 * 5)
+        self.assertEqual(report["Calculate proposals' conviction"]["calls"], 5)
+
+        block = report["Generate new participants"]
+        self.assertEqual(set(block["functions"]), {"GenerateNewParticipant.p_randomly",
+                                                   "GenerateNewParticipant.su_add_to_network",
+                                                   "GenerateNewParticipant.su_add_investment_to_commons"})
+        self.assertAlmostEqual(block["time"], sum(f["time"] for f in block["functions"].values()))
+        self.assertGreater(block["time"], 0)
+        self.assertEqual(block["allocated_bytes"], 0)
+
+    def test_instrumented_blocks_keep_signatures(self):
+        """
+        cadCAD counts the positional arguments of state update functions to
+        decide how to call them.
+        """
+        blocks = Profiler().instrument(partial_state_update_blocks)
+        for block in blocks:
+            for f in block["variables"].values():
+                self.assertEqual(f.__code__.co_argcount, 5)
+
+    def test_trace_memory(self):
+        profiler = Profiler(trace_memory=True)
+        blocks = profiler.instrument(partial_state_update_blocks)
+        profiler.start()
+        Engine(blocks, self.params).run(self.initial_conditions, 3)
+        profiler.stop()
+
+        report = profiler.report()
+        self.assertGreater(report["Generate new participants"]["allocated_bytes"], 0)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_keeps_the_callers_tracing(self):
+        tracemalloc.start()
+        try:
+            profiler = Profiler(trace_memory=True)
+            profiler.start()
+            profiler.stop()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
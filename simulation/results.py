@@ -0,0 +1,138 @@
+"""
+Reading and writing simulation results in a compact, columnar form.
+
+simrunner prints its results as JSON, which is what the web UI consumes. For
+analysis of many runs that is slow to produce and to parse, so the same
+results can also be written as Apache Arrow IPC (.arrow) or Parquet
+(.parquet) files. Arrow files are read back through a memory map, so the
+columns are not copied or parsed when a notebook loads them.
+
+The time series (timestep, funding_pool, token_price, sentiment) is stored as
+a table, and the scalar results (score, participants, proposals) are stored as
+JSON in the table's schema metadata. The optional per-participant table is
+written to a second file next to the first one, see participants_path().
+"""
+import json
+from os.path import splitext
+
+from network_utils import get_participants
+
+FORMATS = ("json", "arrow", "parquet")
+TIMESERIES_COLUMNS = ("timestep", "funding_pool", "token_price", "sentiment")
+SCALAR_KEYS = ("score", "participants", "proposals")
+OPTIONAL_KEYS = ("profile", "stopped")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Arrow and Parquet results need pyarrow, install it with `pip install pyarrow`")
+    return pyarrow
+
+
+def participants_path(path: str) -> str:
+    """
+    results.arrow -> results.participants.arrow
+    """
+    root, ext = splitext(path)
+    return "{}.participants{}".format(root, ext)
+
+
+def participants_table(network):
+    """
+    One row per Participant in the network with their sentiment and holdings.
+    """
+    pa = _import_pyarrow()
+    participants = list(get_participants(network))
+    return pa.table({
+        "participant": pa.array([i for i, _ in participants], type=pa.int64()),
+        "sentiment": pa.array([p.sentiment for _, p in participants], type=pa.float64()),
+        "vesting": pa.array([p.holdings.vesting for _, p in participants], type=pa.float64()),
+        "vesting_spent": pa.array([p.holdings.vesting_spent for _, p in participants], type=pa.float64()),
+        "nonvesting": pa.array([p.holdings.nonvesting for _, p in participants], type=pa.float64()),
+        "age_days": pa.array([p.holdings.age_days for _, p in participants], type=pa.int64()),
+    })
+
+
+def timeseries_table(result: dict):
+    """
+    Converts the dict returned by simrunner.get_simulation_results() into an
+    Arrow table. The scalar results go into the schema metadata.
+    """
+    pa = _import_pyarrow()
+    columns = {
+        "timestep": pa.array(result["timestep"], type=pa.int64()),
+    }
+    for name in TIMESERIES_COLUMNS[1:]:
+        columns[name] = pa.array(result[name], type=pa.float64())
+
+    metadata = {key: json.dumps(result[key]) for key in SCALAR_KEYS + OPTIONAL_KEYS if key in result}
+    return pa.table(columns, metadata=metadata)
+
+
+def write_results(result: dict, path: str, fmt: str = "arrow", network=None) -> list:
+    """
+    Writes result to path in the given format. If a network is given, a table
+    of its Participants is also written to participants_path(path). Returns
+    the list of files written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError("Unknown results format {}, expected one of {}".format(fmt, FORMATS))
+
+    if fmt == "json":
+        if network is not None:
+            raise ValueError("The json format has no participants table, use arrow or parquet")
+        with open(path, "w") as f:
+            json.dump(result, f)
+        return [path]
+
+    tables = [(path, timeseries_table(result))]
+    if network is not None:
+        tables.append((participants_path(path), participants_table(network)))
+
+    pa = _import_pyarrow()
+    for p, table in tables:
+        if fmt == "arrow":
+            with pa.OSFile(p, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            import pyarrow.parquet as pq
+            pq.write_table(table, p)
+    return [p for p, _ in tables]
+
+
+def read_table(path: str):
+    """
+    Reads a table written by write_results(). Arrow files are memory mapped,
+    so the returned columns point directly into the file.
+    """
+    pa = _import_pyarrow()
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True)
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_results(path: str, participants: bool = False) -> dict:
+    """
+    The inverse of write_results(). The time series is returned as an Arrow
+    table under "timeseries" (use table.column(name).to_numpy() to get
+    zero-copy NumPy arrays), the scalar results under their usual keys and,
+    if requested, the per-participant table under "participant_table".
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            return json.load(f)
+
+    table = read_table(path)
+    metadata = table.schema.metadata
+    ans = {key: json.loads(metadata[key.encode()]) for key in SCALAR_KEYS + OPTIONAL_KEYS
+           if key.encode() in metadata}
+    ans["timeseries"] = table
+    if participants:
+        ans["participant_table"] = read_table(participants_path(path))
+    return ans
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from hatch import TokenBatch, VestingOptions
+from network_utils import bootstrap_network, get_participants
+from results import participants_path, read_results, write_results
+from utils import (new_probability_func, new_exponential_func,
+                   new_gamma_func, new_random_number_func)
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class TestResults(unittest.TestCase):
+    def setUp(self):
+        self.result = {
+            "timestep": [1, 2, 3],
+            "funding_pool": [100.0, 110.5, 90.25],
+            "token_price": [1.0, 1.5, 1.25],
+            "sentiment": [0.75, 0.7, 0.65],
+            "score": 42,
+            "participants": 5,
+            "proposals": {
+                "candidates": 2,
+                "actives": 1,
+                "completed": 0,
+                "failed": 1
+            }
+        }
+        self.network = bootstrap_network([TokenBatch(1000, 0, vesting_options=VestingOptions(10, 30)) for _ in range(4)],
+                                          2, 3000, 4e6, 0.2, new_probability_func(seed=None),
+                                          new_random_number_func(seed=None), new_gamma_func(seed=None),
+                                          new_exponential_func(seed=None))
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_participants_path(self):
+        self.assertEqual(participants_path("out/run.arrow"), "out/run.participants.arrow")
+
+    def test_json_roundtrip(self):
+        path = os.path.join(self.dir.name, "run.json")
+        self.assertEqual(write_results(self.result, path, "json"), [path])
+        self.assertEqual(read_results(path), self.result)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow_and_parquet_roundtrip(self):
+        """
+        The time series comes back as columns and the scalar results come back
+        from the schema metadata unchanged.
+        """
+        self.result["profile"] = {"Generate new participants": {"calls": 3, "time": 0.1}}
+        for fmt in ("arrow", "parquet"):
+            path = os.path.join(self.dir.name, "run." + fmt)
+            written = write_results(self.result, path, fmt)
+            self.assertEqual(written, [path])
+
+            ans = read_results(path)
+            for key in ("score", "participants", "proposals", "profile"):
+                self.assertEqual(ans[key], self.result[key])
+            table = ans["timeseries"]
+            self.assertEqual(table.column_names, ["timestep", "funding_pool", "token_price", "sentiment"])
+            for name in table.column_names:
+                np.testing.assert_array_equal(table.column(name).to_numpy(), self.result[name])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_participants_table(self):
+        path = os.path.join(self.dir.name, "run.arrow")
+        written = write_results(self.result, path, "arrow", network=self.network)
+        self.assertEqual(written, [path, participants_path(path)])
+
+        table = read_results(path, participants=True)["participant_table"]
+        participants = dict(get_participants(self.network))
+        self.assertEqual(table.column("participant").to_pylist(), list(participants))
+        self.assertEqual(table.column("sentiment").to_pylist(), [p.sentiment for p in participants.values()])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            write_results(self.result, os.path.join(self.dir.name, "run.csv"), "csv")
+
+    def test_json_has_no_participants_table(self):
+        with self.assertRaises(ValueError):
+            write_results(self.result, os.path.join(self.dir.name, "run.json"), "json", network=self.network)
@@ -0,0 +1,116 @@
+"""
+An on-disk store for the results of many runs, e.g. a sweep or a Monte Carlo
+study, that does not have to fit in memory.
+
+A store is a directory with one .npy file per metric and a meta.json that
+describes them. Time series metrics have the shape (runs, timesteps) and
+scalar metrics the shape (runs,). The files are opened as memory maps
+(numpy.lib.format.open_memmap), so every run writes directly into its own
+preallocated row, several processes can fill different rows of the same store
+at the same time, and analysis code only reads the slices it touches:
+
+    store = open_store("sweep")
+    store["token_price"][:, -1]  # the final token price of every run
+
+Create the store once before starting the runs, from Python with
+create_store() or from the command line:
+
+    python resultstore.py sweep --runs 10000 -T 730
+    python simrunner.py -T 730 --random_seed 17 --store sweep --run_index 17
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from results import TIMESERIES_COLUMNS
+
+TIMESERIES_METRICS = TIMESERIES_COLUMNS[1:]
+SCALAR_METRICS = ("score", "participants", "candidates", "actives", "completed", "failed")
+META_FILE = "meta.json"
+
+
+class ResultStore:
+    def __init__(self, path: str, mode: str = "r"):
+        """
+        Opens an existing store. mode is "r" to read it or "r+" to write runs
+        into it.
+        """
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.path = path
+        self.runs = meta["runs"]
+        self.timesteps = meta["timesteps"]
+        self.arrays = {name: np.lib.format.open_memmap(self._file(name), mode=mode)
+                       for name in TIMESERIES_METRICS + SCALAR_METRICS + ("written",)}
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name + ".npy")
+
+    def __getitem__(self, metric: str) -> np.ndarray:
+        return self.arrays[metric]
+
+    @property
+    def written(self) -> np.ndarray:
+        """
+        Which runs have been written. The metrics of the other runs are NaN.
+        """
+        return self.arrays["written"]
+
+    def write_run(self, run_index: int, result: dict):
+        """
+        Writes the result of simrunner.get_simulation_results() into the row
+        run_index and flushes it to disk.
+        """
+        if not 0 <= run_index < self.runs:
+            raise IndexError("run_index {} is outside of the store's {} runs".format(run_index, self.runs))
+        if len(result["timestep"]) != self.timesteps:
+            raise ValueError("The run has {} timesteps, the store expects {}".format(
+                len(result["timestep"]), self.timesteps))
+
+        scalars = dict(result["proposals"], score=result["score"], participants=result["participants"])
+        for name in TIMESERIES_METRICS:
+            self.arrays[name][run_index] = result[name]
+        for name in SCALAR_METRICS:
+            self.arrays[name][run_index] = scalars[name]
+        self.arrays["written"][run_index] = True
+        self.flush()
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+
+
+def create_store(path: str, runs: int, timesteps: int) -> ResultStore:
+    """
+    Creates a store with room for runs runs of timesteps timesteps each and
+    returns it open for writing. The metrics start out as NaN.
+    """
+    os.makedirs(path, exist_ok=True)
+    shapes = {name: (runs, timesteps) for name in TIMESERIES_METRICS}
+    shapes.update({name: (runs,) for name in SCALAR_METRICS})
+    for name, shape in shapes.items():
+        array = np.lib.format.open_memmap(os.path.join(path, name + ".npy"), mode="w+", dtype=np.float64,
+                                          shape=shape)
+        array[:] = np.nan
+        array.flush()
+    np.lib.format.open_memmap(os.path.join(path, "written.npy"), mode="w+", dtype=np.bool_, shape=(runs,)).flush()
+
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump({"runs": runs, "timesteps": timesteps, "timeseries": TIMESERIES_METRICS,
+                   "scalars": SCALAR_METRICS}, f)
+    return ResultStore(path, mode="r+")
+
+
+def open_store(path: str, mode: str = "r") -> ResultStore:
+    return ResultStore(path, mode=mode)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a result store for many simrunner runs")
+    parser.add_argument("path")
+    parser.add_argument("--runs", type=int, required=True)
+    parser.add_argument("-T", "--timesteps_days", type=int, required=True)
+    args = parser.parse_args()
+    create_store(args.path, args.runs, args.timesteps_days)
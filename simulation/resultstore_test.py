@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from resultstore import create_store, open_store
+
+
+def fake_result(run_index, timesteps=5):
+    return {
+        "timestep": list(range(1, timesteps + 1)),
+        "funding_pool": [run_index * 100.0 + t for t in range(timesteps)],
+        "token_price": [run_index + 0.5] * timesteps,
+        "sentiment": [0.75] * timesteps,
+        "score": run_index * 10,
+        "participants": 7,
+        "proposals": {"candidates": 1, "actives": 2, "completed": 3, "failed": run_index},
+    }
+
+
+def write_run(path, run_index):
+    open_store(path, mode="r+").write_run(run_index, fake_result(run_index))
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "store")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_write_and_read_runs(self):
+        store = create_store(self.path, runs=4, timesteps=5)
+        store.write_run(2, fake_result(2))
+        del store
+
+        store = open_store(self.path)
+        np.testing.assert_array_equal(store.written, [False, False, True, False])
+        np.testing.assert_array_equal(store["funding_pool"][2], [200, 201, 202, 203, 204])
+        self.assertEqual(store["score"][2], 20)
+        self.assertEqual(store["failed"][2], 2)
+        self.assertTrue(np.isnan(store["token_price"][[0, 1, 3]]).all())
+        self.assertIsInstance(store["sentiment"], np.memmap)
+
+    def test_runs_from_several_processes(self):
+        create_store(self.path, runs=6, timesteps=5)
+        with multiprocessing.Pool(2) as pool:
+            pool.starmap(write_run, [(self.path, i) for i in range(6)])
+
+        store = open_store(self.path)
+        self.assertTrue(store.written.all())
+        np.testing.assert_array_equal(store["token_price"][:, -1], np.arange(6) + 0.5)
+
+    def test_run_must_fit(self):
+        store = create_store(self.path, runs=2, timesteps=5)
+        with self.assertRaises(IndexError):
+            store.write_run(2, fake_result(2))
+        with self.assertRaises(ValueError):
+            store.write_run(0, fake_result(0, timesteps=6))
+
+    def test_read_only(self):
+        create_store(self.path, runs=2, timesteps=5)
+        with self.assertRaises(ValueError):
+            open_store(self.path).write_run(0, fake_result(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+"""
+Synthetic large Commons for stress testing the simulation.
+
+CommonsSimulationConfiguration starts with 5 hatchers and 2 proposals, and
+at most config.max_new_participants (times multiplier_new_participants during
+the speculation period) new Participants arrive each day. A StressScenario
+bootstraps a Commons of realistic DAO size instead: thousands of hatchers, a
+backlog of Candidate Proposals and configurable arrivals, optionally following
+a LoadProfile. build_network() creates such networks faster than
+network_utils.bootstrap_network() and can leave out the conflict edges.
+
+run_scenario() times the bootstrap and the run on the native engine and can
+profile every block with profiling.Profiler. From the command line:
+
+    python scenarios.py --hatchers 2000 --proposals 200 -T 60 --profile
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import List, Tuple
+
+from arraynetwork import ArrayNetwork
+from convictionvoting import trigger_threshold
+from engine import Engine
+from entities import ParticipantSupport, Proposal
+from hatch import TokenBatch
+from network_utils import create_network, get_edges_by_type, get_participants, get_proposals
+from profiling import Profiler
+from simulation import CommonsSimulationConfiguration, bootstrap_simulation, partial_state_update_blocks
+
+
+def build_network(token_batches: List[TokenBatch], n_proposals: int, funding_pool: float, token_supply: float,
+                  max_proposal_request: float, probability_func, random_number_func, gamma_func, exponential_func,
+                  conflict_rate: float = 0.25):
+    """
+    Creates the same network as network_utils.bootstrap_network() would with
+    the same random number funcs, but draws the affinities and conflicts in
+    bulk from random_number_func's RandomState and adds the edges in one go
+    instead of one add_edge() call at a time.
+
+    The number of conflict edges grows with the square of the number of
+    Proposals and no policy uses them, so conflict_rate=0 skips them
+    entirely (without drawing their random numbers).
+    """
+    network = create_network(token_batches, probability_func, random_number_func)
+
+    for _ in range(n_proposals):
+        idx = len(network)
+        r_rv = gamma_func(3, loc=0.001, scale=10000)
+        network.add_node(idx, item=Proposal(funds_requested=r_rv, trigger=trigger_threshold(
+            r_rv, funding_pool, token_supply, max_proposal_request)))
+
+    participants = list(dict(get_participants(network)))
+    proposals = list(dict(get_proposals(network)))
+    random_state = random_number_func.random_state
+
+    # setup_support_edges() draws one number per edge, Proposal by Proposal.
+    rv = random_state.rand(len(proposals), len(participants))
+    affinities = (1 - 4 * (1 - rv) * rv).tolist()
+    network.add_edges_from(
+        (par, prop, {"support": ParticipantSupport(affinity=affinity, tokens=0, conviction=0), "type": "support"})
+        for prop, row in zip(proposals, affinities) for par, affinity in zip(participants, row))
+
+    if conflict_rate and len(proposals) > 1:
+        # setup_conflict_edges() draws one number for every other Proposal.
+        conflict_rvs = random_state.rand(len(proposals), len(proposals) - 1).tolist()
+        network.add_edges_from(
+            (prop, other, {"conflict": 1 - conflict_rv, "type": "conflict"})
+            for prop, row in zip(proposals, conflict_rvs)
+            for other, conflict_rv in zip([o for o in proposals if o != prop], row)
+            if conflict_rv < conflict_rate)
+    return network
+
+
+class LoadProfile:
+    """
+    How many Participants may arrive each day over the course of a run. stages
+    is a list of (timestep, max_new_participants) pairs sorted by timestep;
+    each stage lasts until the next one starts. The speculation period's
+    multiplier still applies on top.
+
+    A LoadProfile is a callable class rather than a closure so that it can be
+    pickled into checkpoints with the rest of the parameters.
+    """
+
+    def __init__(self, stages: List[Tuple[int, int]]):
+        if not stages or sorted(stages) != list(stages):
+            raise ValueError("LoadProfile needs at least one stage, sorted by timestep")
+        self.stages = list(stages)
+
+    def __repr__(self):
+        return "<{} {}>".format(self.__class__.__name__, self.stages)
+
+    @classmethod
+    def constant(cls, max_new_participants: int):
+        return cls([(0, max_new_participants)])
+
+    @classmethod
+    def ramp(cls, start: int, end: int, days: int, steps: int = 10):
+        """
+        Increases the arrivals from start to end in steps over days, then
+        holds them at end.
+        """
+        return cls([(days * i // steps, start + (end - start) * i // steps) for i in range(steps + 1)])
+
+    @classmethod
+    def burst(cls, base: int, peak: int, start: int, days: int):
+        """
+        base arrivals, except for days days from timestep start on.
+        """
+        return cls([(0, base), (start, peak), (start + days, base)])
+
+    def __call__(self, timestep: int, default: int) -> int:
+        ans = default
+        for stage_timestep, max_new_participants in self.stages:
+            if timestep < stage_timestep:
+                break
+            ans = max_new_participants
+        return ans
+
+
+class StressScenario(CommonsSimulationConfiguration):
+    """
+    A CommonsSimulationConfiguration for large Commons. Besides its options,
+    it accepts:
+
+    conflict_rate: passed to build_network(), 0 leaves out conflict edges.
+    max_new_participants: how many Participants may arrive each day outside
+        of the speculation period (config.max_new_participants by default).
+    arrival_rate_denominator: the daily chance of each of them arriving is
+        (1 + sentiment) / arrival_rate_denominator
+        (config.arrival_rate_denominator by default).
+    load_profile: a LoadProfile, which takes precedence over
+        max_new_participants.
+    """
+
+    def __init__(self, hatchers=1000, proposals=100, conflict_rate=0.25, max_new_participants=None,
+                 arrival_rate_denominator=None, load_profile=None, **kwargs):
+        super().__init__(hatchers=hatchers, proposals=proposals, **kwargs)
+        self.conflict_rate = conflict_rate
+        self.max_new_participants = max_new_participants
+        self.arrival_rate_denominator = arrival_rate_denominator
+        self.load_profile = load_profile
+
+    def build_network(self, *args):
+        return build_network(*args, conflict_rate=self.conflict_rate)
+
+    def params(self) -> dict:
+        """
+        The simulation parameters that policies.GenerateNewParticipant reads
+        instead of the defaults in config.
+        """
+        keys = ("max_new_participants", "arrival_rate_denominator", "load_profile")
+        return {key: getattr(self, key) for key in keys if getattr(self, key) is not None}
+
+
+def bootstrap_scenario(s: StressScenario):
+    initial_conditions, simulation_parameters = bootstrap_simulation(s, network_builder=s.build_network)
+    simulation_parameters["M"].update(s.params())
+    return initial_conditions, simulation_parameters
+
+
+def network_size(network) -> dict:
+    """
+    The number of nodes and edges of the network and, for an ArrayNetwork,
+    its storage_stats() under "storage".
+    """
+    size = {
+        "participants": len(get_participants(network)),
+        "proposals": len(get_proposals(network)),
+        "support_edges": len(get_edges_by_type(network, "support")),
+    }
+    if isinstance(network, ArrayNetwork):
+        size["edges"] = size["support_edges"] + len(network.conflict_ids)
+        size["storage"] = network.storage_stats()
+    else:
+        size["edges"] = network.number_of_edges()
+    return size
+
+
+def run_scenario(s: StressScenario, profile=False, trace_memory=False) -> dict:
+    """
+    Bootstraps and runs s on the native engine. Returns the wall time of both
+    phases, the size of the network before and after the run and, with
+    trace_memory, the peak memory traced by tracemalloc. With profile, the
+    profiling.Profiler report of the run is included under "profile".
+    """
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        initial_conditions, simulation_parameters = bootstrap_scenario(s)
+        bootstrap_seconds = time.perf_counter() - start
+        initial_size = network_size(initial_conditions["network"])
+
+        blocks = partial_state_update_blocks
+        profiler = Profiler() if profile else None
+        if profiler:
+            blocks = profiler.instrument(blocks)
+
+        engine = Engine(blocks, simulation_parameters["M"], record_substeps=())
+        start = time.perf_counter()
+        engine.run(initial_conditions, s.timesteps_days)
+        run_seconds = time.perf_counter() - start
+
+        ans = {
+            "timesteps": s.timesteps_days,
+            "bootstrap_seconds": bootstrap_seconds,
+            "run_seconds": run_seconds,
+            "initial": initial_size,
+            "final": network_size(engine.state["network"]),
+        }
+        if trace_memory:
+            _, ans["peak_traced_bytes"] = tracemalloc.get_traced_memory()
+        if profiler:
+            ans["profile"] = profiler.report()
+        return ans
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress test the simulation with a large synthetic Commons")
+    parser.add_argument("--hatchers", type=int, default=1000)
+    parser.add_argument("--proposals", type=int, default=100)
+    parser.add_argument("-T", "--timesteps_days", type=int, default=30)
+    parser.add_argument("--random_seed", type=int, default=None)
+    parser.add_argument("--conflict_rate", type=float, default=0.25)
+    parser.add_argument("--max_new_participants", type=int, default=None)
+    parser.add_argument("--arrival_rate_denominator", type=float, default=None)
+    parser.add_argument("--ramp", type=int, nargs=3, metavar=("START", "END", "DAYS"),
+                        help="ramp the daily arrivals up with LoadProfile.ramp()")
+    parser.add_argument("--profile", action="store_true", help="profile every block of the run")
+    parser.add_argument("--trace_memory", action="store_true", help="report the peak memory with tracemalloc")
+    args = parser.parse_args()
+
+    load_profile = LoadProfile.ramp(*args.ramp) if args.ramp else None
+    s = StressScenario(hatchers=args.hatchers, proposals=args.proposals, timesteps_days=args.timesteps_days,
+                       random_seed=args.random_seed, conflict_rate=args.conflict_rate,
+                       max_new_participants=args.max_new_participants,
+                       arrival_rate_denominator=args.arrival_rate_denominator, load_profile=load_profile)
+    print(json.dumps(run_scenario(s, profile=args.profile, trace_memory=args.trace_memory)))
@@ -0,0 +1,96 @@
+import pickle
+import unittest
+
+from hatch import Commons, TokenBatch, VestingOptions
+from network_utils import bootstrap_network, get_edges_by_type
+from policies import GenerateNewParticipant
+from scenarios import LoadProfile, StressScenario, bootstrap_scenario, build_network, run_scenario
+from utils import (new_probability_func, new_exponential_func, new_gamma_func,
+                   new_random_number_func)
+
+
+def always(rate):
+    return True
+
+
+def new_network(builder, seed, **kwargs):
+    token_batches = [TokenBatch(1000, 100, vesting_options=VestingOptions(10, 30)) for _ in range(20)]
+    return builder(token_batches, 8, 1e6, 1e7, 0.2, new_probability_func(seed), new_random_number_func(seed),
+                   new_gamma_func(seed), new_exponential_func(seed), **kwargs)
+
+
+class TestBuildNetwork(unittest.TestCase):
+    def test_same_network_as_bootstrap_network(self):
+        expected = new_network(bootstrap_network, 4)
+        network = new_network(build_network, 4)
+
+        self.assertEqual(list(network.nodes), list(expected.nodes))
+        for i in network.nodes:
+            self.assertEqual(repr(network.nodes[i]["item"]), repr(expected.nodes[i]["item"]))
+        self.assertEqual(list(network.edges(data=True)), list(expected.edges(data=True)))
+
+    def test_without_conflict_edges(self):
+        network = new_network(build_network, 4, conflict_rate=0)
+        self.assertEqual(len(get_edges_by_type(network, "conflict")), 0)
+        self.assertEqual(len(get_edges_by_type(network, "support")), 20 * 8)
+
+
+class TestLoadProfile(unittest.TestCase):
+    def test_stages(self):
+        profile = LoadProfile.burst(2, 50, start=10, days=5)
+        self.assertEqual([profile(t, 1) for t in (0, 9, 10, 14, 15)], [2, 2, 50, 50, 2])
+
+        profile = LoadProfile.ramp(0, 100, days=50, steps=10)
+        self.assertEqual([profile(t, 1) for t in (0, 4, 5, 49, 50, 500)], [0, 0, 10, 90, 100, 100])
+
+        self.assertEqual(LoadProfile([(10, 5)])(3, 1), 1)
+
+    def test_stages_must_be_sorted(self):
+        with self.assertRaises(ValueError):
+            LoadProfile([(10, 5), (0, 1)])
+        with self.assertRaises(ValueError):
+            LoadProfile([])
+
+    def test_pickle(self):
+        profile = LoadProfile.constant(7)
+        self.assertEqual(pickle.loads(pickle.dumps(profile)).stages, profile.stages)
+
+
+class TestStressScenario(unittest.TestCase):
+    def test_params_override_arrivals(self):
+        s = StressScenario(hatchers=30, proposals=5, random_seed=1, max_new_participants=40,
+                           load_profile=LoadProfile.constant(60))
+        _, simulation_parameters = bootstrap_scenario(s)
+        params = simulation_parameters["M"]
+        self.assertEqual(params["max_new_participants"], 40)
+        self.assertNotIn("arrival_rate_denominator", params)
+
+        params["probability_func"] = always
+        state = {"commons": Commons(10000, 1000), "sentiment": 0.5, "timestep": params["speculation_days"]}
+        self.assertEqual(len(GenerateNewParticipant.p_randomly(params, 0, [], state)), 60)
+        del params["load_profile"]
+        self.assertEqual(len(GenerateNewParticipant.p_randomly(params, 0, [], state)), 40)
+
+    def test_run_scenario(self):
+        s = StressScenario(hatchers=40, proposals=10, random_seed=1, timesteps_days=3, conflict_rate=0)
+        ans = run_scenario(s, profile=True, trace_memory=True)
+        self.assertEqual(ans["initial"]["support_edges"], 400)
+        self.assertEqual(ans["initial"]["edges"], 400)
+        self.assertGreaterEqual(ans["final"]["participants"], 40)
+        self.assertGreater(ans["peak_traced_bytes"], 0)
+        self.assertEqual(ans["profile"]["Generate new participants"]["calls"], 3)
+
+    def test_run_scenario_array_backend(self):
+        s = StressScenario(hatchers=40, proposals=10, random_seed=1, timesteps_days=20, conflict_rate=0,
+                           network_backend="array")
+        ans = run_scenario(s)
+        self.assertEqual(ans["initial"]["edges"], 400)
+        self.assertEqual(ans["initial"]["storage"]["capacity"], [40, 10])
+        self.assertEqual(ans["initial"]["storage"]["reallocations"], 0)
+        storage = ans["final"]["storage"]
+        self.assertGreaterEqual(storage["capacity"][0], storage["participant_slots"])
+        self.assertGreater(storage["reallocations"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,11 +10,15 @@ class CommonsScore(object):
         Calculates a final score for a commons simulation run.
     """
 
-    def __init__(self, params: CommonsSimulationConfiguration, df_final, sigma=100):
+    def __init__(self, params: CommonsSimulationConfiguration, df_final, sigma=100, metrics=None):
+        """
+        metrics are taken from the network of df_final's last record unless
+        they are given, e.g. by ensemble.Ensemble, which has no networks.
+        """
         self.params = params
         self.df_final = df_final
         self.sigma = sigma
-        self.metrics: Metrics = None
+        self.metrics: Metrics = metrics
 
     def calc_price_ratio(self) -> float:
         '''
@@ -95,39 +99,46 @@ class CommonsScore(object):
         '''
             Calculates the final score using all the defined metrics methods in this class
         '''
-        last_network = self.df_final.iloc[-1, 0]
-        p_candidates = get_proposals(
-            last_network, status=ProposalStatus.CANDIDATE)
-        candidates = len(p_candidates)
-        p_actives = get_proposals(last_network, status=ProposalStatus.ACTIVE)
-        actives = len(p_actives)
-        p_completed = get_proposals(
-            last_network, status=ProposalStatus.COMPLETED)
-        completed = len(p_completed)
-        p_failed = get_proposals(last_network, status=ProposalStatus.FAILED)
-        failed = len(p_failed)
-        participants = len(get_participants(last_network))
-
-        funds_candidates = sum([p.funds_requested for _, p in p_candidates])
-        funds_actives = sum([p.funds_requested for _, p in p_actives])
-        funds_completed = sum([p.funds_requested for _, p in p_completed])
-        funds_failed = sum([p.funds_requested for _, p in p_failed])
-
-        self.metrics = Metrics(participants=participants,
-                               candidates=candidates,
-                               funds_candidates=funds_candidates,
-                               actives=actives,
-                               funds_actives=funds_actives,
-                               completed=completed,
-                               funds_completed=funds_completed,
-                               failed=failed,
-                               funds_failed=funds_failed
-                               )
+        if self.metrics is None:
+            self.metrics = network_metrics(self.df_final.iloc[-1, 0])
         methods = [attr for attr in dir(self) if callable(
             getattr(self, attr)) and attr.startswith('calc_')]
         return round(sum([getattr(self, method)() for method in methods]) * self.sigma)
 
 
+def network_metrics(last_network) -> "Metrics":
+    '''
+        Counts the Participants and the Proposals (and their funds) by status
+    '''
+    p_candidates = get_proposals(
+        last_network, status=ProposalStatus.CANDIDATE)
+    candidates = len(p_candidates)
+    p_actives = get_proposals(last_network, status=ProposalStatus.ACTIVE)
+    actives = len(p_actives)
+    p_completed = get_proposals(
+        last_network, status=ProposalStatus.COMPLETED)
+    completed = len(p_completed)
+    p_failed = get_proposals(last_network, status=ProposalStatus.FAILED)
+    failed = len(p_failed)
+    participants = len(get_participants(last_network))
+
+    funds_candidates = sum([p.funds_requested for _, p in p_candidates])
+    funds_actives = sum([p.funds_requested for _, p in p_actives])
+    funds_completed = sum([p.funds_requested for _, p in p_completed])
+    funds_failed = sum([p.funds_requested for _, p in p_failed])
+
+    return Metrics(participants=participants,
+                   candidates=candidates,
+                   funds_candidates=funds_candidates,
+                   actives=actives,
+                   funds_actives=funds_actives,
+                   completed=completed,
+                   funds_completed=funds_completed,
+                   failed=failed,
+                   funds_failed=funds_failed
+                   )
+
+
 class Metrics(NamedTuple):
     participants: int
     candidates: int
@@ -3,35 +3,120 @@
 
 import argparse
 import json
-from network_utils import get_participants, get_proposals
-
-import pandas as pd
-from cadCAD.configuration import Experiment
-from cadCAD.configuration.utils import config_sim
-from cadCAD.engine import ExecutionContext, ExecutionMode, Executor
-from cadCAD import configs
+import os
+import sys
+import threading
+from network_utils import NETWORK_BACKENDS, get_participants, get_proposals
 
+from arraynetwork import DTYPES, ArrayNetwork
+from checkpoint import load_checkpoint
+from engine import Engine
 from entities import ProposalStatus
+from gcmanager import GC_MODES, GCManager
+from policies import PROPOSAL_LIFETIMES
+from profiling import Profiler
+from results import FORMATS, write_results
 from score import CommonsScore
 from simulation import (CommonsSimulationConfiguration, bootstrap_simulation,
                         partial_state_update_blocks)
-from utils import new_random_number_func
+from stopping import STOP_CONDITIONS
+
+# cadCAD's Experiment.append_configs() always appends to the module-level
+# cadCAD.configs list, and an Executor runs every config in the list it is
+# given. Guard that list so that each run only executes its own config, also
+# when several runs happen concurrently in one process (e.g. under a
+# multi-threaded WSGI server).
+_cadcad_configs_lock = threading.Lock()
+
+
+ENGINES = ("cadcad", "native", "events")
+
+
+def run_simulation(c: CommonsSimulationConfiguration, engine="cadcad", checkpoint_every=None,
+                   checkpoint_path=None, resume_from=None, profiler=None, observers=None, stop_conditions=None,
+                   gc_manager=None):
+    """
+    Runs the simulation with cadCAD or with the native engine.Engine, which
+    produces the same records without deep-copying the state before every
+    substep. Only the native engine can write checkpoints every
+    checkpoint_every timesteps to checkpoint_path, and resume from the
+    checkpoint file resume_from, call observers with the state after every
+    timestep, and end the run early once one of stop_conditions holds (see
+    engine.Engine). The DataFrame of such a run has an engine.Stopped under
+    df.attrs["stopped"].
+
+    The events engine (events.EventEngine) runs the native engine's blocks
+    but skips quiet days, so it samples from the same distribution without
+    following the same path. It supports checkpoints, but neither observers
+    nor stop conditions.
 
+    If a profiling.Profiler is given, it records every call of the blocks'
+    policies and state update functions. If a gcmanager.GCManager is given,
+    it manages the garbage collector for the run: it freezes the bootstrapped
+    (or resumed) state and collects at every checkpoint.
+    """
+    if engine not in ENGINES:
+        raise Exception("Unknown engine {}, expected one of {}".format(engine, ENGINES))
+    if engine == "cadcad" and (checkpoint_every or resume_from):
+        raise Exception("Checkpoints are only supported by the native engine")
+    if engine == "cadcad" and (observers or stop_conditions):
+        raise Exception("Observers and stop conditions are only supported by the native engine")
+    if engine == "events" and (observers or stop_conditions):
+        raise Exception("Observers and stop conditions are not supported by the events engine")
+
+    blocks = partial_state_update_blocks
+    if profiler:
+        blocks = profiler.instrument(blocks)
+        profiler.start()
+    if gc_manager:
+        gc_manager.start()
+    try:
+        if engine == "native":
+            return run_simulation_native(c, blocks, checkpoint_every=checkpoint_every,
+                                         checkpoint_path=checkpoint_path, resume_from=resume_from,
+                                         observers=observers, stop_conditions=stop_conditions,
+                                         gc_manager=gc_manager)
+        if engine == "events":
+            from events import EventEngine
+            return run_simulation_native(c, blocks, checkpoint_every=checkpoint_every,
+                                         checkpoint_path=checkpoint_path, resume_from=resume_from,
+                                         engine_class=EventEngine, gc_manager=gc_manager)
+        return run_simulation_cadcad(c, blocks, gc_manager=gc_manager)
+    finally:
+        if gc_manager:
+            gc_manager.stop()
+        if profiler:
+            profiler.stop()
+
+
+def run_simulation_cadcad(c: CommonsSimulationConfiguration, blocks=partial_state_update_blocks, gc_manager=None):
+    # pandas and cadCAD take most of simrunner's startup time, and server.js
+    # starts a new interpreter for every request, so they are only imported
+    # once a simulation actually runs (not for --help or bad arguments).
+    import pandas as pd
+    from cadCAD.configuration import Experiment
+    from cadCAD.engine import ExecutionContext, ExecutionMode, Executor
+    from cadCAD import configs
 
-def run_simulation(c: CommonsSimulationConfiguration):
     initial_conditions, simulation_parameters = bootstrap_simulation(c)
+    if gc_manager:
+        gc_manager.freeze()
 
     exp = Experiment()
-    exp.append_configs(
-        initial_state=initial_conditions,
-        partial_state_update_blocks=partial_state_update_blocks,
-        sim_configs=simulation_parameters
-    )
+    with _cadcad_configs_lock:
+        n_configs = len(configs)
+        exp.append_configs(
+            initial_state=initial_conditions,
+            partial_state_update_blocks=blocks,
+            sim_configs=simulation_parameters
+        )
+        run_configs = configs[n_configs:]
+        del configs[n_configs:]
 
     # Do not use multi_proc, breaks ipdb.set_trace()
     exec_mode = ExecutionMode()
     single_proc_context = ExecutionContext(exec_mode.local_mode)
-    executor = Executor(single_proc_context, configs)
+    executor = Executor(single_proc_context, run_configs)
 
     raw_system_events, tensor_field, sessions = executor.execute()
 
@@ -39,10 +124,114 @@ def run_simulation(c: CommonsSimulationConfiguration):
     return df
 
 
-def get_simulation_results(c):
-    df = run_simulation(c)
+def run_simulation_native(c: CommonsSimulationConfiguration, blocks=partial_state_update_blocks,
+                          checkpoint_every=None, checkpoint_path=None, resume_from=None, observers=None,
+                          stop_conditions=None, engine_class=Engine, gc_manager=None):
+    """
+    When resuming, the state, parameters and random number generators all
+    come from the checkpoint and c only decides how many timesteps to run.
+    The resumed run produces exactly the same records as a run that was
+    never interrupted.
+
+    engine_class is engine.Engine or a subclass, which is only passed
+    observers and stop_conditions if there are any.
+    """
+    import pandas as pd
+
+    engine_args = {}
+    if observers:
+        engine_args["observers"] = observers
+    if stop_conditions:
+        engine_args["stop_conditions"] = stop_conditions
+    if resume_from:
+        checkpoint = load_checkpoint(resume_from)
+        if gc_manager:
+            gc_manager.freeze()
+        engine = engine_class(blocks, checkpoint.params, checkpoint_every=checkpoint_every,
+                              checkpoint_path=checkpoint_path, gc_manager=gc_manager, **engine_args)
+        records = engine.run(checkpoint.state, c.timesteps_days, records=checkpoint.records)
+    else:
+        initial_conditions, simulation_parameters = bootstrap_simulation(c)
+        if gc_manager:
+            gc_manager.freeze()
+        engine = engine_class(blocks, simulation_parameters["M"], checkpoint_every=checkpoint_every,
+                              checkpoint_path=checkpoint_path, gc_manager=gc_manager, **engine_args)
+        records = engine.run(initial_conditions, c.timesteps_days)
+
+    df = pd.DataFrame(records)
+    if engine.stopped:
+        df.attrs["stopped"] = engine.stopped
+    return df
+
+
+def get_simulation_results(c, profile=False, trace_memory=False, gc_mode=None, **kwargs):
+    """
+    kwargs are passed on to run_simulation(). With profile, the result also
+    contains the profiling.Profiler report of the run under "profile", and
+    for the array network backend ArrayNetwork.storage_stats() of the final
+    network under "network_storage". With
+    one of gcmanager.GC_MODES, a GCManager manages the garbage collector
+    during the run and its report is under "gc".
+    """
+    profiler = Profiler(trace_memory=trace_memory) if profile else None
+    gc_manager = GCManager(gc_mode) if gc_mode else None
+    df = run_simulation(c, profiler=profiler, gc_manager=gc_manager, **kwargs)
+    result, df_final = summarize_simulation(c, df)
+    if profiler:
+        result["profile"] = profiler.report()
+        last_network = df.iloc[-1]["network"]
+        if isinstance(last_network, ArrayNetwork):
+            result["network_storage"] = last_network.storage_stats()
+    if gc_manager:
+        result["gc"] = gc_manager.report()
+    if "stopped" in df.attrs:
+        result["stopped"] = df.attrs["stopped"]._asdict()
+    return result, df_final
+
+
+class TimestepStream:
+    """
+    An engine.Engine observer that writes one line of JSON to file as soon as
+    each timestep completes, e.g.
+
+    {"timestep":1,"funding_pool":...,"token_price":...,"sentiment":...,"participants":5,
+     "proposals":{"candidates":2,"actives":0,"completed":0,"failed":0}}
+
+    The time series values are the ones summarize_simulation() will report
+    for that timestep. It samples the state after substep 2, when the synced
+    state variables still hold their values from the end of the previous
+    timestep, so the stream emits those. The counts are taken from the
+    network at the end of the timestep.
+    """
+    KEYS = ("funding_pool", "token_price", "sentiment")
+    PROPOSAL_COUNTS = {ProposalStatus.CANDIDATE: "candidates", ProposalStatus.ACTIVE: "actives",
+                       ProposalStatus.COMPLETED: "completed", ProposalStatus.FAILED: "failed"}
+
+    def __init__(self, file=None):
+        self.file = file or sys.stdout
+        self.previous = None
+
+    def __call__(self, state: dict):
+        if self.previous is not None:
+            proposals = dict.fromkeys(self.PROPOSAL_COUNTS.values(), 0)
+            participants = len(get_participants(state["network"]))
+            for _, item in get_proposals(state["network"]):
+                proposals[self.PROPOSAL_COUNTS[item.status]] += 1
+
+            record = dict(timestep=state["timestep"], **self.previous, participants=participants,
+                          proposals=proposals)
+            self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self.file.flush()
+        self.previous = {key: state[key] for key in self.KEYS}
+
+
+def summarize_simulation(c, df):
+    """
+    Reduces the records of a run to the time series, final counts and score
+    that simrunner reports. Returns them together with the one record per
+    timestep they were taken from.
+    """
     df_final = df[df.substep.eq(2)]
-    random_func = new_random_number_func(None)
 
     last_network = df_final.iloc[-1, 0]
     candidates = len(get_proposals(last_network, status=ProposalStatus.CANDIDATE))
@@ -90,9 +279,92 @@ if __name__ == "__main__":
                         default=c_default.timesteps_days)
     parser.add_argument("--random_seed", type=int,
                         default=c_default.random_seed)
-    args = parser.parse_args()
+    parser.add_argument("--engine", choices=ENGINES, default="cadcad")
+    parser.add_argument("--network_backend", choices=NETWORK_BACKENDS, default=c_default.network_backend,
+                        help="array is faster for large networks, see arraynetwork.py")
+    parser.add_argument("--support_dtype", choices=DTYPES, default=c_default.support_dtype,
+                        help="with --network_backend array, float32 halves the support edges' memory")
+    parser.add_argument("--proposal_lifetimes", choices=PROPOSAL_LIFETIMES, default=c_default.proposal_lifetimes,
+                        help="scheduled samples when an Active Proposal ends as it becomes Active instead of "
+                             "trying every day")
+    parser.add_argument("--archive_proposals", action="store_true",
+                        help="move failed and completed Proposals and their edges out of the network")
+    parser.add_argument("--checkpoint_every", type=int,
+                        help="write a checkpoint every this many timesteps (native engine only)")
+    parser.add_argument("--checkpoint_path",
+                        help="checkpoint file, may contain {timestep} to keep every checkpoint")
+    parser.add_argument("--resume_from", help="continue the run saved in this checkpoint file")
+    parser.add_argument("--profile", action="store_true",
+                        help="include the time and memory spent in every block in the results")
+    parser.add_argument("--trace_memory", action="store_true",
+                        help="with --profile, also measure allocated bytes with tracemalloc (slow)")
+    parser.add_argument("--gc", dest="gc_mode", choices=GC_MODES,
+                        help="manage the garbage collector during the run and report on it, see gcmanager.py")
+    parser.add_argument("--format", choices=FORMATS, default="json",
+                        help="json is printed to stdout unless --output is given, arrow and parquet need --output")
+    parser.add_argument("--output", help="write the results to this file instead of stdout")
+    parser.add_argument("--participants", action="store_true",
+                        help="also write a per-participant table of the final network next to --output")
+    parser.add_argument("--stream", action="store_true",
+                        help="print a line of JSON for every timestep as soon as it completes, before the "
+                             "results (native engine only)")
+    parser.add_argument("--stop_when", nargs="+", choices=sorted(STOP_CONDITIONS),
+                        help="end the run once one of these conditions holds and fill in the remaining timesteps, "
+                             "see stopping.py (native engine only)")
+    parser.add_argument("--store", help="write the results into this result store, see resultstore.py")
+    parser.add_argument("--run_index", type=int, help="the store's row to write the results into")
+    parser.add_argument("--history",
+                        help="save the history of the network to this file, see history.py (native engine only)")
+    args = vars(parser.parse_args())
+    fmt, output, participants = args.pop("format"), args.pop("output"), args.pop("participants")
+    history_path, stream = args.pop("history"), args.pop("stream")
+    if stream and args["engine"] != "native":
+        parser.error("--stream requires --engine native")
+    if history_path and args["network_backend"] != "networkx":
+        parser.error("--history requires --network_backend networkx")
+    if args["support_dtype"] != c_default.support_dtype and args["network_backend"] != "array":
+        parser.error("--support_dtype {} requires --network_backend array".format(args["support_dtype"]))
+    store_path, run_index = args.pop("store"), args.pop("run_index")
+    if store_path and run_index is None:
+        parser.error("--store requires --run_index")
+    if fmt != "json" and not output:
+        parser.error("--format {} requires --output".format(fmt))
+    if participants and fmt == "json":
+        parser.error("--participants requires --format arrow or parquet")
+    run_args = {k: args.pop(k) for k in ("engine", "checkpoint_every", "checkpoint_path", "resume_from",
+                                         "profile", "trace_memory", "gc_mode")}
+    stop_when = args.pop("stop_when")
+    if stop_when and run_args["engine"] != "native":
+        parser.error("--stop_when requires --engine native")
+    if stop_when:
+        run_args["stop_conditions"] = [STOP_CONDITIONS[name]() for name in stop_when]
+
+    run_args["observers"] = []
+    if history_path:
+        from history import NetworkHistory
+        history = NetworkHistory()
+        run_args["observers"].append(history)
+    if stream:
+        run_args["observers"].append(TimestepStream())
 
-    c = CommonsSimulationConfiguration(**vars(args))
-    print("Running sim config", c)
-    o, _ = get_simulation_results(c)
-    print(json.dumps(o))
+    c = CommonsSimulationConfiguration(**args)
+    print("Running sim config", c, flush=True)
+    try:
+        o, df_final = get_simulation_results(c, **run_args)
+    except BrokenPipeError:
+        # The reader stopped reading the stream, e.g. after it saw enough.
+        # Stop the run, and keep Python from complaining when it flushes
+        # stdout on exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    if history_path:
+        history.save(history_path)
+    if store_path:
+        from resultstore import open_store
+        open_store(store_path, mode="r+").write_run(run_index, o)
+        print(json.dumps({"store": store_path, "run_index": run_index}))
+    elif output:
+        network = df_final.iloc[-1, 0] if participants else None
+        print(json.dumps({"output": write_results(o, output, fmt, network=network)}))
+    else:
+        print(json.dumps(o))
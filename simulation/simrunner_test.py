@@ -0,0 +1,72 @@
+import json
+import subprocess
+import sys
+import unittest
+from os.path import abspath, dirname
+
+SIMULATION_DIR = dirname(abspath(__file__))
+
+# server.js starts a new interpreter for every simulation, so simrunner's
+# import time is paid on every request. Importing it used to take ~1.7s, most
+# of it scipy.stats, pandas and cadCAD.
+IMPORT_TIME_BUDGET_SECONDS = 1.0
+DEFERRED_MODULES = ["cadCAD", "matplotlib", "pandas", "pyarrow", "scipy"]
+
+
+def run_python(code):
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=SIMULATION_DIR,
+                          capture_output=True, text=True, check=True)
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_defers_engine_and_output_dependencies(self):
+        """
+        Importing simrunner should only load what every run needs. The
+        engine's and the output formats' dependencies are imported when they
+        are used.
+        """
+        proc = run_python("import sys, json, simrunner; print(json.dumps(list(sys.modules)))")
+        loaded = {name.split(".")[0] for name in json.loads(proc.stdout)}
+        self.assertEqual(loaded.intersection(DEFERRED_MODULES), set())
+
+    def test_import_time_budget(self):
+        """
+        -X importtime reports the cumulative import time of every module in
+        microseconds, the last line being simrunner itself.
+        """
+        proc = run_python("import simrunner")
+        last_line = proc.stderr.strip().splitlines()[-1]
+        _, cumulative, name = [col.strip() for col in last_line.split("|")]
+        self.assertEqual(name, "simrunner")
+        self.assertLess(int(cumulative) / 1e6, IMPORT_TIME_BUDGET_SECONDS)
+
+
+class TestArguments(unittest.TestCase):
+    def test_participants_need_a_table_format(self):
+        proc = subprocess.run([sys.executable, "simrunner.py", "-T", "5", "--participants", "--output", "run.json"],
+                              cwd=SIMULATION_DIR, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 2)
+        self.assertIn("--participants requires --format arrow or parquet", proc.stderr)
+
+
+class TestStream(unittest.TestCase):
+    def test_stream_matches_results(self):
+        proc = subprocess.run([sys.executable, "simrunner.py", "-T", "40", "--random_seed", "3", "--engine", "native",
+                               "--stream"], cwd=SIMULATION_DIR, capture_output=True, text=True, check=True)
+        lines = proc.stdout.strip().splitlines()[1:]
+        records, result = [json.loads(line) for line in lines[:-1]], json.loads(lines[-1])
+
+        self.assertEqual(len(records), 40)
+        for key in ["timestep", "funding_pool", "token_price", "sentiment"]:
+            self.assertEqual([r[key] for r in records], result[key])
+        self.assertEqual(set(records[-1]["proposals"]), set(result["proposals"]))
+
+    def test_reader_can_stop_the_run(self):
+        proc = subprocess.Popen([sys.executable, "simrunner.py", "-T", "730", "--engine", "native", "--stream"],
+                                cwd=SIMULATION_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        proc.stdout.readline()
+        self.assertEqual(json.loads(proc.stdout.readline())["timestep"], 1)
+        proc.stdout.close()
+        _, stderr = proc.communicate(timeout=60)
+        self.assertEqual(proc.returncode, 1)
+        self.assertNotIn("Traceback", stderr)
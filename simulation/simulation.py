@@ -1,16 +1,16 @@
 from typing import Tuple
 import numpy as np
-import copy
 from hatch import (create_token_batches, Commons,
                    convert_80p_to_cliff_and_halflife)
 
-from entities import attrs
-from policies import (GenerateNewParticipant, GenerateNewProposal,
+from entities import ProposalSchedule, attrs
+from policies import (PROPOSAL_LIFETIMES, GenerateNewParticipant, GenerateNewProposal,
                       GenerateNewFunding, ActiveProposals, ProposalFunding,
                       ParticipantVoting, ParticipantSellsTokens,
                       ParticipantBuysTokens, ParticipantExits,
                       ParticipantSentiment)
-from network_utils import bootstrap_network, calc_avg_sentiment
+from arraynetwork import DTYPES, ArrayNetwork
+from network_utils import NETWORK_BACKENDS, bootstrap_network, calc_avg_sentiment, snapshot_network
 from utils import (new_probability_func, new_exponential_func, new_gamma_func,
                    new_random_number_func, new_choice_func)
 
@@ -44,9 +44,9 @@ def update_avg_sentiment(params, step, sL, s, _input):
     s = calc_avg_sentiment(network)
     return "sentiment", s
 
-def network_deepcopy(params, step, sL, s, _input):
+def take_network_snapshot(params, step, sL, s, _input):
     network = s["network"]
-    return "network", copy.deepcopy(network)
+    return "network", snapshot_network(network)
 
 
 def save_policy_output(params, step, sL, s, _input):
@@ -70,7 +70,7 @@ network_snapshot = {
     "label": "Get a snapshop of the network",
     "policies": {},
     "variables": {
-        "network": network_deepcopy,
+        "network": take_network_snapshot,
     }
 }
 
@@ -92,7 +92,11 @@ class CommonsSimulationConfiguration:
                  days_to_80p_of_max_voting_weight=10,
                  max_proposal_request=0.2,
                  timesteps_days=730,
-                 random_seed=None):
+                 random_seed=None,
+                 network_backend="networkx",
+                 support_dtype="float64",
+                 proposal_lifetimes="daily",
+                 archive_proposals=False):
         self.hatchers = hatchers
         self.proposals = proposals
         self.hatch_tribute = hatch_tribute
@@ -109,6 +113,26 @@ class CommonsSimulationConfiguration:
         self.timesteps_days = timesteps_days  # Simulate 2*365=730 days
 
         self.random_seed = random_seed
+        # One of network_utils.NETWORK_BACKENDS. Both give the same results,
+        # "array" is faster for large networks.
+        if network_backend not in NETWORK_BACKENDS:
+            raise Exception("Unknown network backend {}, expected one of {}".format(network_backend, NETWORK_BACKENDS))
+        self.network_backend = network_backend
+        # The dtype of the array backend's support edges, one of
+        # arraynetwork.DTYPES. A DiGraph keeps them in Python floats.
+        if support_dtype not in DTYPES:
+            raise Exception("Unknown support dtype {}, expected one of {}".format(support_dtype, DTYPES))
+        if support_dtype != "float64" and network_backend != "array":
+            raise Exception("support_dtype {} needs network_backend=\"array\"".format(support_dtype))
+        self.support_dtype = support_dtype
+        # One of policies.PROPOSAL_LIFETIMES
+        if proposal_lifetimes not in PROPOSAL_LIFETIMES:
+            raise Exception("Unknown proposal lifetimes {}, expected one of {}".format(
+                proposal_lifetimes, PROPOSAL_LIFETIMES))
+        self.proposal_lifetimes = proposal_lifetimes
+        # Move failed and completed Proposals out of the network, see
+        # network_utils.archive_proposals()
+        self.archive_proposals = archive_proposals
         self.probability_func = new_probability_func(random_seed)
         self.exponential_func = new_exponential_func(random_seed)
         self.gamma_func = new_gamma_func(random_seed)
@@ -139,7 +163,12 @@ class CommonsSimulationConfiguration:
         return convert_80p_to_cliff_and_halflife(self.vesting_80p_unlocked)
 
 
-def bootstrap_simulation(c: CommonsSimulationConfiguration):
+def bootstrap_simulation(c: CommonsSimulationConfiguration, network_builder=bootstrap_network):
+    """
+    network_builder is called like network_utils.bootstrap_network(), e.g.
+    scenarios.build_network() to create large networks faster. The DiGraph
+    it returns is converted to c.network_backend.
+    """
     contributions = [c.random_number_func() * 10e5 for i in range(c.hatchers)]
     cliff_days, halflife_days = c.cliff_and_halflife()
     token_batches, initial_token_supply = create_token_batches(
@@ -147,9 +176,11 @@ def bootstrap_simulation(c: CommonsSimulationConfiguration):
 
     commons = Commons(sum(contributions), initial_token_supply,
                       hatch_tribute=c.hatch_tribute, exit_tribute=c.exit_tribute, kappa=c.kappa)
-    network = bootstrap_network(
+    network = network_builder(
         token_batches, c.proposals, commons._funding_pool, commons._token_supply, c.max_proposal_request,
         c.probability_func, c.random_number_func, c.gamma_func, c.exponential_func)
+    if c.network_backend == "array":
+        network = ArrayNetwork.from_graph(network, dtype=c.support_dtype)
 
     initial_conditions = {
         "network": network,
@@ -159,7 +190,8 @@ def bootstrap_simulation(c: CommonsSimulationConfiguration):
         "token_supply": commons._token_supply,
         "token_price": commons.token_price(),
         "policy_output": None,
-        "sentiment": 0.75
+        "sentiment": 0.75,
+        "proposal_schedule": ProposalSchedule(),
     }
 
     simulation_parameters = {
@@ -180,7 +212,9 @@ def bootstrap_simulation(c: CommonsSimulationConfiguration):
             "random_number_func": c.random_number_func,
             "choice_func": c.choice_func,
             "speculation_days": c.speculation_days,
-            "multiplier_new_participants": c.multiplier_new_participants
+            "multiplier_new_participants": c.multiplier_new_participants,
+            "proposal_lifetimes": c.proposal_lifetimes,
+            "archive_proposals": c.archive_proposals,
         }
     }
 
@@ -239,6 +273,7 @@ partial_state_update_blocks = [
         "variables": {
             "network": ProposalFunding.su_make_proposal_active,
             "commons": ProposalFunding.su_deduct_funds_from_funding_pool,
+            "proposal_schedule": ProposalFunding.su_schedule_proposal_endings,
             "policy_output": save_policy_output,
         }
     },
@@ -257,6 +292,7 @@ partial_state_update_blocks = [
         },
         "variables": {
             "network": ActiveProposals.su_set_proposal_status,
+            "proposal_schedule": ActiveProposals.su_remove_due_endings,
             "policy_output": save_policy_output,
         }
     },
@@ -322,5 +358,5 @@ partial_state_update_blocks = [
         }
     },
     sync_state_variables,
-    # network_snapshot,  # Enable it only if running an A/B testing or parameter sweep with a no_deepcopy version of cadCAD
+    # network_snapshot,  # Enable it to keep every timestep's network with engine.Engine or a no_deepcopy version of cadCAD
 ]
@@ -0,0 +1,98 @@
+"""
+Stop conditions that end a run early once the Commons has reached a state it
+will not leave, and fill in the rest of the run without simulating it.
+
+engine.Engine evaluates its stop conditions once per timestep. When one of
+them holds, the Engine stops stepping and fills the remaining timesteps'
+records from the condition's extrapolate(), which gives the synced state
+variables k timesteps later: constant for a stationary Commons, or in closed
+form where only decay is left (sentiment falls by config.sentiment_decay a
+day, and conviction follows y_k = alpha^k * y + tokens * (1 - alpha^k) /
+(1 - alpha)). advance() then brings the network itself to the final
+timestep.
+
+A condition may only hold for a state that is absorbing: while any
+Participant is left, they keep buying, selling and exiting; while
+Participants can arrive or the speculators' exit tribute flows into the
+funding pool, the Commons keeps changing too. NoParticipants is the one
+such state, and only when nothing can arrive or flow in any more.
+"""
+from typing import Dict
+
+import config
+from entities import ProposalStatus
+from network_utils import get_participants, get_proposals
+
+
+def decayed_sentiment(sentiment: float, k: int) -> float:
+    """
+    ParticipantSentiment.su_update_sentiment_decay() applied k times.
+    """
+    return max(sentiment - k * config.sentiment_decay, 0)
+
+
+def decayed_conviction(conviction: float, tokens: float, alpha: float, k: int) -> float:
+    """
+    ProposalFunding.su_calculate_conviction() applied k times with the same
+    tokens staked.
+    """
+    alpha_k = alpha ** k
+    return alpha_k * conviction + tokens * (1 - alpha_k) / (1 - alpha)
+
+
+class StopCondition:
+    """
+    A condition that holds for the state of a Commons that will stay as it
+    is. Subclasses implement holds() and, if some state variables keep
+    changing in a predictable way, extrapolate() and advance().
+    """
+    name = None
+
+    def holds(self, params: dict, state: dict) -> bool:
+        raise NotImplementedError
+
+    def extrapolate(self, params: dict, state: dict, k: int) -> Dict[str, float]:
+        """
+        The state variables that change, k timesteps after state.
+        """
+        return {}
+
+    def advance(self, params: dict, state: dict, k: int):
+        """
+        Updates the network in state to k timesteps later.
+        """
+
+    def __repr__(self):
+        return "<{} {}>".format(self.__class__.__name__, vars(self))
+
+
+class NoParticipants(StopCondition):
+    """
+    Every Participant has left, none can arrive (max_new_participants is 0
+    and there is no load_profile), the exit tribute is 0, so no funding flows
+    in, and no Proposal is Active, so none can fail or complete. Nobody is
+    left to create or support Proposals, or to buy or sell tokens. The
+    Candidate Proposals only age.
+    """
+    name = "no_participants"
+
+    def holds(self, params, state):
+        if get_participants(state["network"]):
+            return False
+        if params.get("load_profile") or params.get("max_new_participants", config.max_new_participants):
+            return False
+        if state["commons"].exit_tribute:
+            return False
+        return not get_proposals(state["network"], status=ProposalStatus.ACTIVE)
+
+    def extrapolate(self, params, state, k):
+        return {"sentiment": 0}
+
+    def advance(self, params, state, k):
+        for _, proposal in get_proposals(state["network"], status=ProposalStatus.CANDIDATE):
+            proposal.age += k
+            proposal.update_threshold(state["funding_pool"], state["token_supply"],
+                                      max_proposal_request=params["max_proposal_request"])
+
+
+STOP_CONDITIONS = {c.name: c for c in (NoParticipants,)}
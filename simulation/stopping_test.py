@@ -0,0 +1,180 @@
+import unittest
+
+import numpy as np
+
+from engine import Engine, Stopped
+from entities import Participant, ProposalStatus
+from network_utils import calc_avg_sentiment, get_edges_by_type, get_participants, get_proposals
+from policies import ParticipantSentiment, ProposalFunding
+from simrunner import get_simulation_results
+from simulation import CommonsSimulationConfiguration, bootstrap_simulation, partial_state_update_blocks
+from stopping import NoParticipants, StopCondition, decayed_conviction, decayed_sentiment
+
+
+class AfterTimestep(StopCondition):
+    """
+    Holds from timestep on, and extrapolates the sentiment to 100 + k.
+    """
+    name = "after_timestep"
+
+    def __init__(self, timestep):
+        self.timestep = timestep
+
+    def holds(self, params, state):
+        return state["timestep"] >= self.timestep
+
+    def extrapolate(self, params, state, k):
+        return {"sentiment": 100 + k}
+
+
+def bootstrap(seed=1, timesteps=10, **kwargs):
+    initial_conditions, simulation_parameters = bootstrap_simulation(
+        CommonsSimulationConfiguration(random_seed=seed, timesteps_days=timesteps, **kwargs))
+    return initial_conditions, simulation_parameters["M"]
+
+
+def dead_commons(seed=2):
+    """
+    A Commons whose Participants have all left, where nobody can arrive and
+    the exit tribute is 0.
+    """
+    state, params = bootstrap(seed=seed, exit_tribute=0)
+    params["max_new_participants"] = 0
+    state["network"].remove_nodes_from([i for i, _ in get_participants(state["network"])])
+    return state, params
+
+
+class TestClosedForms(unittest.TestCase):
+    def test_decayed_sentiment(self):
+        state, params = bootstrap()
+        network = state["network"]
+        initial = {i: p.sentiment for i, p in get_participants(network)}
+        for k in range(1, 60):
+            ParticipantSentiment.su_update_sentiment_decay(params, 0, [], state, {})
+            for i, p in get_participants(network):
+                self.assertAlmostEqual(p.sentiment, decayed_sentiment(initial[i], k))
+
+    def test_decayed_conviction(self):
+        state, params = bootstrap()
+        network = state["network"]
+        for i, j in get_edges_by_type(network, "support"):
+            network.edges[i, j]["support"] = network.edges[i, j]["support"]._replace(tokens=10 * i, conviction=j)
+        initial = {e: network.edges[e]["support"] for e in get_edges_by_type(network, "support")}
+
+        alpha = params["alpha_days_to_80p_of_max_voting_weight"]
+        for k in range(1, 30):
+            ProposalFunding.su_calculate_conviction(params, 0, [], state, {})
+            for e, support in initial.items():
+                np.testing.assert_allclose(network.edges[e]["support"].conviction,
+                                           decayed_conviction(support.conviction, support.tokens, alpha, k))
+
+
+class TestStopConditions(unittest.TestCase):
+    def test_no_participants(self):
+        state, params = dead_commons()
+        self.assertTrue(NoParticipants().holds(params, state))
+        self.assertEqual(calc_avg_sentiment(state["network"]), 0)
+
+        state, params = bootstrap()
+        self.assertFalse(NoParticipants().holds(params, state))
+
+    def test_no_participants_is_only_absorbing_without_inflows(self):
+        """
+        Participants can still arrive, the exit tribute still funds the
+        Commons, or an Active Proposal can still end.
+        """
+        for change in ("arrivals", "load_profile", "exit_tribute", "active"):
+            with self.subTest(change=change):
+                state, params = dead_commons()
+                if change == "arrivals":
+                    del params["max_new_participants"]
+                elif change == "load_profile":
+                    params["load_profile"] = lambda timestep, n: 10
+                elif change == "exit_tribute":
+                    state["commons"].exit_tribute = 0.1
+                else:
+                    next(item for _, item in get_proposals(state["network"])).status = ProposalStatus.ACTIVE
+                self.assertFalse(NoParticipants().holds(params, state))
+
+    def test_advance_ages_candidates(self):
+        state, params = dead_commons()
+        ages = {j: p.age for j, p in get_proposals(state["network"])}
+        NoParticipants().advance(params, state, 12)
+        for j, p in get_proposals(state["network"]):
+            self.assertEqual(p.age, ages[j] + 12)
+
+
+class TestEngineStops(unittest.TestCase):
+    def test_fills_remaining_timesteps(self):
+        state, params = dead_commons()
+        engine = Engine(partial_state_update_blocks, params, stop_conditions=[NoParticipants()])
+        records = engine.run(state, 10)
+
+        self.assertEqual(engine.stopped, Stopped(0, "no_participants"))
+        substeps = len(partial_state_update_blocks)
+        self.assertEqual([(r["timestep"], r["substep"]) for r in records],
+                         [(0, 0)] + [(t, s) for t in range(1, 11) for s in range(1, substeps + 1)])
+        self.assertEqual({r["funding_pool"] for r in records}, {state["funding_pool"]})
+        self.assertEqual(records[-1]["sentiment"], 0)
+        self.assertEqual(engine.state["timestep"], 10)
+        # The final timestep's records have their own copy of the state
+        self.assertIsNot(records[-1]["network"], engine.state["network"])
+
+    def test_filled_records_lag_like_simulated_ones(self):
+        """
+        sentiment is updated in substep 3, so in substeps 1 and 2 it still
+        holds the previous timestep's value.
+        """
+        state, params = bootstrap()
+        engine = Engine(partial_state_update_blocks, params, record_substeps={1, 2, 3, 19},
+                        stop_conditions=[AfterTimestep(4)])
+        records = engine.run(state, 8)
+
+        self.assertEqual(engine.stopped, Stopped(4, "after_timestep"))
+        stopped_sentiment = [r for r in records if r["timestep"] == 4][-1]["sentiment"]
+        sentiment = {(r["timestep"], r["substep"]): r["sentiment"] for r in records}
+        self.assertEqual(sentiment[5, 1], stopped_sentiment)
+        self.assertEqual(sentiment[5, 2], stopped_sentiment)
+        self.assertEqual(sentiment[5, 3], 101)
+        self.assertEqual(sentiment[5, 19], 101)
+        self.assertEqual(sentiment[8, 2], 103)
+        self.assertEqual(sentiment[8, 3], 104)
+
+    def test_observers_see_filled_timesteps(self):
+        state, params = bootstrap()
+        seen = []
+        engine = Engine(partial_state_update_blocks, params, observers=[lambda s: seen.append(s["timestep"])],
+                        stop_conditions=[AfterTimestep(3)])
+        engine.run(state, 6)
+        self.assertEqual(seen, list(range(7)))
+
+    def test_filled_tail_matches_simulated_continuation(self):
+        """
+        The records filled in after NoParticipants holds are the ones
+        simulating the dead Commons gives.
+        """
+        state, params = dead_commons()
+        filled = Engine(partial_state_update_blocks, params, stop_conditions=[NoParticipants()])
+        filled_records = filled.run(state, 60)
+        state, params = dead_commons()
+        simulated = Engine(partial_state_update_blocks, params)
+        simulated_records = simulated.run(state, 60)
+
+        self.assertEqual(filled.stopped, Stopped(0, "no_participants"))
+        self.assertEqual(len(filled_records), len(simulated_records))
+        for name in ("funding_pool", "collateral_pool", "token_supply", "token_price", "sentiment",
+                     "timestep", "substep"):
+            self.assertEqual([r[name] for r in filled_records], [r[name] for r in simulated_records])
+        self.assertEqual([(j, p.status, p.age, p.trigger) for j, p in get_proposals(filled.state["network"])],
+                         [(j, p.status, p.age, p.trigger) for j, p in get_proposals(simulated.state["network"])])
+
+    def test_results_report_stop(self):
+        c = CommonsSimulationConfiguration(random_seed=3, timesteps_days=40)
+        result, df_final = get_simulation_results(c, engine="native", stop_conditions=[AfterTimestep(35)])
+        self.assertEqual(result["stopped"], {"timestep": 35, "condition": "after_timestep"})
+        self.assertEqual(len(result["timestep"]), 40)
+        self.assertEqual(result["sentiment"][-1], 100 + 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,45 +1,87 @@
 import numpy as np
 from inspect import getmembers
 from types import FunctionType
-from scipy.stats import expon, gamma
 
 
 
-def new_probability_func(seed):
-    random_state = np.random.RandomState(seed)
-    def probability(rate):
+class RandomFunc:
+    """
+    Base class for the random number funcs returned by the new_*_func()
+    factories below. Unlike closures they can be pickled together with their
+    RandomState, which is what makes checkpoints (see checkpoint.py) resume
+    with exactly the same random numbers.
+
+    Copying returns the same object. The funcs are shared by the whole
+    simulation, and cadCAD deep-copies the state, which references them
+    through the Participants, before every substep; a copy would fork the
+    random stream.
+    """
+
+    def __init__(self, seed):
+        self.random_state = np.random.RandomState(seed)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class ProbabilityFunc(RandomFunc):
+    def __call__(self, rate):
         if rate > 1.0:
             raise Exception("Rate has a maximum value of 1.0")
-        return random_state.rand() < rate
-    return probability
+        return self.random_state.rand() < rate
+
+
+class ExponentialFunc(RandomFunc):
+    """
+    Draws the same numbers as scipy.stats.expon.rvs(loc=loc, scale=scale,
+    random_state=random_state) without paying for importing scipy.stats.
+    """
+
+    def __call__(self, loc, scale):
+        return self.random_state.standard_exponential() * scale + loc
+
+
+class GammaFunc(RandomFunc):
+    """
+    Draws the same numbers as scipy.stats.gamma.rvs(alpha, loc=loc,
+    scale=scale, random_state=random_state).
+    """
+
+    def __call__(self, alpha, loc, scale):
+        return self.random_state.standard_gamma(alpha) * scale + loc
+
+
+class RandomNumberFunc(RandomFunc):
+    def __call__(self):
+        return self.random_state.rand()
+
+
+class ChoiceFunc(RandomFunc):
+    def __call__(self, choice_list):
+        return self.random_state.choice(choice_list)
+
+
+def new_probability_func(seed):
+    return ProbabilityFunc(seed)
 
 
 def new_exponential_func(seed):
-    random_state = np.random.RandomState(seed)
-    def exponential(loc, scale):
-        return expon.rvs(loc=loc, scale=scale, random_state=random_state)
-    return exponential
+    return ExponentialFunc(seed)
 
 
 def new_gamma_func(seed):
-    random_state = np.random.RandomState(seed)
-    def gamma_func(alpha, loc, scale):
-        return gamma.rvs(alpha, loc=loc, scale=scale, random_state=random_state)
-    return gamma_func
+    return GammaFunc(seed)
 
 
 def new_random_number_func(seed):
-    random_state = np.random.RandomState(seed)
-    def random_number_func():
-        return random_state.rand()
-    return random_number_func
+    return RandomNumberFunc(seed)
 
 
 def new_choice_func(seed):
-    random_state = np.random.RandomState(seed)
-    def choice_func(choice_list):
-        return random_state.choice(choice_list)
-    return choice_func
+    return ChoiceFunc(seed)
 
 
 """
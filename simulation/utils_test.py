@@ -18,6 +18,25 @@ class TestUtils(unittest.TestCase):
         result = exponential_func(loc=0, scale=100)
         self.assertGreater(result, 0)
 
+    def test_exponential_and_gamma_funcs_match_scipy(self):
+        """
+        The exponential and gamma funcs no longer go through scipy.stats, but
+        seeded runs must still draw exactly the same numbers as before.
+        """
+        from scipy.stats import expon, gamma
+
+        random_state = np.random.RandomState(7)
+        exponential_func = utils.new_exponential_func(seed=7)
+        gamma_func = utils.new_gamma_func(seed=7)
+        for _ in range(100):
+            self.assertEqual(exponential_func(loc=200, scale=200),
+                             expon.rvs(loc=200, scale=200, random_state=random_state))
+
+        random_state = np.random.RandomState(7)
+        for _ in range(100):
+            self.assertEqual(gamma_func(3, loc=0.001, scale=10000),
+                             gamma.rvs(3, loc=0.001, scale=10000, random_state=random_state))
+
     def test_new_gamma_func(self):
         gamma_func = utils.new_gamma_func(seed=None)
         result = gamma_func(3, loc=0.001, scale=10000)